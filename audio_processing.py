@@ -0,0 +1,221 @@
+"""
+Audio processing module for the Video Modification Bot.
+Decodes audio to PCM sample arrays with ffmpeg and writes sample arrays back to audio files,
+so voice audio can be assembled, measured, trimmed and leveled in memory with NumPy.
+"""
+
+import os
+import subprocess
+import wave
+from typing import Optional
+import numpy as np
+import config
+from media_info import remember_audio_duration
+from toolchain import get_capabilities, get_ffmpeg_path
+
+# Sample rate of the voice audio produced by the pipeline (gTTS delivers 24 kHz mono)
+VOICE_SAMPLE_RATE = 24000
+
+def decode_audio(source, sample_rate: int = VOICE_SAMPLE_RATE) -> Optional[np.ndarray]:
+    """
+    Decode audio to mono float32 samples in [-1, 1].
+
+    Args:
+        source: Path to an audio file, or the encoded audio as bytes
+        sample_rate: Sample rate to resample to
+
+    Returns:
+        1-D float32 array of samples or None if decoding fails
+    """
+    ffmpeg_path = get_ffmpeg_path()
+    if not ffmpeg_path:
+        print("Error: FFmpeg not found, can't decode audio.")
+        return None
+
+    from_bytes = isinstance(source, (bytes, bytearray))
+    cmd = [
+        ffmpeg_path, '-v', 'error',
+        '-i', 'pipe:0' if from_bytes else source,
+        '-vn', '-ac', '1', '-ar', str(sample_rate),
+        '-f', 'f32le', 'pipe:1'
+    ]
+    result = subprocess.run(cmd, input=bytes(source) if from_bytes else None, capture_output=True)
+    if result.returncode != 0:
+        print(f"Error decoding audio: {result.stderr.decode(errors='replace').strip()}")
+        return None
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def _write_wav(samples: np.ndarray, sample_rate: int, output_path: str):
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(output_path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+def write_audio(samples: np.ndarray, output_path: str, sample_rate: int = VOICE_SAMPLE_RATE) -> Optional[str]:
+    """
+    Write mono float32 samples to an audio file and remember its exact duration for probe_media.
+    WAV files are written directly; other formats (e.g. MP3) are encoded with ffmpeg.
+
+    Args:
+        samples: 1-D float32 samples in [-1, 1]
+        output_path: Destination file; the extension selects the format
+        sample_rate: Sample rate of the samples
+
+    Returns:
+        Path to the written file or None if it fails
+    """
+    if output_path.lower().endswith(".wav"):
+        _write_wav(samples, sample_rate, output_path)
+    else:
+        ffmpeg_path = get_ffmpeg_path()
+        caps = get_capabilities()
+        if not ffmpeg_path or (output_path.lower().endswith(".mp3") and caps and not caps.has_encoder("libmp3lame")):
+            # Without an MP3 encoder a WAV file is the lossless, dependency-free fallback
+            output_path = os.path.splitext(output_path)[0] + ".wav"
+            print(f"Warning: No MP3 encoder available, writing {output_path} instead")
+            _write_wav(samples, sample_rate, output_path)
+        else:
+            cmd = [
+                ffmpeg_path, '-y', '-v', 'error',
+                '-f', 'f32le', '-ar', str(sample_rate), '-ac', '1', '-i', 'pipe:0',
+                '-q:a', '4', output_path
+            ]
+            # The LAME header records encoder delay and padding, so decoders return exactly these samples
+            result = subprocess.run(cmd, input=np.ascontiguousarray(samples, dtype=np.float32).tobytes(),
+                                    capture_output=True)
+            if result.returncode != 0:
+                print(f"Error encoding audio: {result.stderr.decode(errors='replace').strip()}")
+                return None
+
+    remember_audio_duration(output_path, len(samples) / sample_rate, sample_rate, channels=1)
+    return output_path
+
+def _block_rms(samples: np.ndarray, block: int) -> np.ndarray:
+    """RMS of consecutive blocks of the given length (the incomplete last block is dropped)."""
+    count = len(samples) // block
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    blocks = samples[:count * block].reshape(count, block)
+    return np.sqrt(np.einsum('ij,ij->i', blocks, blocks) / block)
+
+def _to_db(value):
+    return 20 * np.log10(np.maximum(value, 1e-10))
+
+def measure_loudness(samples: np.ndarray, sample_rate: int = VOICE_SAMPLE_RATE) -> Optional[float]:
+    """
+    Integrated loudness in dBFS using the BS.1770 gating scheme (400 ms blocks with 75% overlap,
+    -70 dB absolute and -10 dB relative gates) on plain RMS, i.e. without K-weighting.
+    For speech this tracks LUFS closely at a fraction of the cost.
+
+    Returns:
+        Loudness in dB, or None for silence
+    """
+    hop = max(1, int(0.1 * sample_rate))
+    # 400 ms blocks are the mean power of four consecutive 100 ms hops
+    hop_power = _block_rms(samples, hop) ** 2
+    if len(hop_power) >= 4:
+        block_power = np.convolve(hop_power, np.full(4, 0.25), mode='valid')
+    elif len(samples):
+        # Shorter than one block: use the power of the whole clip
+        block_power = np.array([np.mean(samples ** 2)])
+    else:
+        return None
+    gated = block_power[block_power > 10 ** (-70 / 10)]
+    if len(gated) == 0:
+        return None
+    relative_gate = np.mean(gated) * 10 ** (-10 / 10)
+    gated = gated[gated > relative_gate]
+    return float(10 * np.log10(np.mean(gated)))
+
+def find_speech_bounds(samples: np.ndarray, sample_rate: int = VOICE_SAMPLE_RATE,
+                       threshold_db: float = config.VOICE_SILENCE_THRESHOLD_DB,
+                       keep_seconds: float = config.VOICE_KEEP_SILENCE) -> tuple:
+    """
+    Find where speech starts and ends by windowed energy: 10 ms windows quieter than
+    threshold_db below the loudest window (or than -60 dBFS) count as silence.
+
+    Returns:
+        (start, end) sample indexes, keeping keep_seconds of silence on both sides
+    """
+    window = max(1, int(0.01 * sample_rate))
+    levels = _block_rms(samples, window)
+    if len(levels) == 0 or levels.max() <= 0:
+        return 0, len(samples)
+    floor = max(_to_db(levels.max()) + threshold_db, -60.0)
+    loud = np.flatnonzero(_to_db(levels) > floor)
+    if len(loud) == 0:
+        return 0, len(samples)
+    keep = int(keep_seconds * sample_rate)
+    start = max(0, loud[0] * window - keep)
+    end = min(len(samples), (loud[-1] + 1) * window + keep)
+    return int(start), int(end)
+
+def process_voice(samples: np.ndarray, sample_rate: int = VOICE_SAMPLE_RATE,
+                  target_loudness: float = config.VOICE_TARGET_LOUDNESS,
+                  peak_ceiling_db: float = config.VOICE_PEAK_CEILING_DB,
+                  trim_silence: bool = config.VOICE_TRIM_SILENCE) -> np.ndarray:
+    """
+    Trim leading/trailing silence and bring the voice to a consistent loudness.
+    The gain is limited so peaks stay under the ceiling, and it is applied to the
+    trimmed samples in a single pass.
+
+    Args:
+        samples: 1-D float32 voice samples
+        sample_rate: Sample rate of the samples
+        target_loudness: Target integrated loudness in dB (see measure_loudness)
+        peak_ceiling_db: Highest allowed sample peak in dBFS
+        trim_silence: If False, only the level is changed
+
+    Returns:
+        Processed samples (a new array)
+    """
+    start, end = find_speech_bounds(samples, sample_rate) if trim_silence else (0, len(samples))
+    speech = samples[start:end]
+    loudness = measure_loudness(speech, sample_rate)
+    if loudness is None:
+        return speech.copy()
+
+    gain = 10 ** ((target_loudness - loudness) / 20)
+    peak = float(np.max(np.abs(speech))) if len(speech) else 0.0
+    if peak > 0:
+        gain = min(gain, 10 ** (peak_ceiling_db / 20) / peak)
+    return np.multiply(speech, np.float32(gain), dtype=np.float32)
+
+def postprocess_voice_file(audio_path: str, output_path: str = None) -> Optional[str]:
+    """
+    Decode a voice file once, trim and level it, and write the result (over the input by default).
+    The exact new duration is remembered so the renderer doesn't probe the file again.
+
+    Returns:
+        Path to the processed file or None if it fails
+    """
+    samples = decode_audio(audio_path)
+    if samples is None:
+        return None
+    processed = process_voice(samples)
+    print(f"Voice trimmed from {len(samples) / VOICE_SAMPLE_RATE:.2f}s to {len(processed) / VOICE_SAMPLE_RATE:.2f}s "
+          f"and leveled to {config.VOICE_TARGET_LOUDNESS:g} dB")
+    return write_audio(processed, output_path or audio_path)
+
+# For testing
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python audio_processing.py <audio file>")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    voice = decode_audio(sys.argv[1])
+    print(f"Decoded {len(voice)} samples ({len(voice) / VOICE_SAMPLE_RATE:.3f}s) "
+          f"in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    leveled = process_voice(voice)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Loudness {measure_loudness(voice):.1f} dB -> {measure_loudness(leveled):.1f} dB, "
+          f"duration {len(voice) / VOICE_SAMPLE_RATE:.3f}s -> {len(leveled) / VOICE_SAMPLE_RATE:.3f}s "
+          f"in {elapsed:.1f} ms")
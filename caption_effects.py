@@ -0,0 +1,113 @@
+"""
+Caption effects module for the Video Modification Bot.
+Describes how a caption moves while it appears (scale-pop, slide, bounce) as a small table of
+per-frame transforms, precomputed from easing curves so the frame loop only does lookups.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from caption_schedule import CaptionSchedule
+
+# Scales are quantized to this step so the renderer can reuse each scaled sprite
+SCALE_STEP = 0.02
+
+# Length of the entry animation of each effect, in seconds
+EFFECT_SECONDS = {
+    "fade": 0.0,
+    "pop": 0.25,
+    "slide": 0.2,
+    "bounce": 0.4,
+}
+
+# (scale step, horizontal offset, vertical offset); offsets are in caption heights
+CaptionTransform = Tuple[int, float, float]
+
+IDENTITY_SCALE = int(round(1.0 / SCALE_STEP))
+
+def _ease_out_cubic(t: float) -> float:
+    return 1 - (1 - t) ** 3
+
+def _ease_out_back(t: float) -> float:
+    # Overshoots to about 110% before settling, which gives the "pop"
+    c1 = 1.70158
+    c3 = c1 + 1
+    return 1 + c3 * (t - 1) ** 3 + c1 * (t - 1) ** 2
+
+def _ease_out_bounce(t: float) -> float:
+    n1, d1 = 7.5625, 2.75
+    if t < 1 / d1:
+        return n1 * t * t
+    if t < 2 / d1:
+        t -= 1.5 / d1
+        return n1 * t * t + 0.75
+    if t < 2.5 / d1:
+        t -= 2.25 / d1
+        return n1 * t * t + 0.9375
+    t -= 2.625 / d1
+    return n1 * t * t + 0.984375
+
+def _transform(effect: str, t: float) -> CaptionTransform:
+    """Transform of an effect at progress t (0 to 1) through its entry animation."""
+    if effect == "pop":
+        scale = 0.5 + 0.5 * _ease_out_back(t)
+        return int(round(scale / SCALE_STEP)), 0.0, 0.0
+    if effect == "slide":
+        # Rise into place from half a caption height below
+        return IDENTITY_SCALE, 0.0, 0.5 * (1 - _ease_out_cubic(t))
+    if effect == "bounce":
+        # Drop in from one caption height above and bounce on the resting position
+        return IDENTITY_SCALE, 0.0, -(1 - _ease_out_bounce(t))
+    return IDENTITY_SCALE, 0.0, 0.0
+
+@dataclass(frozen=True)
+class CaptionAnimation:
+    """Precomputed entry animation of a caption: one transform per frame after the text appears."""
+    effect: str
+    table: Tuple[CaptionTransform, ...]
+
+    def transform_at(self, entry_frame: int) -> Optional[CaptionTransform]:
+        """Transform for a frame counted from when the text appeared, None once it has settled."""
+        if 0 <= entry_frame < len(self.table):
+            return self.table[entry_frame]
+        return None
+
+def build_caption_animation(effect: str, schedule: CaptionSchedule) -> Optional[CaptionAnimation]:
+    """
+    Build the easing table of an effect for a caption schedule.
+
+    Args:
+        effect: "fade" (no motion), "pop", "slide" or "bounce"
+        schedule: Timing of the caption the effect is applied to
+
+    Returns:
+        CaptionAnimation, or None when the effect adds no motion
+    """
+    if effect not in EFFECT_SECONDS:
+        print(f"Warning: Unknown caption effect '{effect}', using a plain fade")
+        return None
+    frames = int(round(EFFECT_SECONDS[effect] * schedule.fps))
+    if schedule.word_by_word and schedule.words:
+        # Finish moving before the word starts fading out
+        frames = min(frames, schedule.frames_per_word - schedule.fade_frames)
+    if frames <= 1:
+        return None
+
+    table = tuple(_transform(effect, i / (frames - 1)) for i in range(frames))
+    return CaptionAnimation(effect=effect, table=table)
+
+# For testing
+if __name__ == "__main__":
+    from caption_schedule import build_caption_schedule
+
+    demo_schedule = build_caption_schedule("Every step counts", 30, 180)
+    for name in EFFECT_SECONDS:
+        animation = build_caption_animation(name, demo_schedule)
+        if animation is None:
+            print(f"{name}: no motion")
+            continue
+        scales = sorted({step for step, _, _ in animation.table})
+        print(f"{name}: {len(animation.table)} frames, {len(scales)} distinct scales, "
+              f"offsets {[round(dy, 2) for _, _, dy in animation.table]}")
+        if math.isclose(animation.table[-1][2], 0.0, abs_tol=1e-9) and animation.table[-1][0] == IDENTITY_SCALE:
+            print("  settles at rest")
@@ -0,0 +1,214 @@
+"""
+Caption index for the Video Modification Bot.
+Remembers the last CAPTION_INDEX_SIZE captions that were rendered and answers whether a new
+caption is a near-duplicate of any of them. Captions are normalized and cut into character
+shingles; a MinHash signature estimates the Jaccard similarity of two shingle sets, and
+locality-sensitive hashing over bands of the signature finds the candidates without
+comparing against every caption. Only the low 16 bits of each MinHash value are kept
+(b-bit MinHash): the signatures of 5000 captions take 640 KB.
+"""
+
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+import numpy as np
+import config
+
+# Signature layout: BANDS bands of ROWS hashes each; two captions become candidates when all
+# hashes of at least one band agree (likely above a Jaccard similarity of about 0.5)
+BANDS = 16
+ROWS = 4
+NUM_HASHES = BANDS * ROWS
+SHINGLE_CHARS = 5
+
+# Largest prime below 2**32, so hash values fit uint32
+_PRIME = np.uint64(4294967291)
+
+# Bump when the signature changes so stored indexes are rebuilt
+_INDEX_VERSION = 1
+
+# Fixed permutations, the same in every process
+_rng = np.random.default_rng(20240601)
+_PERM_A = _rng.integers(1, 2 ** 31, NUM_HASHES, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 2 ** 31, NUM_HASHES, dtype=np.uint64)
+_SHINGLE_WEIGHTS = np.uint64(257) ** np.arange(SHINGLE_CHARS, dtype=np.uint64)
+
+def normalize_caption(text: str) -> str:
+    """Lowercase, accents and punctuation removed, whitespace collapsed."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c)).lower()
+    return " ".join(re.findall(r"\w+", text))
+
+def caption_signature(text: str) -> np.ndarray:
+    """MinHash signature (NUM_HASHES 16-bit values) of a caption's character shingles."""
+    data = np.frombuffer(f" {normalize_caption(text)} ".encode("utf-8"), dtype=np.uint8)
+    if len(data) < SHINGLE_CHARS:
+        data = np.pad(data, (0, SHINGLE_CHARS - len(data)))
+    windows = np.lib.stride_tricks.sliding_window_view(data, SHINGLE_CHARS).astype(np.uint64)
+    shingles = np.unique((windows * _SHINGLE_WEIGHTS).sum(axis=1) & np.uint64(0xFFFFFFFF))
+    # (a * x + b) mod p for every permutation and shingle; a, b < 2**31 and x < 2**32 can't overflow
+    hashed = (np.outer(_PERM_A, shingles) + _PERM_B[:, None]) % _PRIME
+    # Two different minima share their low 16 bits with probability 2**-16, a negligible bias
+    return (hashed.min(axis=1) & np.uint64(0xFFFF)).astype(np.uint16)
+
+class CaptionIndex:
+    """Ring of the signatures of the last `capacity` captions, with LSH buckets for lookups."""
+
+    def __init__(self, path: Optional[str] = config.CAPTION_INDEX_FILE, capacity: int = config.CAPTION_INDEX_SIZE,
+                 threshold: float = config.CAPTION_DUPLICATE_THRESHOLD):
+        self.path = path
+        self.capacity = max(1, capacity)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._file_state = None
+        self._reset()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _reset(self):
+        self.signatures = np.zeros((self.capacity, NUM_HASHES), dtype=np.uint16)
+        self.texts: List[Optional[str]] = [None] * self.capacity
+        self.added = 0  # Captions added in total; the next one goes to slot added % capacity
+        self._buckets: Dict[Tuple[int, bytes], Set[int]] = {}
+
+    @staticmethod
+    def _band_keys(signature: np.ndarray):
+        bands = signature.reshape(BANDS, ROWS)
+        return [(band, bands[band].tobytes()) for band in range(BANDS)]
+
+    def _insert(self, text: str, signature: np.ndarray):
+        slot = self.added % self.capacity
+        if self.texts[slot] is not None:
+            # The oldest caption leaves the window
+            for key in self._band_keys(self.signatures[slot]):
+                bucket = self._buckets.get(key)
+                if bucket is not None:
+                    bucket.discard(slot)
+                    if not bucket:
+                        del self._buckets[key]
+        self.signatures[slot] = signature
+        self.texts[slot] = text
+        for key in self._band_keys(signature):
+            self._buckets.setdefault(key, set()).add(slot)
+        self.added += 1
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+            return stat.st_size, stat.st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        """Read the stored captions (oldest first) into a fresh ring."""
+        try:
+            with np.load(self.path) as data:
+                if int(data["version"]) != _INDEX_VERSION:
+                    return
+                signatures = data["signatures"]
+                blob = data["blob"].tobytes()
+                offsets = data["offsets"]
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable caption index {self.path}: {e}")
+            return
+        self._reset()
+        for i in range(max(0, len(signatures) - self.capacity), len(signatures)):
+            self._insert(blob[offsets[i]:offsets[i + 1]].decode("utf-8"), signatures[i])
+        self._file_state = self._stat()
+
+    def _save(self):
+        count = min(self.added, self.capacity)
+        order = [(self.added - count + i) % self.capacity for i in range(count)]
+        encoded = [self.texts[slot].encode("utf-8") for slot in order]
+        offsets = np.zeros(count + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, version=_INDEX_VERSION, signatures=self.signatures[order],
+                 blob=np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets=offsets)
+        os.replace(tmp_path, self.path)
+        self._file_state = self._stat()
+
+    def __len__(self) -> int:
+        return min(self.added, self.capacity)
+
+    def find_duplicate(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        Look for a near-duplicate of a caption.
+
+        Returns:
+            Tuple of (most similar remembered caption, estimated similarity), or None if no
+            caption reaches the threshold
+        """
+        signature = caption_signature(text)
+        with self._lock:
+            # Captions other processes rendered since the last load count too
+            if self.path and self._file_state != self._stat():
+                self._load()
+            candidates = set()
+            for key in self._band_keys(signature):
+                candidates.update(self._buckets.get(key, ()))
+            if not candidates:
+                return None
+            slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+            similarity = (self.signatures[slots] == signature).mean(axis=1)
+            best = int(np.argmax(similarity))
+            if similarity[best] < self.threshold:
+                return None
+            return self.texts[slots[best]], float(similarity[best])
+
+    def add(self, text: str):
+        """Remember a caption (and store the index, merging captions other processes added)."""
+        signature = caption_signature(text)
+        with self._lock:
+            if self.path and self._file_state != self._stat():
+                self._load()
+            self._insert(text, signature)
+            if self.path:
+                self._save()
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_caption_index() -> Optional[CaptionIndex]:
+    """The shared caption index, or None if CAPTION_DEDUP is off."""
+    global _index
+    if not config.CAPTION_DEDUP:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = CaptionIndex()
+        return _index
+
+# For testing
+if __name__ == "__main__":
+    import random
+    import tempfile
+    import time
+
+    words = ("life dream journey courage light step heart mind future today hope start believe rise "
+             "strength path climb shine grow fear change begin small victory").split()
+    rng = random.Random(7)
+    captions = [" ".join(rng.choice(words) for _ in range(rng.randint(8, 16))).capitalize() + "."
+                for _ in range(5000)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        test_index = CaptionIndex(os.path.join(tmp, "captions.npz"), capacity=5000)
+        start = time.perf_counter()
+        for caption in captions:
+            test_index._insert(caption, caption_signature(caption))
+        test_index._save()
+        print(f"Indexed {len(test_index)} captions in {time.perf_counter() - start:.2f}s, "
+              f"{os.path.getsize(test_index.path) / 1024:.0f} KB on disk")
+
+        reloaded = CaptionIndex(test_index.path, capacity=5000)
+        variants = [captions[10].upper().replace(".", "!"), captions[20][:-1] + " today.",
+                    "Every journey begins with a single step."]
+        start = time.perf_counter()
+        for _ in range(100):
+            results = [reloaded.find_duplicate(v) for v in variants]
+        print(f"Lookup: {(time.perf_counter() - start) * 1000 / 300:.3f} ms per caption")
+        for variant, result in zip(variants, results):
+            print(f"  {variant!r}: " + (f"duplicate of {result[0]!r} ({result[1]:.2f})" if result else "new"))
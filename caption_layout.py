@@ -0,0 +1,162 @@
+"""
+Caption layout module for the Video Modification Bot.
+Wraps caption text into centered lines that fit the frame, shrinking the font when needed,
+and places the block at the top, center or bottom of the frame inside a safe margin.
+Word widths are measured once per font size and reused for every wrap attempt.
+"""
+
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from PIL import ImageFont
+
+class FontFamily:
+    """A font file loaded on demand at any size, with a width cache per size."""
+
+    def __init__(self, font_path: Optional[str]):
+        self.font_path = font_path
+        self._fonts: Dict[int, ImageFont.ImageFont] = {}
+        self._measurers: Dict[int, "TextMeasurer"] = {}
+
+    def font(self, size: int):
+        font = self._fonts.get(size)
+        if font is None:
+            if self.font_path:
+                try:
+                    font = ImageFont.truetype(self.font_path, size)
+                except Exception as e:
+                    print(f"Error loading font: {e}. Using default font.")
+                    self.font_path = None
+            if font is None:
+                try:
+                    font = ImageFont.load_default(size)
+                except TypeError:
+                    # Pillow < 10.1 only has a fixed-size bitmap default font
+                    font = ImageFont.load_default()
+            self._fonts[size] = font
+        return font
+
+    def measurer(self, size: int) -> "TextMeasurer":
+        measurer = self._measurers.get(size)
+        if measurer is None:
+            measurer = TextMeasurer(self.font(size))
+            self._measurers[size] = measurer
+        return measurer
+
+class TextMeasurer:
+    """Advance widths of single words for one font, each measured only once."""
+
+    def __init__(self, font):
+        self.font = font
+        self._widths: Dict[str, float] = {}
+        self.space_width = self.width(" ")
+        try:
+            ascent, descent = font.getmetrics()
+            self.line_height = ascent + descent
+        except AttributeError:
+            left, top, right, bottom = font.getbbox("Ag")
+            self.line_height = bottom
+
+    def width(self, word: str) -> float:
+        width = self._widths.get(word)
+        if width is None:
+            width = self.font.getlength(word)
+            self._widths[word] = width
+        return width
+
+    def line_width(self, words: List[str]) -> float:
+        return sum(self.width(word) for word in words) + self.space_width * max(0, len(words) - 1)
+
+@dataclass(frozen=True)
+class CaptionLayout:
+    """Wrapped caption lines at a font size, with the size of the text block in pixels."""
+    lines: Tuple[str, ...]
+    line_widths: Tuple[float, ...]
+    font_size: int
+    line_height: int
+    line_step: int
+    width: int
+    height: int
+    fits: bool
+
+def wrap_words(words: List[str], max_width: float, measurer: TextMeasurer) -> List[List[str]]:
+    """Greedily fill lines up to max_width. A word wider than max_width gets a line of its own."""
+    lines: List[List[str]] = []
+    current: List[str] = []
+    current_width = 0.0
+    for word in words:
+        word_width = measurer.width(word)
+        if current and current_width + measurer.space_width + word_width > max_width:
+            lines.append(current)
+            current, current_width = [], 0.0
+        current_width += (measurer.space_width if current else 0.0) + word_width
+        current.append(word)
+    if current:
+        lines.append(current)
+    return lines
+
+def layout_caption(text: str, fonts: FontFamily, font_size: int, max_width: float, max_height: float,
+                   min_font_size: int, stroke_width: int = 0, line_spacing: float = 0.0) -> CaptionLayout:
+    """
+    Wrap the caption to max_width, shrinking the font until the block also fits max_height.
+
+    Args:
+        text: Caption text
+        fonts: Font to lay the text out with
+        font_size: Preferred font size
+        max_width: Maximum width of the text block in pixels (stroke included)
+        max_height: Maximum height of the text block in pixels (stroke included)
+        min_font_size: Smallest font size to shrink to
+        stroke_width: Outline width, which adds to every edge of the block
+        line_spacing: Extra space between lines, relative to the line height
+
+    Returns:
+        CaptionLayout; fits is False if even min_font_size overflows
+    """
+    words = text.split()
+    size = max(font_size, 1)
+    min_font_size = max(1, min(min_font_size, size))
+    while True:
+        measurer = fonts.measurer(size)
+        lines = wrap_words(words, max_width - 2 * stroke_width, measurer)
+        line_widths = tuple(measurer.line_width(line) for line in lines)
+        width = int(round(max(line_widths, default=0.0))) + 2 * stroke_width
+        line_step = int(round(measurer.line_height * (1 + line_spacing)))
+        height = line_step * (len(lines) - 1) + measurer.line_height + 2 * stroke_width
+        fits = width <= max_width and height <= max_height
+        if fits or size <= min_font_size:
+            return CaptionLayout(
+                lines=tuple(" ".join(line) for line in lines),
+                line_widths=line_widths,
+                font_size=size,
+                line_height=measurer.line_height,
+                line_step=line_step,
+                width=width,
+                height=height,
+                fits=fits,
+            )
+        # Shrink in 10% steps; word widths at each size are cached for later clips
+        size = max(min_font_size, int(size * 0.9))
+
+def caption_origin_y(position: str, frame_height: int, box_height: int, margin: int) -> int:
+    """Top edge of a caption box placed at "top", "center" or "bottom" within the safe margin."""
+    if position == "top":
+        return margin
+    if position == "bottom":
+        return frame_height - margin - box_height
+    return (frame_height - box_height) // 2
+
+# For testing
+if __name__ == "__main__":
+    import time
+    from video_editor import find_system_font
+
+    family = FontFamily(find_system_font())
+    quote = ("The best time to plant a tree was twenty years ago. The second best time is now, "
+             "so pick up the shovel and start digging today.")
+    for frame_size in [(1920, 1080), (1080, 1920), (640, 360)]:
+        start = time.perf_counter()
+        layout = layout_caption(quote, family, 50, frame_size[0] * 0.9 - 20, frame_size[1] / 3 - 20, 20, 2)
+        print(f"{frame_size}: size {layout.font_size}, {len(layout.lines)} lines, {layout.width}x{layout.height}, "
+              f"fits={layout.fits} in {(time.perf_counter() - start) * 1000:.1f} ms")
+        for line in layout.lines:
+            print(f"  {line}")
@@ -0,0 +1,215 @@
+"""
+Caption placement module for the Video Modification Bot.
+Chooses, once per shot, where the caption goes (top, center or bottom) and how opaque its
+background box is, so captions stay off faces, detail and bright areas. One pass over tiny
+grayscale frames finds the shot cuts (histogram differences, as for highlights) and measures,
+per shot and frame row, how busy (edges and motion) and how bright the picture is, all with
+vectorized NumPy. The pass still decodes most of the source, so it is cached per source; the
+decisions are stored in the caption schedule, so per frame the renderer only looks them up.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+import numpy as np
+import config
+from caption_layout import caption_origin_y
+from caption_schedule import CaptionPlacement
+from caption_style import POSITIONS, CaptionStyle
+from highlights import CUT_THRESHOLD, decode_samples, histogram_changes
+from media_info import probe_media
+from mezzanine import source_fingerprint
+
+# Bump when the analysis changes so cached indexes are rebuilt
+_INDEX_VERSION = 1
+
+# Edge plus motion energy (luma change per pixel of the analysis frames) that counts as fully busy
+BUSY_SCALE = 0.12
+# Part of the frame width the caption box usually covers, centered; the rest doesn't count
+CAPTION_COLUMNS = 0.8
+# Cost added for leaving the style's own position, and for moving away from the previous shot's
+POSITION_PENALTY = 0.15
+SWITCH_PENALTY = 0.1
+# Steps of the box opacity, so a caption is rasterized for only a few opacities
+ALPHA_STEP = 16
+
+@dataclass(frozen=True)
+class ShotIndex:
+    """Shots of a source and how busy and bright each frame row is during each of them."""
+    starts: np.ndarray  # Start time of each shot in seconds
+    busy: np.ndarray    # (shots, rows) edge and motion energy of the caption columns
+    bright: np.ndarray  # (shots, rows) mean luma of the caption columns, 0 to 1
+    aspect: float       # Width over height of the analysis frames
+
+def _shot_starts(changes: np.ndarray, min_samples: int) -> np.ndarray:
+    """First sample of every shot; cuts closer than min_samples to the previous one are ignored."""
+    starts = [0]
+    for cut in np.flatnonzero(changes > CUT_THRESHOLD):
+        if cut - starts[-1] >= min_samples:
+            starts.append(int(cut))
+    return np.array(starts, dtype=np.int64)
+
+def _build_index(frames: np.ndarray, sample_fps: float) -> ShotIndex:
+    count, height, width = frames.shape
+    starts = _shot_starts(histogram_changes(frames), max(1, int(round(config.PLACEMENT_MIN_SHOT_SECONDS * sample_fps))))
+    lengths = np.diff(np.append(starts, count))[:, None, None].astype(np.float32)
+
+    values = frames.astype(np.float32) / 255.0
+    # Detail: horizontal and vertical luma steps of every sample
+    edges = np.zeros_like(values)
+    edges[:, :, 1:] += np.abs(np.diff(values, axis=2))
+    edges[:, 1:, :] += np.abs(np.diff(values, axis=1))
+
+    # Per-shot maps in one pass: sums over each shot's samples
+    mean = np.add.reduceat(values, starts, axis=0) / lengths
+    square = np.add.reduceat(values * values, starts, axis=0) / lengths
+    motion = np.sqrt(np.maximum(square - mean * mean, 0.0))
+    busy = np.add.reduceat(edges, starts, axis=0) / lengths + motion
+
+    # Rows of the columns a centered caption covers
+    margin = int(round(width * (1 - CAPTION_COLUMNS) / 2))
+    columns = slice(margin, width - margin)
+    return ShotIndex(starts=starts / sample_fps, busy=busy[:, :, columns].mean(axis=2),
+                     bright=mean[:, :, columns].mean(axis=2), aspect=width / height)
+
+def _index_path(video_path: str) -> str:
+    key = (f"{source_fingerprint(video_path)}_{config.PLACEMENT_ANALYSIS_FPS}_{config.PLACEMENT_ANALYSIS_WIDTH}"
+           f"_{config.PLACEMENT_MIN_SHOT_SECONDS}_{_INDEX_VERSION}")
+    return os.path.join(config.PLACEMENT_CACHE_DIR, f"{key}.npz")
+
+def analyze_shots(video_path: str, cached_only: bool = False) -> Optional[ShotIndex]:
+    """
+    Build (or load from the cache) the shot index of a video.
+
+    Args:
+        video_path: Path to the video to analyze
+        cached_only: If True, only load a cached index and never decode the video
+
+    Returns:
+        ShotIndex or None if the video can't be analyzed (or isn't cached)
+    """
+    index_path = _index_path(video_path)
+    if os.path.exists(index_path):
+        try:
+            with np.load(index_path) as data:
+                return ShotIndex(starts=data["starts"], busy=data["busy"], bright=data["bright"],
+                                 aspect=float(data["aspect"]))
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable shot index {index_path}: {e}")
+    if cached_only:
+        return None
+
+    info = probe_media(video_path)
+    if not info or not info.has_video or not info.width:
+        return None
+    width = config.PLACEMENT_ANALYSIS_WIDTH
+    height = max(2, int(round(width * info.height / info.width / 2)) * 2)
+    frames = decode_samples(video_path, width, height, config.PLACEMENT_ANALYSIS_FPS)
+    if frames is None:
+        return None
+    if len(frames) == 0:
+        print(f"Error: No frames decoded while analyzing {video_path}")
+        return None
+    index = _build_index(frames, config.PLACEMENT_ANALYSIS_FPS)
+
+    os.makedirs(config.PLACEMENT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, starts=index.starts, busy=index.busy, bright=index.bright, aspect=index.aspect)
+    os.replace(tmp_path, index_path)
+    return index
+
+def _band_scores(index: ShotIndex, style: CaptionStyle) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    How busy, and how close in brightness to the text, the caption band of every position is.
+
+    Returns:
+        Tuple of (busy, glare) arrays of shape (shots, positions), each from 0 to 1
+    """
+    rows = index.busy.shape[1]
+    band = max(1, int(round(rows * config.PLACEMENT_BAND_HEIGHT)))
+    margin = style.margin_pixels(int(round(rows * index.aspect)), rows)
+    busy = np.clip(index.busy / BUSY_SCALE, 0.0, 1.0)
+    # Light text is hard to read on bright footage, dark text on dark footage
+    light_text = sum(style.color) / 3 >= 128
+    glare = np.clip((index.bright - 0.5) * 2 if light_text else (0.5 - index.bright) * 2, 0.0, 1.0)
+
+    band_busy = np.empty((len(index.starts), len(POSITIONS)), dtype=np.float32)
+    band_glare = np.empty_like(band_busy)
+    for p, position in enumerate(POSITIONS):
+        top = caption_origin_y(position, rows, band, margin)
+        band_busy[:, p] = busy[:, top:top + band].mean(axis=1)
+        band_glare[:, p] = glare[:, top:top + band].mean(axis=1)
+    return band_busy, band_glare
+
+def plan_caption_placement(video_path: str, style: CaptionStyle, fps: float, total_frames: int,
+                           start_time: float = 0.0, cached_only: bool = False) -> Tuple[Tuple[int, CaptionPlacement], ...]:
+    """
+    Pick the caption position and box opacity of every shot of an output.
+
+    Each shot gets the position whose band is least busy and least bright (relative to the
+    text color); the style's own position and the previous shot's are preferred when they are
+    nearly as good, so captions don't jump around. The box is more opaque over busier or
+    brighter bands, within config.CAPTION_BOX_ALPHA_RANGE.
+
+    Args:
+        video_path: Path to the source video
+        style: Style of the captions (its position is preferred, its margin kept)
+        fps: Frame rate of the output
+        total_frames: Number of frames in the output
+        start_time: Source time of the first output frame in seconds (highlight windows)
+        cached_only: If True, only plan from an existing shot index (previews never run the
+                     analysis pass)
+
+    Returns:
+        (first output frame, placement) of every shot, empty if SCENE_AWARE_PLACEMENT is off
+        or the source can't be analyzed (the style's own placement is used then)
+    """
+    if not config.SCENE_AWARE_PLACEMENT:
+        return ()
+    index = analyze_shots(video_path, cached_only)
+    if index is None or len(index.starts) == 0:
+        return ()
+
+    band_busy, band_glare = _band_scores(index, style)
+    cost = band_busy + band_glare + POSITION_PENALTY
+    cost[:, POSITIONS.index(style.position)] -= POSITION_PENALTY
+    need = np.maximum(band_busy, band_glare)
+    low, high = config.CAPTION_BOX_ALPHA_RANGE
+
+    plan = []
+    previous = None
+    for shot, start in enumerate(index.starts):
+        frame = max(0, int(round((start - start_time) * fps)))
+        if frame >= total_frames:
+            break
+        shot_cost = cost[shot] + SWITCH_PENALTY
+        if previous is not None:
+            shot_cost[previous] -= SWITCH_PENALTY
+        previous = int(np.argmin(shot_cost))
+        alpha = int(round((low + (high - low) * need[shot, previous]) / ALPHA_STEP)) * ALPHA_STEP
+        placement = CaptionPlacement(POSITIONS[previous], int(np.clip(alpha, 0, 255)))
+        if plan and plan[-1][0] == frame:
+            # Shots before the start of a highlight window: the last one is on screen at frame 0
+            plan[-1] = (frame, placement)
+        elif not plan or plan[-1][1] != placement:
+            plan.append((frame, placement))
+    return tuple(plan)
+
+# For testing
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python caption_placement.py <video>")
+        sys.exit(1)
+
+    probed = probe_media(sys.argv[1])
+    for attempt in ("analysis", "cached index"):
+        begin = time.perf_counter()
+        config.SCENE_AWARE_PLACEMENT = True
+        shots = plan_caption_placement(sys.argv[1], CaptionStyle(), float(probed.fps), probed.frame_count)
+        print(f"{attempt}: {len(shots)} placements in {(time.perf_counter() - begin) * 1000:.0f} ms")
+    for first_frame, shot_placement in shots:
+        print(f"  from {first_frame / float(probed.fps):6.2f}s: {shot_placement.position:<6} "
+              f"box {shot_placement.background_alpha}")
@@ -0,0 +1,155 @@
+"""
+Caption scheduling module for the Video Modification Bot.
+Computes which caption text is visible, and how opaque it is, for any frame of the output.
+The schedule is a pure function of the frame index so renderers can process frames in any order.
+"""
+
+import bisect
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+@dataclass(frozen=True)
+class CaptionPlacement:
+    """Where the caption is drawn during one shot (see caption_placement.py)."""
+    position: str  # "top", "center" or "bottom"
+    background_alpha: int  # Opacity of the box behind the text, from 0 to 255
+
+@dataclass(frozen=True)
+class CaptionSchedule:
+    """Timing of a caption over the output video, and its placement per shot."""
+    caption_text: str
+    words: Tuple[str, ...]
+    word_by_word: bool
+    fps: float
+    total_frames: int
+    frames_per_word: int
+    fade_frames: int
+    shot_starts: Tuple[int, ...] = ()  # First output frame of each shot with its own placement
+    placements: Tuple[CaptionPlacement, ...] = ()
+
+    def placement_at(self, frame_index: int) -> Optional[CaptionPlacement]:
+        """Placement of the caption at a (0-based) frame, None to use the style's own."""
+        if not self.placements:
+            return None
+        return self.placements[max(0, bisect.bisect_right(self.shot_starts, frame_index) - 1)]
+
+    def word_index_at(self, frame_index: int) -> int:
+        """Index of the word shown at a (0-based) frame, or -1 in whole-caption mode."""
+        if not self.word_by_word or not self.words:
+            return -1
+        return min(frame_index // self.frames_per_word, len(self.words) - 1)
+
+    def state_at(self, frame_index: int) -> Tuple[str, int]:
+        """
+        Caption state at a (0-based) frame.
+
+        Returns:
+            Tuple of (text, alpha) where alpha is the text opacity from 0 to 255
+        """
+        if not self.word_by_word or not self.words:
+            return self.caption_text, 255
+
+        word_index = frame_index // self.frames_per_word
+        if word_index >= len(self.words):
+            # Stay on the last word once every word has been shown
+            return self.words[-1], 255
+
+        # Calculate alpha (transparency) for fade effect
+        word_frame = frame_index % self.frames_per_word + 1
+        alpha = 255
+        if word_frame <= self.fade_frames:  # Fade in
+            alpha = int(255 * (word_frame / self.fade_frames))
+        elif word_frame > self.frames_per_word - self.fade_frames:  # Fade out
+            alpha = int(255 * ((self.frames_per_word - word_frame) / self.fade_frames))
+        return self.words[word_index], max(0, min(255, alpha))
+
+    def entry_frame_at(self, frame_index: int) -> int:
+        """Frames since the text shown at a (0-based) frame appeared, used to drive entry animations."""
+        if not self.word_by_word or not self.words:
+            return frame_index
+        if frame_index // self.frames_per_word >= len(self.words):
+            # The held last word has long settled
+            return frame_index - (len(self.words) - 1) * self.frames_per_word
+        return frame_index % self.frames_per_word
+
+    def transition_frames(self) -> List[int]:
+        """First frame of every word (just the first frame in whole-caption mode)."""
+        if not self.word_by_word or not self.words:
+            return [0]
+        return [i * self.frames_per_word for i in range(len(self.words))
+                if i * self.frames_per_word < self.total_frames]
+
+    def cues(self) -> List[Tuple[float, float, str]]:
+        """
+        Caption timeline as (start, end, text) in seconds, matching the frames on which
+        the burned-in renderer draws each text with a non-zero opacity.
+        """
+        if not self.word_by_word or not self.words:
+            return [(0.0, self.total_frames / self.fps, self.caption_text)]
+
+        cues = []
+        for i, word in enumerate(self.words):
+            start = i * self.frames_per_word
+            if start >= self.total_frames:
+                break
+            if i == len(self.words) - 1:
+                # The last word stays on screen until the end
+                end = self.total_frames
+            else:
+                # The last frame of a word's slot has faded out completely
+                end = min(start + self.frames_per_word - 1, self.total_frames)
+            cues.append((start / self.fps, end / self.fps, word))
+        return cues
+
+def build_caption_schedule(caption_text: str, fps: float, total_frames: int,
+                           word_by_word: bool = True, audio_duration: Optional[float] = None,
+                           shot_placements: Sequence[Tuple[int, CaptionPlacement]] = ()) -> CaptionSchedule:
+    """
+    Spread the caption words evenly over the output video.
+
+    Args:
+        caption_text: Text to display as caption
+        fps: Frame rate of the output video
+        total_frames: Number of frames in the output video
+        word_by_word: If True, display one word at a time with a fade in/out
+        audio_duration: Duration of the voice in seconds; words are spread over the longer
+                        of the output and the voice
+        shot_placements: (first frame, placement) of every shot, in order, as planned by
+                         caption_placement.plan_caption_placement (the style's placement if empty)
+
+    Returns:
+        CaptionSchedule for the output video
+    """
+    words = tuple(caption_text.split())
+    output_duration = total_frames / fps
+    frames_per_word = total_frames
+    fade_frames = 2
+
+    if word_by_word and words:
+        # Ensure we use at least the output duration so the last word isn't cut
+        text_display_duration = output_duration
+        if audio_duration is not None:
+            text_display_duration = max(output_duration, audio_duration)
+
+        # Each word gets an equal portion of the total duration
+        seconds_per_word = text_display_duration / len(words)
+        frames_per_word = int(seconds_per_word * fps)
+
+        # Ensure minimum visibility (at least 0.3 seconds per word)
+        min_frames = max(5, int(0.3 * fps))
+        frames_per_word = max(frames_per_word, min_frames)
+
+        # Calculate fade-in and fade-out frames (15% of word time for each transition)
+        fade_frames = max(2, int(frames_per_word * 0.15))
+
+    return CaptionSchedule(
+        caption_text=caption_text,
+        words=words,
+        word_by_word=word_by_word,
+        fps=fps,
+        total_frames=total_frames,
+        frames_per_word=max(1, frames_per_word),
+        fade_frames=fade_frames,
+        shot_starts=tuple(start for start, _ in shot_placements),
+        placements=tuple(placement for _, placement in shot_placements),
+    )
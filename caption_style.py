@@ -0,0 +1,169 @@
+"""
+Caption style module for the Video Modification Bot.
+A CaptionStyle is an immutable, hashable description of how captions look (font, size,
+colors, stroke, position, background box, effect). It is passed per job, so one process can render jobs of
+different styles side by side, and its hash keys the font and sprite caches. Colors are
+parsed when the style is created; resolving a style loads its font family once per process.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, replace
+from typing import Dict, Tuple, Union
+import config
+from caption_layout import FontFamily
+
+RGB = Tuple[int, int, int]
+
+# Color names accepted wherever a style takes a color
+COLOR_NAMES: Dict[str, RGB] = {
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+    "red": (255, 0, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "yellow": (255, 255, 0),
+    "cyan": (0, 255, 255),
+    "magenta": (255, 0, 255)
+}
+
+POSITIONS = ("top", "center", "bottom")
+
+def parse_color(color: Union[str, Tuple[int, ...]], default: RGB) -> RGB:
+    """Convert a color name or RGB sequence into an RGB tuple (unknown names give the default)."""
+    if isinstance(color, str):
+        return COLOR_NAMES.get(color.lower(), default)
+    return tuple(int(channel) for channel in color[:3])
+
+@dataclass(frozen=True)
+class CaptionStyle:
+    """
+    How captions look. Colors may be given as names or RGB sequences and are stored as RGB
+    tuples, so equal styles compare (and hash) equal however they were written.
+    """
+    font_name: str = config.CAPTION_FONT
+    font_size: int = config.CAPTION_FONTSIZE
+    color: RGB = config.CAPTION_COLOR
+    stroke_color: RGB = config.CAPTION_STROKE_COLOR
+    stroke_width: int = config.CAPTION_STROKE_WIDTH
+    position: str = config.CAPTION_POSITION
+    effect: str = config.CAPTION_EFFECT
+    margin: float = config.CAPTION_MARGIN
+    min_font_size: int = config.CAPTION_MIN_FONTSIZE
+    background_alpha: int = config.CAPTION_BACKGROUND_ALPHA
+
+    def __post_init__(self):
+        object.__setattr__(self, "color", parse_color(self.color, (255, 255, 255)))
+        object.__setattr__(self, "stroke_color", parse_color(self.stroke_color, (0, 0, 0)))
+        if self.position not in POSITIONS:
+            raise ValueError(f"Unknown caption position {self.position!r}, expected one of {POSITIONS}")
+        if not 0 <= self.background_alpha <= 255:
+            raise ValueError(f"Invalid caption background opacity {self.background_alpha}, expected 0 to 255")
+        if self.font_size <= 0 or self.stroke_width < 0:
+            raise ValueError(f"Invalid caption size {self.font_size} or stroke width {self.stroke_width}")
+
+    def with_changes(self, **changes) -> "CaptionStyle":
+        """Copy of this style with some settings changed."""
+        return replace(self, **changes)
+
+    def scaled(self, scale: float) -> "CaptionStyle":
+        """This style for frames scaled by the given factor (e.g. low-resolution previews)."""
+        return replace(self, font_size=max(8, int(self.font_size * scale)),
+                       stroke_width=max(1, int(round(self.stroke_width * scale))) if self.stroke_width else 0,
+                       min_font_size=max(8, int(self.min_font_size * scale)))
+
+    @property
+    def fonts(self) -> FontFamily:
+        """The loaded font family of this style, shared by every style with the same font."""
+        return font_family(self.font_name)
+
+    def margin_pixels(self, frame_width: int, frame_height: int) -> int:
+        """Safe margin kept clear of captions on every edge of the frame."""
+        return int(round(min(frame_width, frame_height) * self.margin))
+
+DEFAULT_STYLE = CaptionStyle()
+
+def find_system_font(font_name=None):
+    """
+    Find a system font that can be used with Pillow.
+    
+    Args:
+        font_name: Name of the font to look for (e.g., 'Arial', 'Impact')
+                  If None, will try to use the font specified in config
+    
+    Returns:
+        Path to the font file if found, None otherwise
+    """
+    if font_name is None:
+        font_name = config.CAPTION_FONT
+    
+    # Common font directories and extensions to check
+    font_dirs = [
+        "/usr/share/fonts/truetype/",  # Linux
+        "/usr/share/fonts/TTF/",       # Linux
+        "/Library/Fonts/",             # macOS
+        "C:\\Windows\\Fonts\\"         # Windows
+    ]
+    
+    font_extensions = ['.ttf', '.otf', '.TTF', '.OTF']
+    
+    # Try exact name match first
+    for font_dir in font_dirs:
+        if os.path.exists(font_dir):
+            for ext in font_extensions:
+                font_path = os.path.join(font_dir, f"{font_name}{ext}")
+                if os.path.exists(font_path):
+                    return font_path
+    
+    # Try case-insensitive partial match
+    for font_dir in font_dirs:
+        if os.path.exists(font_dir):
+            for root, dirs, files in os.walk(font_dir):
+                for file in files:
+                    if any(file.lower().endswith(ext.lower()) for ext in font_extensions):
+                        if font_name.lower() in file.lower():
+                            return os.path.join(root, file)
+    
+    # Try some common fallback fonts
+    fallback_fonts = [
+        "DejaVuSans-Bold.ttf",
+        "LiberationSans-Bold.ttf",
+        "Arial.ttf",
+        "Verdana.ttf",
+        "TimesNewRoman.ttf",
+        "Calibri.ttf"
+    ]
+    
+    for font_dir in font_dirs:
+        if os.path.exists(font_dir):
+            for fallback in fallback_fonts:
+                for root, dirs, files in os.walk(font_dir):
+                    for file in files:
+                        if fallback.lower() in file.lower():
+                            return os.path.join(root, file)
+    
+    print(f"Warning: Could not find font '{font_name}' or any suitable fallback.")
+    return None
+
+# Font families by name: the font file is looked up once and its per-size fonts and word
+# widths are shared by every job (and style) that uses it
+_font_families: Dict[str, FontFamily] = {}
+_font_lock = threading.Lock()
+
+def font_family(font_name: str) -> FontFamily:
+    """Resolve a font by name once per process; sizes are loaded on demand by the layout engine."""
+    with _font_lock:
+        fonts = _font_families.get(font_name)
+        if fonts is None:
+            font_path = find_system_font(font_name)
+            print(f"Using font: {font_path}" if font_path else "Using default font")
+            fonts = FontFamily(font_path)
+            _font_families[font_name] = fonts
+        return fonts
+
+# For testing
+if __name__ == "__main__":
+    a = CaptionStyle(color="white", font_size=60)
+    b = CaptionStyle(color=(255, 255, 255), font_size=60)
+    print(f"{a}\nequal: {a == b}, same hash: {hash(a) == hash(b)}, default: {DEFAULT_STYLE}")
+    print(f"half size: {a.scaled(0.5)}")
@@ -19,14 +19,36 @@ FFPROBE_PATH = os.getenv("FFPROBE_PATH", None)  # Will use PATH if None
 
 # Ollama API configuration
 OLLAMA_API_BASE = os.getenv("OLLAMA_API_BASE", "http://127.0.0.1:11434")
+OLLAMA_HEDGE_API_BASE = os.getenv("OLLAMA_HEDGE_API_BASE", None)  # Server for hedged requests (None: the same one)
 TEXT_MODEL = "deepseek-r1:1.5b"  # Using locally running deepseek model through Ollama
 
 # Text generation settings
 TEXT_PROMPT = "Generate a short, motivational, fun and philosophical quote or message that would work well as a video caption. Keep it under 150 characters."
+TEXT_TEMPERATURE = 0.7
+# Caption seeds are unbounded (0). Set TEXT_SEED_POOL to the --warm-captions count to draw seeds
+# from range(TEXT_SEED_POOL) only, so a warmed-up response store serves every caption; keep it well
+# above the number of videos published per CAPTION_INDEX_SIZE, or near-duplicates exhaust the pool
+TEXT_SEED_POOL = 0
+TEXT_WARM_UP_COUNT = 200  # Captions --warm-captions generates by default (seeds 0 to N - 1)
+TEXT_DEADLINE_SECONDS = 12.0  # Latency budget of a caption; after it a quote bank caption is used
+TEXT_HEDGE_AFTER_SECONDS = 4.0  # A second request is sent if the first hasn't answered by then
+QUOTE_BANK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "quotes.txt")  # One quote per line
 
 # Text-to-speech settings
 TTS_LANGUAGE = "en"  # English
 TTS_SLOW = False  # Normal speed
+TTS_BACKEND = os.getenv("TTS_BACKEND", "gtts")  # "gtts", or "http" for a self-hosted/stand-in service
+TTS_HTTP_URL = os.getenv("TTS_HTTP_URL", "http://127.0.0.1:5002/tts")  # Used by the "http" backend
+TTS_CHUNK_CHARS = 100  # Text is split at sentence/clause boundaries into chunks of at most this length
+TTS_MAX_WORKERS = 4  # Chunks synthesized concurrently
+
+# Voice post-processing (applied to the generated speech before it is saved)
+VOICE_NORMALIZE = True  # Trim silence and level the voice
+VOICE_TARGET_LOUDNESS = -16.0  # Integrated loudness target in dB (LUFS-like, see audio_processing)
+VOICE_PEAK_CEILING_DB = -1.0  # Peaks are kept below this level in dBFS
+VOICE_TRIM_SILENCE = True  # Cut leading and trailing silence
+VOICE_SILENCE_THRESHOLD_DB = -40.0  # 10 ms windows this far below the loudest one count as silence
+VOICE_KEEP_SILENCE = 0.05  # Seconds of silence kept at each end
 
 # Caption settings
 CAPTION_FONT = "Impact"  # Any font name installed on your system
@@ -35,4 +57,114 @@ CAPTION_COLOR = "yellow"  # or RGB tuple like (255, 255, 0)
 CAPTION_STROKE_COLOR = "black"  # or RGB tuple like (0, 0, 0)
 CAPTION_STROKE_WIDTH = 2
 CAPTION_POSITION = "bottom"  # "top", "center", or "bottom"
+CAPTION_MARGIN = 0.05  # Safe margin on every edge, relative to the shorter side of the frame
+CAPTION_MIN_FONTSIZE = 24  # Long captions shrink down to this size to fit the frame
+CAPTION_EFFECT = "fade"  # Entry animation of each word: "fade", "pop", "slide" or "bounce"
+CAPTION_BACKGROUND_ALPHA = 128  # Opacity of the black box behind the text (0-255), when placement isn't scene-aware
+
+
+# Cache directory for probe results, toolchain capabilities and other derived data
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+TOOLCHAIN_CACHE_FILE = os.path.join(CACHE_DIR, "toolchain.json")
+PROBE_CACHE_SIZE = 512  # Media probe results kept in memory; least recently used are dropped
+
+# Store of LLM responses, keyed by model, prompts, options and seed
+TEXT_CACHE_ENABLED = True
+TEXT_CACHE_FILE = os.path.join(CACHE_DIR, "responses.sqlite")
+TEXT_CACHE_TTL_DAYS = 30
+TEXT_CACHE_MAX_ENTRIES = 5000
+
+# Near-duplicate captions: a caption too similar to one of the last CAPTION_INDEX_SIZE rendered
+# captions is regenerated (next seeds, then quote bank picks) before any speech or render work
+CAPTION_DEDUP = True
+CAPTION_INDEX_FILE = os.path.join(CACHE_DIR, "caption_index.npz")
+CAPTION_INDEX_SIZE = 5000
+CAPTION_DUPLICATE_THRESHOLD = 0.5  # Estimated Jaccard similarity of the character shingles
+CAPTION_DEDUP_ATTEMPTS = 3  # Seeds tried before falling back to the quote bank
+
+# Mezzanine cache: hostile sources (VFR, long-GOP/HEVC, WMV/FLV...) are normalized once
+# into a constant-frame-rate, short-GOP intermediate that all renders decode from
+MEZZANINE_ENABLED = True
+MEZZANINE_DIR = os.path.join(CACHE_DIR, "mezzanine")
+MEZZANINE_CACHE_MB = 10240  # Least recently used intermediates are evicted above this size
+MEZZANINE_GOP_SECONDS = 1.0  # Keyframe interval of the intermediates
+MEZZANINE_MAX_SOURCE_GOP_SECONDS = 4.0  # Sources with longer keyframe intervals are normalized
+
+# Highlight window: render only the best part of long sources (voice length plus tail)
+HIGHLIGHT_WINDOW = False
+HIGHLIGHT_CACHE_DIR = os.path.join(CACHE_DIR, "highlights")
+HIGHLIGHT_ANALYSIS_FPS = 4  # Samples per second of the analysis pass
+HIGHLIGHT_ANALYSIS_WIDTH = 64  # Width of the grayscale analysis frames
+
+# Scene-aware caption placement: per shot, the caption moves to the calmest, least bright band
+# (top, center or bottom, overriding CAPTION_POSITION) and its background box is more opaque over
+# busy or bright footage. Costs an extra decode of each new source (the analysis is cached)
+SCENE_AWARE_PLACEMENT = False
+PLACEMENT_CACHE_DIR = os.path.join(CACHE_DIR, "placement")
+PLACEMENT_ANALYSIS_FPS = 4  # Samples per second of the analysis pass
+PLACEMENT_ANALYSIS_WIDTH = 64  # Width of the grayscale analysis frames
+PLACEMENT_MIN_SHOT_SECONDS = 1.0  # Shorter shots keep the placement of the shot before them
+PLACEMENT_BAND_HEIGHT = 0.2  # Height of the band a caption is expected to cover, relative to the frame
+CAPTION_BOX_ALPHA_RANGE = (64, 192)  # Background box opacity over calm, dark bands to busy or bright ones
+
+# Streaming inputs (stdin, http(s):// and range+http(s):// sources)
+STREAM_PROBE_BYTES = 1024 * 1024  # Leading bytes of a pipe that are probed before decoding
+STREAM_CHUNK_BYTES = 256 * 1024  # Size of each read (and of each range request)
+STREAM_READAHEAD_MB = 8  # Most data fetched ahead of the decoder
+STREAM_RANGE_CONNECTIONS = 4  # Parallel range requests
+
+# Ingest: segmented, resumable downloads into the input folder (ingest.py)
+INGEST_CONNECTIONS = 4  # Parallel range requests per file
+INGEST_SEGMENT_MB = 8  # Size of each range request
+INGEST_PARALLEL_DOWNLOADS = 2  # Files of a manifest downloaded at the same time
+INGEST_RETRIES = 3  # Attempts per segment; a failed download resumes from its finished segments
+
+# Audio settings for the final video
+AUDIO_FIT = "pad"  # "pad" or "loop" the voice to the video length, or "trim" the video to the voice
+MIX_ORIGINAL_AUDIO = False  # Keep the original soundtrack, ducked under the voice
+ORIGINAL_AUDIO_VOLUME = 0.3  # Level of the original soundtrack when mixed
+TAIL_SECONDS = 3.0  # Seconds the video continues after the video/voice ends
+
+# Multi-variant rendering: frames buffered per variant between the decoder and its encoder thread
+VARIANT_QUEUE_SIZE = 8
+
+# Upper bound on decoded/rendered frame buffers per render worker, in MB
+FRAME_MEMORY_LIMIT_MB = 512
+
+# Caption sprites (rasterized caption text) kept per process and shared by every job and style, in MB
+CAPTION_SPRITE_CACHE_MB = 64
+
+# Processes compositing captions; above 1, frames are shared with them through shared memory
+RENDER_PROCESSES = 1
+
+# Concurrency per pipeline stage: caption text (LLM host), speech (TTS service), render
+# (compositing with the frame encoder, local cores) and encode (final audio encode and mux).
+# Each render slot gets cpu_count / render slots threads for OpenCV and the frame encoder.
+STAGE_SLOTS = {"text": 1, "speech": 2, "render": 1, "encode": 2}
+PIPELINE_JOBS = 3  # Jobs in flight per queue worker, so every stage has work waiting
+
+# Caption delivery
+CAPTION_MODE = "burn"  # "burn" draws captions into the frames, "soft" adds a subtitle track (no re-encode)
+SUBTITLE_FORMAT = "srt"  # Sidecar subtitle file written in "soft" mode: "srt" or "vtt"
+
+# Verification of finished outputs: container metadata plus a few sampled frames (output_verify.py).
+# Outputs that fail are reported (and returned as failures), but kept on disk for inspection.
+VERIFY_OUTPUTS = True
+VERIFY_DURATION_TOLERANCE = 0.1  # Seconds the output, video and audio lengths may differ from the plan (plus one frame)
+VERIFY_SAMPLE_FRAMES = 3  # Frames decoded to look for the caption
+VERIFY_REPORT_FILE = os.path.join(OUTPUT_VIDEOS_DIR, "verification.jsonl")
+
+# Shared job queue for several render nodes draining the same input folder
+QUEUE_DIR = os.path.join(OUTPUT_VIDEOS_DIR, ".queue")
+LEASE_TTL_SECONDS = 120  # A lease without heartbeat for this long is reclaimed by other workers
+JOB_MAX_ATTEMPTS = 3  # A failed job is retried (by any worker) until it has failed this often
+
+# Side outputs captured during the render (poster JPEG and animated WebP next to each output)
+SIDE_OUTPUTS = False
+ANIMATED_PREVIEW_SECONDS = 3.0  # Length of the animated preview, from the start of the video
+ANIMATED_PREVIEW_FPS = 10
+ANIMATED_PREVIEW_WIDTH = 320
 
+# Preview renders
+PREVIEW_SCALE = 0.5  # Resolution factor relative to the source
+PREVIEW_FPS = 10  # Frame rate of preview videos
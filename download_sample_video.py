@@ -4,8 +4,7 @@ This script downloads a sample video from Pixabay (royalty-free) for testing.
 """
 
 import os
-import requests
-import shutil
+from ingest import download_file
 
 def download_sample_video():
     """Download a sample video for testing."""
@@ -18,19 +17,15 @@ def download_sample_video():
     video_url = "https://cdn.pixabay.com/vimeo/149218360/stream.mp4?width=640&hash=5e796e83c95e79a3ebca5ec2670d1bc5a2e9a1e7"
     output_path = os.path.join("input_videos", "sample_video.mp4")
     
-    try:
-        # Download the video
-        with requests.get(video_url, stream=True) as response:
-            response.raise_for_status()
-            with open(output_path, 'wb') as f:
-                shutil.copyfileobj(response.raw, f)
-        
-        print(f"Sample video downloaded to {output_path}")
-        print("You can now run the Video Modification Bot with: python main.py")
-        return True
-    except Exception as e:
-        print(f"Error downloading sample video: {e}")
+    # Parallel range requests; an interrupted download resumes on the next run
+    result = download_file(video_url, os.path.dirname(output_path), os.path.basename(output_path))
+    if not result:
+        print("Error downloading sample video.")
         return False
+    
+    print(f"Sample video downloaded to {output_path}")
+    print("You can now run the Video Modification Bot with: python main.py")
+    return True
 
 if __name__ == "__main__":
     download_sample_video()
\ No newline at end of file
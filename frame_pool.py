@@ -0,0 +1,61 @@
+"""
+Frame buffer pool for the Video Modification Bot.
+Preallocates a fixed number of frame buffers that the decoder reads into and the
+renderers share, so the frame loop allocates no full-size arrays and its memory is bounded.
+"""
+
+import queue
+import threading
+from typing import List, Optional, Tuple
+import numpy as np
+
+class FramePool:
+    """
+    A fixed set of reference-counted frame buffers.
+
+    acquire() blocks until a buffer is free, which throttles the decoder to the pace of
+    the slowest consumer instead of letting decoded frames pile up in memory.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], count: int, dtype=np.uint8, buffers: Optional[List[np.ndarray]] = None):
+        self.shape = shape
+        self.count = count
+        # Buffers can be supplied by the caller, e.g. views into shared memory
+        self._buffers = buffers if buffers is not None else [np.empty(shape, dtype=dtype) for _ in range(count)]
+        self._refs = [0] * count
+        self._lock = threading.Lock()
+        self._free = queue.Queue()
+        for slot in range(count):
+            self._free.put(slot)
+
+    @property
+    def nbytes(self) -> int:
+        """Total memory held by the pool."""
+        return sum(buffer.nbytes for buffer in self._buffers)
+
+    def buffer(self, slot: int) -> np.ndarray:
+        return self._buffers[slot]
+
+    def acquire(self, timeout: Optional[float] = None) -> int:
+        """Take a free buffer with one reference held by the caller (queue.Empty after timeout seconds)."""
+        slot = self._free.get(timeout=timeout)
+        with self._lock:
+            self._refs[slot] = 1
+        return slot
+
+    def retain(self, slot: int, count: int = 1):
+        """Add references for consumers that will release the buffer later."""
+        with self._lock:
+            self._refs[slot] += count
+
+    def release(self, slot: int):
+        """Drop one reference; the buffer is recycled when none are left."""
+        with self._lock:
+            self._refs[slot] -= 1
+            if self._refs[slot] > 0:
+                return
+        self._free.put(slot)
+
+    def close(self):
+        """Drop the buffers, e.g. views into shared memory that is about to be unmapped."""
+        self._buffers = []
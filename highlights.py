@@ -0,0 +1,197 @@
+"""
+Highlight module for the Video Modification Bot.
+Finds the most lively window of a long source so only that part is rendered. An analysis pass
+(tiny grayscale frames at a few frames per second) measures motion, brightness and shot cuts
+with NumPy. It still decodes most of the source at full resolution, so the result is cached
+per source; candidate windows start on keyframes so the render can seek straight to them.
+"""
+
+import os
+import subprocess
+from dataclasses import dataclass
+from typing import Optional
+import numpy as np
+import config
+from media_info import probe_media
+from mezzanine import source_fingerprint
+from toolchain import get_ffmpeg_path
+
+# Bump when the analysis changes so cached indexes are rebuilt
+_INDEX_VERSION = 1
+
+# Fraction of the histogram that must change between samples to count as a shot cut
+CUT_THRESHOLD = 0.4
+
+@dataclass(frozen=True)
+class HighlightIndex:
+    """Per-sample activity of a source, sampled at sample_fps."""
+    times: np.ndarray       # Sample times in seconds
+    motion: np.ndarray      # Mean absolute difference to the previous sample, 0 to 1
+    brightness: np.ndarray  # Mean luma, 0 to 1
+    cuts: np.ndarray        # Times of detected shot cuts
+    sample_fps: float
+
+def decode_samples(video_path: str, width: int, height: int, sample_fps: float) -> Optional[np.ndarray]:
+    """
+    Decode tiny grayscale frames at sample_fps with ffmpeg. Only non-reference frames are
+    skipped: I/P frames and reference B-frames (x264's B-pyramid) are decoded at full
+    resolution before the scale, so this costs about half to all of a full decode.
+    """
+    ffmpeg_path = get_ffmpeg_path()
+    if not ffmpeg_path:
+        print("Error: FFmpeg not found, can't analyze the source.")
+        return None
+    cmd = [
+        ffmpeg_path, '-v', 'error',
+        # Skips only the non-reference B-frames; nokey would be far cheaper, but sampling only
+        # keyframes (seconds apart) loses the motion and cut timing the scores depend on
+        '-skip_frame', 'noref',
+        '-i', video_path,
+        '-an', '-sn',
+        '-vf', f'fps={sample_fps},scale={width}:{height}:flags=area,format=gray',
+        '-f', 'rawvideo', 'pipe:1'
+    ]
+    result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        print(f"Error analyzing {video_path}: {result.stderr.decode(errors='replace').strip()}")
+        return None
+    frame_size = width * height
+    count = len(result.stdout) // frame_size
+    return np.frombuffer(result.stdout, dtype=np.uint8, count=count * frame_size).reshape(count, height, width)
+
+def histogram_changes(frames: np.ndarray) -> np.ndarray:
+    """Fraction of the luma histogram that changed since the previous sample (0 for the first)."""
+    count = len(frames)
+    pixels = frames.reshape(count, -1)
+    # 16-bin luma histograms of all samples in one bincount
+    bins = (pixels >> 4).astype(np.int64) + (np.arange(count, dtype=np.int64) * 16)[:, None]
+    histograms = np.bincount(bins.ravel(), minlength=count * 16).reshape(count, 16) / pixels.shape[1]
+    change = np.zeros(count, dtype=np.float32)
+    if count > 1:
+        change[1:] = 0.5 * np.abs(np.diff(histograms, axis=0)).sum(axis=1)
+    return change
+
+def _build_index(frames: np.ndarray, sample_fps: float) -> HighlightIndex:
+    count = len(frames)
+    values = frames.reshape(count, -1).astype(np.float32) / 255.0
+
+    brightness = values.mean(axis=1)
+    motion = np.zeros(count, dtype=np.float32)
+    if count > 1:
+        motion[1:] = np.abs(np.diff(values, axis=0)).mean(axis=1)
+
+    change = histogram_changes(frames)
+
+    times = np.arange(count, dtype=np.float32) / sample_fps
+    return HighlightIndex(times=times, motion=motion, brightness=brightness,
+                          cuts=times[change > CUT_THRESHOLD], sample_fps=sample_fps)
+
+def _index_path(video_path: str) -> str:
+    key = f"{source_fingerprint(video_path)}_{config.HIGHLIGHT_ANALYSIS_FPS}_{_INDEX_VERSION}"
+    return os.path.join(config.HIGHLIGHT_CACHE_DIR, f"{key}.npz")
+
+def analyze_source(video_path: str) -> Optional[HighlightIndex]:
+    """
+    Build (or load from the cache) the activity index of a video.
+
+    Args:
+        video_path: Path to the video to analyze
+
+    Returns:
+        HighlightIndex or None if the video can't be analyzed
+    """
+    index_path = _index_path(video_path)
+    if os.path.exists(index_path):
+        try:
+            with np.load(index_path) as data:
+                return HighlightIndex(times=data["times"], motion=data["motion"], brightness=data["brightness"],
+                                      cuts=data["cuts"], sample_fps=float(data["sample_fps"]))
+        except Exception as e:
+            print(f"Warning: Ignoring unreadable highlight index {index_path}: {e}")
+
+    info = probe_media(video_path)
+    if not info or not info.has_video or not info.width:
+        return None
+    width = config.HIGHLIGHT_ANALYSIS_WIDTH
+    height = max(2, int(round(width * info.height / info.width / 2)) * 2)
+    frames = decode_samples(video_path, width, height, config.HIGHLIGHT_ANALYSIS_FPS)
+    if frames is None:
+        return None
+    if len(frames) == 0:
+        print(f"Error: No frames decoded while analyzing {video_path}")
+        return None
+    index = _build_index(frames, config.HIGHLIGHT_ANALYSIS_FPS)
+
+    os.makedirs(config.HIGHLIGHT_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, times=index.times, motion=index.motion, brightness=index.brightness,
+             cuts=index.cuts, sample_fps=index.sample_fps)
+    os.replace(tmp_path, index_path)
+    return index
+
+def select_highlight_window(video_path: str, duration: float) -> float:
+    """
+    Pick where the best window of the given length starts.
+
+    Windows are scored by motion and exposure (dark or blown-out footage scores low). A window
+    that starts on a shot cut is preferred, one with a cut right after its start is avoided.
+    Only keyframe positions are considered, so decoding the window needs no pre-roll.
+
+    Args:
+        video_path: Path to the video that will be decoded (or stream-copied) for the render
+        duration: Length of the window in seconds
+
+    Returns:
+        Start time in seconds (0.0 if the video isn't longer than the window or can't be analyzed)
+    """
+    info = probe_media(video_path, keyframes=True)
+    video_duration = (info.video_duration or info.duration or 0.0) if info else 0.0
+    if video_duration <= duration:
+        return 0.0
+    index = analyze_source(video_path)
+    if index is None or len(index.times) == 0:
+        return 0.0
+
+    # Per-sample score: motion relative to this clip's busy parts, plus exposure
+    motion_scale = max(float(np.percentile(index.motion, 95)), 1e-6)
+    exposure = 1.0 - np.clip(np.abs(index.brightness - 0.5) * 2, 0.0, 1.0)
+    score = np.clip(index.motion / motion_scale, 0.0, 1.0) + 0.5 * exposure
+    cumulative = np.concatenate([[0.0], np.cumsum(score)])
+
+    candidates = np.array(info.keyframes if info.keyframes else index.times, dtype=np.float64)
+    candidates = candidates[candidates + duration <= video_duration + 1e-3]
+    if len(candidates) == 0:
+        return 0.0
+
+    window = max(1, int(round(duration * index.sample_fps)))
+    first = np.clip(np.round(candidates * index.sample_fps).astype(np.int64), 0, len(score) - 1)
+    last = np.minimum(first + window, len(score))
+    window_scores = (cumulative[last] - cumulative[first]) / np.maximum(last - first, 1)
+
+    if len(index.cuts):
+        # Distance from each candidate start to the nearest cut at or after it
+        following = np.searchsorted(index.cuts, candidates - 0.25)
+        next_cut = np.where(following < len(index.cuts), index.cuts[np.minimum(following, len(index.cuts) - 1)], np.inf)
+        offset = next_cut - candidates
+        window_scores += np.where(np.abs(offset) <= 0.25, 0.1, 0.0)
+        window_scores -= np.where((offset > 0.25) & (offset <= 1.0), 0.3, 0.0)
+
+    best = int(np.argmax(window_scores))
+    start = float(candidates[best])
+    print(f"Highlight window: {start:.2f}s to {start + duration:.2f}s of {video_duration:.2f}s "
+          f"(score {window_scores[best]:.2f})")
+    return start
+
+# For testing
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 3:
+        print("Usage: python highlights.py <video> <window seconds>")
+        sys.exit(1)
+
+    for attempt in ("analysis", "cached index"):
+        begin = time.perf_counter()
+        window_start = select_highlight_window(sys.argv[1], float(sys.argv[2]))
+        print(f"{attempt}: start {window_start:.2f}s in {(time.perf_counter() - begin) * 1000:.0f} ms")
@@ -0,0 +1,311 @@
+"""
+Ingest module for the Video Modification Bot.
+Downloads source videos into the input folder with parallel HTTP Range requests over one
+pooled session. Segments are written into a preallocated ".part" file and every finished
+segment is recorded next to it, so an interrupted download resumes where it stopped. The
+file is checked for size, SHA-256 and a video stream before it is moved into the library,
+which makes it visible to the selector and the render queue in one atomic step.
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+import requests
+from requests.adapters import HTTPAdapter
+import config
+from media_info import probe_media
+
+# Size of the blocks read from a response and hashed from disk
+BLOCK_BYTES = 1024 * 1024
+
+@dataclass(frozen=True)
+class ManifestEntry:
+    """One file to ingest."""
+    url: str
+    sha256: Optional[str] = None  # Expected hash, checked if given
+    name: Optional[str] = None    # File name in the library (default: from the URL)
+
+@dataclass(frozen=True)
+class DownloadResult:
+    """A file that was verified and added to the library."""
+    url: str
+    path: str
+    size: int
+    sha256: str
+    resumed_bytes: int  # Bytes kept from an earlier, interrupted attempt
+    seconds: float
+
+def create_session(pool_size: int = config.INGEST_CONNECTIONS * config.INGEST_PARALLEL_DOWNLOADS) -> requests.Session:
+    """HTTP session whose connection pool fits every request that can be in flight."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def file_name_for(url: str) -> str:
+    """File-name-safe library name for a URL."""
+    name = os.path.basename(unquote(urlparse(url).path).rstrip("/"))
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", name).lstrip(".")
+    return name or "download.mp4"
+
+def _probe_remote(session: requests.Session, url: str) -> Tuple[int, bool, Optional[str]]:
+    """
+    Size, Range support and validator (ETag or Last-Modified) of a remote file.
+    A one-byte range request is used instead of HEAD, which some object stores and CDNs refuse.
+    """
+    with session.get(url, headers={"Range": "bytes=0-0"}, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        if response.status_code == 206:
+            match = re.match(r"bytes \d+-\d+/(\d+)", response.headers.get("Content-Range", ""))
+            if match:
+                return int(match.group(1)), True, validator
+        return int(response.headers.get("Content-Length", 0) or 0), False, validator
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class _SegmentState:
+    """Finished segments of a .part file, saved to a JSON file next to it after every segment."""
+
+    def __init__(self, path: str, identity: dict):
+        self.path = path
+        self.identity = identity
+        self.done = set()
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Load the saved state; False if there is none or it belongs to another version of the file."""
+        try:
+            with open(self.path, "r") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if state.get("identity") != self.identity:
+            return False
+        self.done = set(state.get("done", []))
+        return True
+
+    def mark_done(self, index: int):
+        with self._lock:
+            self.done.add(index)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"identity": self.identity, "done": sorted(self.done)}, f)
+            os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+def _fetch_segment(session: requests.Session, url: str, part_path: str, start: int, end: int,
+                   validator: Optional[str]):
+    """Download bytes start..end (inclusive) into their place in the .part file."""
+    headers = {"Range": f"bytes={start}-{end}"}
+    if validator:
+        # The server answers with the whole (new) file instead if it changed
+        headers["If-Range"] = validator
+    with session.get(url, headers=headers, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise IOError(f"expected a partial response, got HTTP {response.status_code} (the file may have changed)")
+        offset = start
+        with open(part_path, "r+b") as f:
+            f.seek(start)
+            for block in response.iter_content(BLOCK_BYTES):
+                f.write(block)
+                offset += len(block)
+    if offset != end + 1:
+        raise IOError(f"segment {start}-{end} ended after {offset - start} bytes")
+
+def _fetch_with_retries(session: requests.Session, url: str, part_path: str, start: int, end: int,
+                        validator: Optional[str], retries: int):
+    for attempt in range(1, retries + 1):
+        try:
+            _fetch_segment(session, url, part_path, start, end, validator)
+            return
+        except (requests.RequestException, IOError) as e:
+            if attempt == retries:
+                raise
+            print(f"Retrying bytes {start}-{end} of {url} ({e})")
+            time.sleep(attempt)
+
+def _fetch_whole(session: requests.Session, url: str, part_path: str) -> int:
+    """Plain sequential download for servers without Range support (no resume)."""
+    size = 0
+    with session.get(url, stream=True, timeout=30) as response:
+        response.raise_for_status()
+        with open(part_path, "wb") as f:
+            for block in response.iter_content(BLOCK_BYTES):
+                f.write(block)
+                size += len(block)
+    return size
+
+def download_file(url: str, directory: str = config.INPUT_VIDEOS_DIR, name: str = None, sha256: str = None,
+                  connections: int = config.INGEST_CONNECTIONS, session: requests.Session = None) -> Optional[DownloadResult]:
+    """
+    Download a video into the library with parallel range requests, resuming an earlier attempt.
+
+    Args:
+        url: HTTP(S) URL of the video
+        directory: Library folder the verified file is moved into
+        name: File name in the library (default: from the URL)
+        sha256: Expected SHA-256 (hex); the file is rejected if it doesn't match
+        connections: Range requests in flight for this file
+        session: Shared HTTP session (a new pooled session if None)
+
+    Returns:
+        DownloadResult, or None if the download or its verification fails
+    """
+    started = time.monotonic()
+    session = session or create_session(connections)
+    name = name or file_name_for(url)
+    final_path = os.path.join(directory, name)
+    part_path = f"{final_path}.part"
+    expected_hash = sha256.lower() if sha256 else None
+    os.makedirs(directory, exist_ok=True)
+
+    try:
+        size, ranged, validator = _probe_remote(session, url)
+    except requests.RequestException as e:
+        print(f"Error reaching {url}: {e}")
+        return None
+
+    if os.path.exists(final_path) and os.path.getsize(final_path) == size:
+        # Already ingested (by an earlier run or another node)
+        digest = _file_sha256(final_path)
+        if expected_hash is None or digest == expected_hash:
+            print(f"Already in the library: {final_path}")
+            return DownloadResult(url, final_path, size, digest, size, time.monotonic() - started)
+
+    segment_bytes = int(config.INGEST_SEGMENT_MB * 1024 * 1024)
+    state = _SegmentState(f"{part_path}.json", {"url": url, "size": size, "validator": validator,
+                                                 "segment_bytes": segment_bytes})
+    resumed_bytes = 0
+    try:
+        if ranged and size > 0:
+            segments = [(start, min(start + segment_bytes, size) - 1) for start in range(0, size, segment_bytes)]
+            if state.load() and os.path.exists(part_path) and os.path.getsize(part_path) == size:
+                resumed_bytes = sum(end - start + 1 for i, (start, end) in enumerate(segments) if i in state.done)
+                print(f"Resuming {name}: {len(state.done)} of {len(segments)} segments already downloaded")
+            else:
+                state.done = set()
+                state.remove()
+                with open(part_path, "wb") as f:
+                    f.truncate(size)
+
+            def fetch(index: int):
+                start, end = segments[index]
+                _fetch_with_retries(session, url, part_path, start, end, validator, config.INGEST_RETRIES)
+                state.mark_done(index)
+
+            pending = [i for i in range(len(segments)) if i not in state.done]
+            with ThreadPoolExecutor(max_workers=max(1, min(connections, len(pending) or 1))) as executor:
+                # list() re-raises the first failed segment; finished ones stay recorded for the next attempt
+                list(executor.map(fetch, pending))
+        else:
+            print(f"{url} doesn't support range requests, downloading it in one piece")
+            size = _fetch_whole(session, url, part_path)
+    except (requests.RequestException, IOError) as e:
+        print(f"Error downloading {url}: {e}")
+        if os.path.exists(state.path):
+            print(f"Run the ingest again to resume {name}")
+        return None
+
+    # Verify before the file becomes visible to the renderers
+    actual_size = os.path.getsize(part_path)
+    if actual_size != size:
+        print(f"Error: {name} has {actual_size} bytes, expected {size}")
+        os.remove(part_path)
+        state.remove()
+        return None
+    digest = _file_sha256(part_path)
+    if expected_hash and digest != expected_hash:
+        print(f"Error: SHA-256 of {name} is {digest}, expected {expected_hash}")
+        os.remove(part_path)
+        state.remove()
+        return None
+    info = probe_media(part_path)
+    if not info or not info.has_video:
+        print(f"Error: {name} doesn't contain a readable video stream, keeping it as {part_path}")
+        return None
+
+    os.replace(part_path, final_path)
+    state.remove()
+    elapsed = time.monotonic() - started
+    downloaded = size - resumed_bytes
+    print(f"Ingested {final_path}: {size / (1024 * 1024):.1f} MB in {elapsed:.2f}s "
+          f"({downloaded / (1024 * 1024) / max(elapsed, 1e-6):.1f} MB/s"
+          + (f", {resumed_bytes / (1024 * 1024):.1f} MB resumed" if resumed_bytes else "") + ")")
+    return DownloadResult(url, final_path, size, digest, resumed_bytes, elapsed)
+
+def read_manifest(manifest_path: str) -> List[ManifestEntry]:
+    """
+    Read a manifest: one "<url> [sha256] [file name]" per line; blank lines and # comments are skipped.
+    """
+    entries = []
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line in f:
+            fields = line.split()
+            if not fields or fields[0].startswith("#"):
+                continue
+            sha256 = name = None
+            for field in fields[1:]:
+                if re.fullmatch(r"[0-9a-fA-F]{64}", field):
+                    sha256 = field
+                else:
+                    name = field
+            entries.append(ManifestEntry(fields[0], sha256, name))
+    return entries
+
+def download_manifest(entries: List[ManifestEntry], directory: str = config.INPUT_VIDEOS_DIR,
+                      parallel_downloads: int = config.INGEST_PARALLEL_DOWNLOADS,
+                      connections: int = config.INGEST_CONNECTIONS) -> List[Optional[DownloadResult]]:
+    """
+    Download many files at once over one pooled session.
+
+    Returns:
+        DownloadResult of every entry, None for entries that failed
+    """
+    started = time.monotonic()
+    session = create_session(max(1, parallel_downloads) * connections)
+    with ThreadPoolExecutor(max_workers=max(1, parallel_downloads)) as executor:
+        results = list(executor.map(
+            lambda entry: download_file(entry.url, directory, entry.name, entry.sha256, connections, session),
+            entries
+        ))
+    ingested = [result for result in results if result]
+    total = sum(result.size for result in ingested)
+    print(f"Ingested {len(ingested)} of {len(entries)} files, {total / (1024 * 1024):.1f} MB "
+          f"in {time.monotonic() - started:.2f}s")
+    return results
+
+# For testing
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Download source videos into the input folder")
+    parser.add_argument("urls", nargs="*", help="URLs to download")
+    parser.add_argument("--manifest", help="File with one '<url> [sha256] [file name]' per line")
+    parser.add_argument("--dir", default=config.INPUT_VIDEOS_DIR, help="Library folder")
+    parser.add_argument("--sha256", help="Expected SHA-256 (with a single URL)")
+    args = parser.parse_args()
+
+    manifest = read_manifest(args.manifest) if args.manifest else []
+    manifest += [ManifestEntry(url, args.sha256 if len(args.urls) == 1 else None) for url in args.urls]
+    if not manifest:
+        parser.print_help()
+    else:
+        download_manifest(manifest, args.dir)
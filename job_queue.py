@@ -0,0 +1,340 @@
+"""
+Shared-directory job queue for the Video Modification Bot.
+Lets several render nodes drain the same input folder (e.g. on NFS) without colliding:
+each video is claimed through a lease file that is created atomically, kept alive by
+heartbeats and reclaimed by other workers once it expires.
+"""
+
+import os
+import json
+import time
+import random
+import socket
+import threading
+import uuid
+from typing import Callable, List, Optional
+import config
+from video_selector import get_video_files
+
+class Lease:
+    """A claimed job. Heartbeats run in the background until the lease is released."""
+
+    def __init__(self, queue: "JobQueue", job_id: str, token: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.token = token
+        self.lost = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, daemon=True)
+        self._thread.start()
+
+    def _heartbeat(self):
+        interval = max(0.1, self.queue.lease_ttl / 3)
+        while not self._stop.wait(interval):
+            if self.queue._touch_lease(self.job_id, self.token):
+                continue
+            # A worker checking whether the lease expired moves it aside for a moment, retry once
+            if self._stop.wait(0.2) or self.queue._touch_lease(self.job_id, self.token):
+                continue
+            print(f"Warning: Lease on {self.job_id} was lost, another worker may have taken it over.")
+            self.lost.set()
+            return
+
+    def is_valid(self) -> bool:
+        """True while this worker still owns the job."""
+        return not self.lost.is_set() and self.queue._lease_token(self.job_id) == self.token
+
+    def release(self, status: Optional[str] = None):
+        """
+        Give up the lease. With "done" the job is marked finished so no other worker picks it
+        up again; with "failed" its failed attempts are counted and it is retried until
+        JobQueue.max_attempts is reached.
+        """
+        self._stop.set()
+        self._thread.join()
+        if not self.is_valid():
+            return
+        if status:
+            self.queue._write_marker(self.job_id, status, self.token)
+        try:
+            os.remove(self.queue._lease_path(self.job_id))
+        except FileNotFoundError:
+            pass
+
+class JobQueue:
+    """
+    Job queue backed only by a shared directory.
+
+    Layout:
+        leases/<job>.lease  JSON with the owner; its mtime is the last heartbeat
+        done/<job>.json     written once a job finished, or failed (with the number of attempts)
+    """
+
+    def __init__(self, queue_dir: str = config.QUEUE_DIR, lease_ttl: float = config.LEASE_TTL_SECONDS,
+                 worker_id: Optional[str] = None, max_attempts: int = config.JOB_MAX_ATTEMPTS):
+        self.queue_dir = queue_dir
+        self.lease_ttl = lease_ttl
+        self.max_attempts = max(1, max_attempts)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.lease_dir = os.path.join(queue_dir, "leases")
+        self.done_dir = os.path.join(queue_dir, "done")
+        os.makedirs(self.lease_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
+
+    def _lease_path(self, job_id: str) -> str:
+        return os.path.join(self.lease_dir, f"{job_id}.lease")
+
+    def _marker_path(self, job_id: str) -> str:
+        return os.path.join(self.done_dir, f"{job_id}.json")
+
+    def _server_now(self) -> float:
+        """
+        Current time according to the shared filesystem, so lease ages are measured
+        with the same clock that stamped the heartbeats even if node clocks drift.
+        """
+        clock_path = os.path.join(self.queue_dir, f".clock-{socket.gethostname()}")
+        with open(clock_path, "a"):
+            os.utime(clock_path, None)
+        return os.stat(clock_path).st_mtime
+
+    def _read_lease(self, path: str) -> Optional[dict]:
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _lease_token(self, job_id: str) -> Optional[str]:
+        lease = self._read_lease(self._lease_path(job_id))
+        return lease.get("token") if lease else None
+
+    def _touch_lease(self, job_id: str, token: str) -> bool:
+        if self._lease_token(job_id) != token:
+            return False
+        try:
+            os.utime(self._lease_path(job_id), None)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _read_marker(self, job_id: str) -> Optional[dict]:
+        try:
+            with open(self._marker_path(job_id), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError):
+            # Markers are written atomically; treat an unreadable one as finished rather than rerun the job
+            return {"status": "done"}
+
+    def _write_marker(self, job_id: str, status: str, token: str):
+        marker = {"status": status, "worker": self.worker_id, "token": token, "finished": time.time()}
+        if status == "failed":
+            previous = self._read_marker(job_id)
+            marker["attempts"] = previous.get("attempts", 1) + 1 if previous and previous.get("status") == "failed" else 1
+            if marker["attempts"] < self.max_attempts:
+                print(f"{job_id} failed (attempt {marker['attempts']} of {self.max_attempts}), it will be retried")
+            else:
+                print(f"{job_id} failed {marker['attempts']} times, giving up")
+        tmp_path = os.path.join(self.done_dir, f".{job_id}.{token}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(marker, f)
+        os.replace(tmp_path, self._marker_path(job_id))
+
+    def is_done(self, job_id: str) -> bool:
+        """True once a job finished, or failed max_attempts times."""
+        marker = self._read_marker(job_id)
+        if marker is None:
+            return False
+        return marker.get("status") != "failed" or marker.get("attempts", 1) >= self.max_attempts
+
+    def _create_lease(self, job_id: str, token: str) -> bool:
+        """Atomically create the lease file. Returns False if someone else holds it."""
+        lease_path = self._lease_path(job_id)
+        tmp_path = os.path.join(self.lease_dir, f".{job_id}.{token}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"token": token, "worker": self.worker_id, "acquired": time.time()}, f)
+        try:
+            # link() is atomic even on NFS, where O_EXCL is not guaranteed
+            os.link(tmp_path, lease_path)
+            return True
+        except FileExistsError:
+            return False
+        except OSError:
+            # Filesystems without hard links: fall back to an exclusive create
+            try:
+                fd = os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                return False
+            with os.fdopen(fd, "w") as f:
+                json.dump({"token": token, "worker": self.worker_id, "acquired": time.time()}, f)
+            return True
+        finally:
+            try:
+                os.remove(tmp_path)
+            except FileNotFoundError:
+                pass
+
+    def _reclaim_if_expired(self, job_id: str) -> bool:
+        """Remove an expired lease left behind by a crashed worker. Returns True if the slot is free."""
+        lease_path = self._lease_path(job_id)
+        try:
+            age = self._server_now() - os.stat(lease_path).st_mtime
+        except FileNotFoundError:
+            return True
+        if age < self.lease_ttl:
+            return False
+
+        stale = self._read_lease(lease_path)
+        stale_token = stale.get("token") if stale else "unknown"
+        # Only one worker can move the stale lease aside
+        reclaim_path = os.path.join(self.lease_dir, f".{job_id}.{stale_token}.{self.worker_id}.reclaimed")
+        try:
+            os.rename(lease_path, reclaim_path)
+        except FileNotFoundError:
+            return True
+
+        moved = self._read_lease(reclaim_path)
+        try:
+            # A heartbeat between the stat and the rename refreshed the same file: the owner is alive
+            refreshed = self._server_now() - os.stat(reclaim_path).st_mtime < self.lease_ttl
+        except FileNotFoundError:
+            return True
+        if refreshed or (moved and moved.get("token") != stale_token):
+            # The lease is live (heartbeat, or another worker re-leased the job meanwhile): put it back
+            try:
+                os.link(reclaim_path, lease_path)
+            except OSError:
+                pass
+            os.remove(reclaim_path)
+            return False
+
+        os.remove(reclaim_path)
+        print(f"Reclaimed expired lease on {job_id} from {stale.get('worker') if stale else 'unknown worker'}")
+        return True
+
+    def try_claim(self, job_id: str) -> Optional[Lease]:
+        """Claim a job if it is neither finished nor leased by a live worker."""
+        if self.is_done(job_id):
+            return None
+        if os.path.exists(self._lease_path(job_id)) and not self._reclaim_if_expired(job_id):
+            return None
+        token = uuid.uuid4().hex
+        if not self._create_lease(job_id, token):
+            return None
+        # The job may have finished between the check and the claim
+        if self.is_done(job_id):
+            os.remove(self._lease_path(job_id))
+            return None
+        return Lease(self, job_id, token)
+
+    def claim_next(self, job_ids: List[str]) -> Optional[Lease]:
+        """Claim the first available job. Workers scan in random order to avoid contention."""
+        candidates = [job_id for job_id in job_ids if not self.is_done(job_id)]
+        random.shuffle(candidates)
+        for job_id in candidates:
+            lease = self.try_claim(job_id)
+            if lease:
+                return lease
+        return None
+
+    def pending(self, job_ids: List[str]) -> List[str]:
+        return [job_id for job_id in job_ids if not self.is_done(job_id)]
+
+def run_worker(process_job: Callable[[str, Lease], bool], input_dir: str = config.INPUT_VIDEOS_DIR,
+               queue: Optional[JobQueue] = None, wait_for_leased: bool = True, poll_interval: float = 1.0,
+               jobs_in_flight: int = 1) -> int:
+    """
+    Drain the shared input directory: claim videos and process them.
+
+    Args:
+        process_job: Called with (video_path, lease); returns True on success. It should check
+                     lease.is_valid() before publishing its output.
+        input_dir: Shared directory with the input videos
+        queue: JobQueue to use (defaults to one on config.QUEUE_DIR)
+        wait_for_leased: If True, keep polling while other workers hold leases, so jobs of
+                         crashed workers are picked up once their leases expire
+        poll_interval: Seconds between polls while waiting
+        jobs_in_flight: Jobs processed at the same time, each on its own thread; the stages
+                        they share are limited by the stage scheduler
+
+    Returns:
+        Number of jobs processed by this worker
+    """
+    queue = queue or JobQueue()
+    processed = 0
+    processed_lock = threading.Lock()
+
+    def drain():
+        nonlocal processed
+        while True:
+            video_files = {os.path.basename(path): path for path in get_video_files(input_dir)}
+            lease = queue.claim_next(sorted(video_files))
+            if lease is None:
+                if not wait_for_leased or not queue.pending(list(video_files)):
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            print(f"Worker {queue.worker_id} claimed {lease.job_id}")
+            status = "failed"
+            try:
+                if process_job(video_files[lease.job_id], lease):
+                    status = "done"
+                    with processed_lock:
+                        processed += 1
+            except Exception as e:
+                print(f"Error processing {lease.job_id}: {e}")
+            finally:
+                lease.release(status)
+
+    threads = [threading.Thread(target=drain) for _ in range(max(1, jobs_in_flight) - 1)]
+    for thread in threads:
+        thread.start()
+    drain()
+    for thread in threads:
+        thread.join()
+    return processed
+
+# For testing
+if __name__ == "__main__":
+    import multiprocessing
+    import tempfile
+
+    def demo_job(video_path: str, lease: Lease) -> bool:
+        time.sleep(0.2)
+        with open(video_path + ".log", "a") as f:
+            f.write(f"{lease.queue.worker_id}\n")
+        return True
+
+    def demo_worker(input_dir: str, queue_dir: str, crash: bool):
+        queue = JobQueue(queue_dir, lease_ttl=1.0)
+        if crash:
+            # Claim one job and die without releasing it
+            queue.claim_next(sorted(os.listdir(input_dir)))
+            os._exit(1)
+        run_worker(demo_job, input_dir, queue, poll_interval=0.2)
+
+    with tempfile.TemporaryDirectory() as shared_dir:
+        demo_input = os.path.join(shared_dir, "input_videos")
+        demo_queue = os.path.join(shared_dir, "queue")
+        os.makedirs(demo_input)
+        for i in range(20):
+            open(os.path.join(demo_input, f"clip_{i:02d}.mp4"), "w").close()
+
+        crasher = multiprocessing.Process(target=demo_worker, args=(demo_input, demo_queue, True))
+        crasher.start()
+        crasher.join()
+
+        workers = [multiprocessing.Process(target=demo_worker, args=(demo_input, demo_queue, False)) for _ in range(4)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+        counts = []
+        for i in range(20):
+            log_path = os.path.join(demo_input, f"clip_{i:02d}.mp4.log")
+            with open(log_path) as f:
+                counts.append(len(f.read().splitlines()))
+        print(f"Jobs processed exactly once: {all(count == 1 for count in counts)} ({counts})")
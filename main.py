@@ -6,14 +6,18 @@ Integrates all components to create a complete prototype.
 import os
 import sys
 import time
+import argparse
 from dotenv import load_dotenv
 
 # Import modules
 import config
 from video_selector import select_random_video
-from text_generator import generate_text
+from text_generator import caption_seed, generate_text, remember_caption, warm_up_responses
 from speech_generator import text_to_speech
 from video_editor import process_video
+from job_queue import Lease, run_worker
+from stage_scheduler import get_scheduler, stage_slot
+from preview import render_contact_sheet, render_preview
 
 def setup_environment():
     """Set up the environment for the bot."""
@@ -33,40 +37,75 @@ def setup_environment():
     
     return True
 
-def process_random_video():
-    """Process a random video from the input directory."""
-    print("\n=== Video Modification Bot ===")
-    print("Starting video processing...")
-    
-    # Step 1: Select a random video
-    print("\nStep 1: Selecting random video...")
-    video_path = select_random_video()
-    if not video_path:
-        print("Error: No videos found in the input directory.")
-        print(f"Please add some videos to {config.INPUT_VIDEOS_DIR}")
-        return None
+def process_video_file(video_path: str, output_path: str = None, audio_file: str = None, preview: str = None, seed: int = None):
+    """
+    Run the caption, speech and video steps for one input video.
     
+    Args:
+        video_path: Path to the input video
+        output_path: Path for the final video (if None, a default path will be created)
+        audio_file: Path for the generated speech (if None, it is named after the caption)
+        preview: "video" for a low-resolution preview, "sheet" for a contact sheet,
+                 None for the full render
+        seed: Caption seed; the same seed reproduces the caption (random if None)
+        
+    Returns:
+        Tuple of (output path, caption text), or None if a step fails
+    """
     # Step 2: Generate text
     print("\nStep 2: Generating motivational text...")
-    caption_text = generate_text()
+    with stage_slot("text"):
+        caption_text = generate_text(seed=seed)
     if not caption_text:
         print("Error: Failed to generate text.")
         return None
     
     # Step 3: Convert text to speech
     print("\nStep 3: Converting text to speech...")
-    audio_path = text_to_speech(caption_text)
+    with stage_slot("speech"):
+        audio_path = text_to_speech(caption_text, audio_file)
     if not audio_path:
         print("Error: Failed to convert text to speech.")
         return None
     
     # Step 4: Process the video (add caption and audio)
-    print("\nStep 4: Processing video (adding caption and audio)...")
-    output_path = process_video(video_path, caption_text, audio_path)
+    if preview == "video":
+        print("\nStep 4: Rendering preview (reduced resolution and frame rate)...")
+        output_path = render_preview(video_path, caption_text, audio_path, output_path)
+    elif preview == "sheet":
+        print("\nStep 4: Rendering contact sheet of the caption words...")
+        output_path = render_contact_sheet(video_path, caption_text, audio_path, output_path)
+    else:
+        print("\nStep 4: Processing video (adding caption and audio)...")
+        output_path = process_video(video_path, caption_text, audio_path, output_path)
     if not output_path:
         print("Error: Failed to process video.")
         return None
     
+    # The caller remembers the caption (remember_caption) once the output is published
+    return output_path, caption_text
+
+def process_random_video(preview: str = None):
+    """Process a random video from the input directory."""
+    print("\n=== Video Modification Bot ===")
+    print("Starting video processing...")
+    
+    # Step 1: Select a random video
+    print("\nStep 1: Selecting random video...")
+    video_path = select_random_video()
+    if not video_path:
+        print("Error: No videos found in the input directory.")
+        print(f"Please add some videos to {config.INPUT_VIDEOS_DIR}")
+        return None
+    
+    result = process_video_file(video_path, preview=preview)
+    if not result:
+        return None
+    output_path, caption_text = result
+    if preview is None:
+        # Later captions that are near-duplicates of this one get regenerated
+        remember_caption(caption_text)
+    
     print("\n=== Processing Complete ===")
     print(f"Original video: {os.path.basename(video_path)}")
     print(f"Generated caption: \"{caption_text}\"")
@@ -74,21 +113,93 @@ def process_random_video():
     
     return output_path
 
+def process_leased_video(video_path: str, lease: Lease) -> bool:
+    """
+    Process a video claimed from the shared queue.
+    The output is rendered under a temporary name and only published while the lease is still ours.
+    """
+    name, ext = os.path.splitext(os.path.basename(video_path))
+    final_path = os.path.join(config.OUTPUT_VIDEOS_DIR, f"{name}_processed{ext}")
+    partial_path = os.path.join(config.OUTPUT_VIDEOS_DIR, f"{name}_processed.partial-{lease.token}{ext}")
+    # Name the speech after the job so nodes never write the same audio file
+    audio_file = os.path.join(config.OUTPUT_VIDEOS_DIR, f"{name}_audio.mp3")
+    
+    # Seeded by the job, so a retry gets the stored caption instead of a new LLM request
+    result = process_video_file(video_path, partial_path, audio_file, seed=caption_seed(lease.job_id))
+    if not result or not os.path.exists(partial_path):
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        return False
+    
+    if not lease.is_valid():
+        print(f"Lease on {lease.job_id} was lost, discarding this render.")
+        os.remove(partial_path)
+        return False
+    
+    os.replace(partial_path, final_path)
+    print(f"Output video: {final_path}")
+    # Only published captions count as used; a discarded render's retry must reproduce its caption
+    remember_caption(result[1])
+    return True
+
+def run_queue_worker():
+    """Drain the shared input directory together with other render nodes."""
+    print("\n=== Video Modification Bot (queue worker) ===")
+    # Several jobs in flight, so the LLM, TTS, render and encode stages work side by side
+    processed = run_worker(process_leased_video, jobs_in_flight=config.PIPELINE_JOBS)
+    print(f"\nQueue drained. This worker processed {processed} video(s).")
+    get_scheduler().report()
+
 def main():
     """Main function to run the Video Modification Bot."""
+    parser = argparse.ArgumentParser(description="Video Modification Bot")
+    parser.add_argument("--worker", action="store_true",
+                        help="Process every video in the input folder, sharing the work with other nodes")
+    parser.add_argument("--preview", action="store_true",
+                        help="Render a quick low-resolution preview instead of the full video")
+    parser.add_argument("--contact-sheet", action="store_true",
+                        help="Render a contact sheet with one frame per caption word instead of the full video")
+    parser.add_argument("--warm-captions", type=int, nargs="?", const=config.TEXT_WARM_UP_COUNT, metavar="N",
+                        help="Pre-generate the captions of seeds 0 to N - 1 into the response store "
+                             "(default: TEXT_WARM_UP_COUNT) and exit")
+    parser.add_argument("--source", metavar="SOURCE",
+                        help="Render a stream instead of a random input video: '-' for stdin, "
+                             "an http(s):// URL or a range+http(s):// URL (parallel ranged reads)")
+    args = parser.parse_args()
+    
+    if args.warm_captions is not None:
+        warm_up_responses(args.warm_captions)
+        return
+    
     # Setup environment
     if not setup_environment():
         print("Environment setup incomplete. Please fix the issues and try again.")
         return
     
+    if args.source:
+        # Streams are decoded as they arrive, the preview modes need a seekable file
+        print("\n=== Video Modification Bot (stream) ===")
+        result = process_video_file(args.source)
+        if result:
+            remember_caption(result[1])
+            print(f"\nThe processed video is available at: {result[0]}")
+        else:
+            print("\nVideo processing failed. Please check the error messages above.")
+        return
+    
     # Check if input directory has videos
     if not os.listdir(config.INPUT_VIDEOS_DIR):
         print(f"No files found in the input directory: {config.INPUT_VIDEOS_DIR}")
         print("Please add some video files before running the bot.")
         return
     
+    if args.worker:
+        run_queue_worker()
+        return
+    
     # Process a random video
-    output_video = process_random_video()
+    preview = "sheet" if args.contact_sheet else "video" if args.preview else None
+    output_video = process_random_video(preview=preview)
     
     if output_video:
         print("\nVideo processing completed successfully!")
@@ -0,0 +1,350 @@
+"""
+Media introspection module for the Video Modification Bot.
+Probes each media file once (ffprobe, or OpenCV as a fallback) and memoizes the result
+so every pipeline stage can share the same stream, duration and frame rate information.
+"""
+
+import os
+import json
+import subprocess
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Optional, Tuple
+import config
+from toolchain import get_ffprobe_path
+
+@dataclass(frozen=True)
+class StreamInfo:
+    """Properties of a single stream inside a media file."""
+    index: int
+    codec_type: str
+    codec_name: str = ""
+    duration: Optional[float] = None
+    width: int = 0
+    height: int = 0
+    fps: Optional[Fraction] = None
+    r_frame_rate: Optional[Fraction] = None
+    frame_count: int = 0
+    rotation: int = 0
+    sample_rate: int = 0
+    channels: int = 0
+
+@dataclass(frozen=True)
+class MediaInfo:
+    """Result of probing a media file. Video helpers refer to the first video stream."""
+    path: str
+    size: int
+    mtime: float
+    format_name: str
+    duration: Optional[float]
+    streams: Tuple[StreamInfo, ...]
+    keyframes: Optional[Tuple[float, ...]] = None
+    # False for the OpenCV fallback, which only sees the video stream (no audio or subtitles)
+    streams_complete: bool = True
+
+    @property
+    def video(self) -> Optional[StreamInfo]:
+        return next((s for s in self.streams if s.codec_type == "video"), None)
+
+    @property
+    def audio(self) -> Optional[StreamInfo]:
+        return next((s for s in self.streams if s.codec_type == "audio"), None)
+
+    @property
+    def has_video(self) -> bool:
+        return self.video is not None
+
+    @property
+    def has_audio(self) -> bool:
+        return self.audio is not None
+
+    @property
+    def fps(self) -> Optional[Fraction]:
+        return self.video.fps if self.video else None
+
+    @property
+    def rotation(self) -> int:
+        return self.video.rotation if self.video else 0
+
+    @property
+    def width(self) -> int:
+        """Display width, i.e. after the rotation that OpenCV applies on decode."""
+        if not self.video:
+            return 0
+        return self.video.height if self.rotation in (90, 270) else self.video.width
+
+    @property
+    def height(self) -> int:
+        """Display height, i.e. after the rotation that OpenCV applies on decode."""
+        if not self.video:
+            return 0
+        return self.video.width if self.rotation in (90, 270) else self.video.height
+
+    @property
+    def frame_count(self) -> int:
+        if not self.video:
+            return 0
+        if self.video.frame_count:
+            return self.video.frame_count
+        # Containers like MKV don't store a frame count, estimate it from the duration
+        duration = self.video.duration or self.duration
+        if duration and self.fps:
+            return int(round(duration * self.fps))
+        return 0
+
+    @property
+    def video_duration(self) -> Optional[float]:
+        if not self.video:
+            return None
+        if self.video.frame_count and self.fps:
+            return float(self.video.frame_count / self.fps)
+        return self.video.duration or self.duration
+
+    @property
+    def is_vfr(self) -> bool:
+        """True when the nominal and average frame rates disagree (typical for phone clips)."""
+        video = self.video
+        if not video or not video.fps or not video.r_frame_rate:
+            return False
+        return abs(float(video.fps) - float(video.r_frame_rate)) > 0.01
+
+# Memoized probe results keyed by (absolute path, size, mtime), least recently used first
+_probe_cache: "OrderedDict[Tuple[str, int, float], MediaInfo]" = OrderedDict()
+_probe_lock = threading.Lock()
+
+def _cache_probe(key: Tuple[str, int, float], info: MediaInfo):
+    """Memoize a probe result, dropping the least recently used beyond PROBE_CACHE_SIZE."""
+    with _probe_lock:
+        _probe_cache[key] = info
+        _probe_cache.move_to_end(key)
+        while len(_probe_cache) > max(config.PROBE_CACHE_SIZE, 1):
+            _probe_cache.popitem(last=False)
+
+def _parse_rate(value: Optional[str]) -> Optional[Fraction]:
+    """Parse an ffprobe rational such as '30000/1001' into an exact Fraction."""
+    if not value:
+        return None
+    try:
+        rate = Fraction(value)
+    except (ValueError, ZeroDivisionError):
+        return None
+    return rate if rate > 0 else None
+
+def _parse_float(value) -> Optional[float]:
+    try:
+        return float(value) if value not in (None, "N/A") else None
+    except (TypeError, ValueError):
+        return None
+
+def _parse_rotation(stream: dict) -> int:
+    """Extract the display rotation (0, 90, 180 or 270) of a video stream."""
+    rotation = None
+    for side_data in stream.get("side_data_list", []):
+        if "rotation" in side_data:
+            rotation = side_data["rotation"]
+            break
+    if rotation is None:
+        rotation = stream.get("tags", {}).get("rotate", 0)
+    try:
+        return int(round(float(rotation))) % 360
+    except (TypeError, ValueError):
+        return 0
+
+def _probe_with_ffprobe(ffprobe_path: str, path: str, keyframes: bool, data: bytes = None) -> Optional[dict]:
+    """Run a single ffprobe invocation and return its parsed JSON output (data is piped in if given)."""
+    entries = (
+        "format=format_name,duration"
+        ":stream=index,codec_type,codec_name,width,height,r_frame_rate,avg_frame_rate,"
+        "nb_frames,duration,sample_rate,channels"
+        ":stream_side_data=rotation:stream_tags=rotate"
+    )
+    if keyframes:
+        # Packet flags are read from the container, no frames are decoded
+        entries += ":packet=stream_index,pts_time,flags"
+
+    cmd = [ffprobe_path, '-v', 'error', '-print_format', 'json', '-show_entries', entries,
+           'pipe:0' if data is not None else path]
+    result = subprocess.run(cmd, input=data, capture_output=True)
+    if result.returncode != 0:
+        print(f"Warning: ffprobe failed for {path}: {result.stderr.decode(errors='replace').strip()}")
+        return None
+    return json.loads(result.stdout)
+
+def _info_from_ffprobe(path: str, size: int, mtime: float, data: dict, keyframes: bool) -> MediaInfo:
+    streams = []
+    for stream in data.get("streams", []):
+        codec_type = stream.get("codec_type", "")
+        streams.append(StreamInfo(
+            index=int(stream.get("index", len(streams))),
+            codec_type=codec_type,
+            codec_name=stream.get("codec_name", ""),
+            duration=_parse_float(stream.get("duration")),
+            width=int(stream.get("width", 0) or 0),
+            height=int(stream.get("height", 0) or 0),
+            fps=_parse_rate(stream.get("avg_frame_rate")) or _parse_rate(stream.get("r_frame_rate")),
+            r_frame_rate=_parse_rate(stream.get("r_frame_rate")),
+            frame_count=int(stream.get("nb_frames", 0) or 0) if codec_type == "video" else 0,
+            rotation=_parse_rotation(stream) if codec_type == "video" else 0,
+            sample_rate=int(stream.get("sample_rate", 0) or 0),
+            channels=int(stream.get("channels", 0) or 0),
+        ))
+
+    keyframe_times = None
+    if keyframes:
+        video_index = next((s.index for s in streams if s.codec_type == "video"), None)
+        times = []
+        for packet in data.get("packets", []):
+            if packet.get("stream_index") == video_index and "K" in packet.get("flags", ""):
+                pts_time = _parse_float(packet.get("pts_time"))
+                if pts_time is not None:
+                    times.append(pts_time)
+        keyframe_times = tuple(sorted(times))
+
+    fmt = data.get("format", {})
+    return MediaInfo(
+        path=path,
+        size=size,
+        mtime=mtime,
+        format_name=fmt.get("format_name", ""),
+        duration=_parse_float(fmt.get("duration")),
+        streams=tuple(streams),
+        keyframes=keyframe_times,
+    )
+
+def _info_from_opencv(path: str, size: int, mtime: float) -> Optional[MediaInfo]:
+    """Fallback probe when ffprobe is unavailable. Only video properties can be read."""
+    import cv2
+
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps_value = cap.get(cv2.CAP_PROP_FPS)
+        if fps_value <= 0:
+            return None
+        fps = Fraction(fps_value).limit_denominator(1001)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        duration = float(frame_count / fps) if frame_count > 0 else None
+        # OpenCV already reports the display (rotated) dimensions
+        video = StreamInfo(
+            index=0,
+            codec_type="video",
+            duration=duration,
+            width=int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            height=int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            fps=fps,
+            r_frame_rate=fps,
+            frame_count=max(0, frame_count),
+        )
+    finally:
+        cap.release()
+
+    return MediaInfo(path=path, size=size, mtime=mtime, format_name="", duration=duration, streams=(video,),
+                     streams_complete=False)
+
+def probe_media(path: str, keyframes: bool = False) -> Optional[MediaInfo]:
+    """
+    Probe a media file, reusing the cached result while the file is unchanged.
+
+    Args:
+        path: Path to the media file
+        keyframes: If True, also collect the presentation times of the video keyframes
+
+    Returns:
+        MediaInfo for the file or None if it cannot be probed
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        print(f"Error: Media file {path} does not exist.")
+        return None
+
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+    with _probe_lock:
+        cached = _probe_cache.get(key)
+        if cached is not None:
+            _probe_cache.move_to_end(key)
+    if cached is not None and (not keyframes or cached.keyframes is not None):
+        return cached
+
+    info = None
+    ffprobe_path = get_ffprobe_path()
+    if ffprobe_path:
+        try:
+            data = _probe_with_ffprobe(ffprobe_path, path, keyframes)
+            if data is not None:
+                info = _info_from_ffprobe(path, stat.st_size, stat.st_mtime, data, keyframes)
+        except Exception as e:
+            print(f"Warning: Error probing {path} with ffprobe: {e}")
+
+    if info is None:
+        info = _info_from_opencv(path, stat.st_size, stat.st_mtime)
+
+    if info is not None:
+        _cache_probe(key, info)
+    return info
+
+def probe_stream(source: str, data: bytes = None) -> Optional[MediaInfo]:
+    """
+    Probe a stream that is not a local file: a URL ffprobe can read, or the first bytes of a
+    pipe given as data. Results are not cached, since streams can't be checked for changes.
+
+    Args:
+        source: URL, or a name for the piped stream
+        data: Leading bytes of the stream (probed instead of the URL if given)
+
+    Returns:
+        MediaInfo (size and mtime are 0) or None if the stream cannot be probed
+    """
+    ffprobe_path = get_ffprobe_path()
+    if not ffprobe_path:
+        print("Error: ffprobe is required to probe streams.")
+        return None
+    try:
+        probed = _probe_with_ffprobe(ffprobe_path, source, False, data)
+    except Exception as e:
+        print(f"Warning: Error probing {source}: {e}")
+        return None
+    return _info_from_ffprobe(source, 0, 0.0, probed, False) if probed is not None else None
+
+def remember_audio_duration(path: str, duration: float, sample_rate: int, channels: int = 1) -> Optional[MediaInfo]:
+    """
+    Seed the probe cache for an audio file whose exact duration is already known
+    (e.g. counted from the samples that were just written), so it is never probed.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    codec_name = "pcm_s16le" if extension == "wav" else extension
+    stream = StreamInfo(index=0, codec_type="audio", codec_name=codec_name, duration=duration,
+                        sample_rate=sample_rate, channels=channels)
+    info = MediaInfo(path=path, size=stat.st_size, mtime=stat.st_mtime, format_name=extension,
+                     duration=duration, streams=(stream,))
+    _cache_probe((os.path.abspath(path), stat.st_size, stat.st_mtime), info)
+    return info
+
+def clear_probe_cache():
+    """Forget all memoized probe results."""
+    with _probe_lock:
+        _probe_cache.clear()
+
+# For testing
+if __name__ == "__main__":
+    import sys
+
+    for media_path in sys.argv[1:]:
+        media = probe_media(media_path, keyframes=True)
+        if not media:
+            print(f"Could not probe {media_path}")
+            continue
+        print(f"{media_path}: {media.format_name}, duration {media.duration}")
+        for stream in media.streams:
+            print(f"  {stream}")
+        if media.has_video:
+            print(f"  display size {media.width}x{media.height} at {media.fps} fps, "
+                  f"{media.frame_count} frames, rotation {media.rotation}, vfr={media.is_vfr}")
+            print(f"  {len(media.keyframes)} keyframes")
@@ -0,0 +1,221 @@
+"""
+Mezzanine cache for the Video Modification Bot.
+Sources that OpenCV decodes slowly or inaccurately (variable frame rate, long-GOP or exotic
+codecs, odd containers) are transcoded once into a constant-frame-rate, short-GOP H.264
+intermediate. Intermediates are cached by a fingerprint of the source and evicted by size,
+so later renders of the same clip decode from the fast copy.
+"""
+
+import os
+import hashlib
+import subprocess
+import threading
+import uuid
+from fractions import Fraction
+from typing import Optional
+import config
+from media_info import MediaInfo, probe_media
+from toolchain import get_capabilities, get_ffmpeg_path, select_video_encoder
+
+# Bump when the transcode settings change so old intermediates are not reused
+_MEZZANINE_VERSION = 1
+
+# Codecs that OpenCV decodes slowly or seeks poorly in
+SLOW_DECODE_CODECS = {"hevc", "vp9", "av1", "wmv1", "wmv2", "wmv3", "vc1", "flv1", "msmpeg4v2", "msmpeg4v3", "rv40"}
+
+# Containers without reliable frame counts or seeking
+ODD_CONTAINERS = {"asf", "flv", "rm", "mpeg", "mpegts"}
+
+# Frame rates intermediates are snapped to when the source is close to one
+STANDARD_FRAME_RATES = [Fraction(24000, 1001), Fraction(24), Fraction(25), Fraction(30000, 1001), Fraction(30),
+                        Fraction(50), Fraction(60000, 1001), Fraction(60)]
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+def mezzanine_reason(info: MediaInfo, scan_keyframes: bool = True) -> Optional[str]:
+    """
+    Why a source should be normalized before rendering, or None if it decodes well as is.
+    The stream metadata is checked first; the keyframe scan only runs when it doesn't decide.
+
+    Args:
+        info: Probe result of the source (without keyframes)
+        scan_keyframes: If False, skip the keyframe scan that detects long GOPs
+    """
+    video = info.video
+    if video is None:
+        return None
+    if info.is_vfr:
+        return "variable frame rate"
+    if video.codec_name in SLOW_DECODE_CODECS:
+        return f"slow-decoding codec {video.codec_name}"
+    if ODD_CONTAINERS.intersection(info.format_name.split(",")):
+        return f"container {info.format_name}"
+    # No frame count (Matroska, WebM) is fine: it is estimated from the duration, and the
+    # keyframe scan below catches the sources that seek badly
+    duration = info.video_duration or info.duration
+    if not scan_keyframes or (duration and duration <= config.MEZZANINE_MAX_SOURCE_GOP_SECONDS):
+        # A clip this short can't have a longer GOP
+        return None
+
+    # The keyframe scan reads packet headers only, no frames are decoded
+    keyed = probe_media(info.path, keyframes=True)
+    if keyed and keyed.keyframes:
+        times = list(keyed.keyframes) + [keyed.video_duration or keyed.duration or keyed.keyframes[-1]]
+        longest_gop = max(b - a for a, b in zip(times, times[1:])) if len(times) > 1 else 0.0
+        if longest_gop > config.MEZZANINE_MAX_SOURCE_GOP_SECONDS:
+            return f"long GOP ({longest_gop:.1f}s between keyframes)"
+    return None
+
+def source_fingerprint(path: str, sample_bytes: int = 1024 * 1024) -> str:
+    """
+    Identify a source by its size and the content of its first and last megabyte,
+    so renamed or copied files still hit the cache while edited ones don't.
+    """
+    size = os.path.getsize(path)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{size}:{_MEZZANINE_VERSION}:{config.MEZZANINE_GOP_SECONDS}".encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(sample_bytes))
+        if size > sample_bytes:
+            f.seek(max(sample_bytes, size - sample_bytes))
+            digest.update(f.read(sample_bytes))
+    return digest.hexdigest()
+
+def _constant_rate(info: MediaInfo) -> Fraction:
+    """Frame rate for the intermediate: the nearest standard rate if the source is close to one."""
+    fps = info.fps or Fraction(30)
+    nearest = min(STANDARD_FRAME_RATES, key=lambda rate: abs(rate - fps))
+    if abs(nearest - fps) / nearest < 0.03:
+        return nearest
+    return Fraction(round(fps)) if fps >= 1 else Fraction(1)
+
+def _encoder_args(gop: int) -> list:
+    caps = get_capabilities()
+    if caps is None or caps.has_encoder("libx264"):
+        # No B-frames and the fastdecode tuning keep decoding cheap; near-lossless quality
+        args = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '16', '-tune', 'fastdecode', '-bf', '0']
+    else:
+        args = select_video_encoder()
+    return args + ['-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0', '-pix_fmt', 'yuv420p']
+
+def _transcode(source: str, info: MediaInfo, output_path: str) -> bool:
+    ffmpeg_path = get_ffmpeg_path()
+    if not ffmpeg_path:
+        print("Error: FFmpeg not found, can't create a mezzanine file.")
+        return False
+
+    fps = _constant_rate(info)
+    gop = max(1, int(round(float(fps) * config.MEZZANINE_GOP_SECONDS)))
+    tmp_path = f"{output_path}.{uuid.uuid4().hex[:8]}.tmp.mp4"
+    cmd = [
+        ffmpeg_path, '-y', '-v', 'error',
+        '-i', source,
+        '-map', '0:v:0', '-an', '-sn', '-dn',
+        # Constant frame rate; rotation is applied to the pixels so the copy plays upright
+        '-vf', f'fps={fps.numerator}/{fps.denominator}',
+    ] + _encoder_args(gop) + ['-movflags', '+faststart', tmp_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Error creating mezzanine file: {result.stderr.strip()}")
+            return False
+        # Publish atomically so concurrent renders never see a partial file
+        os.replace(tmp_path, output_path)
+        return True
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _evict(keep: str):
+    """Delete least recently used intermediates until the cache fits MEZZANINE_CACHE_MB."""
+    limit = config.MEZZANINE_CACHE_MB * 1024 * 1024
+    entries = []
+    for name in os.listdir(config.MEZZANINE_DIR):
+        path = os.path.join(config.MEZZANINE_DIR, name)
+        if name.endswith(".mp4") and ".tmp" not in name:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= limit:
+            break
+        if os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+            print(f"Evicted mezzanine file {path}")
+        except FileNotFoundError:
+            pass
+        total -= size
+
+def get_render_source(video_path: str) -> str:
+    """
+    Path that renders should decode frames from: a cached mezzanine copy for hostile sources,
+    otherwise the source itself. The copy is created on first use.
+
+    Args:
+        video_path: Path to the source video
+
+    Returns:
+        Path to the mezzanine file, or video_path if none is needed (or it can't be created)
+    """
+    if not config.MEZZANINE_ENABLED:
+        return video_path
+    info = probe_media(video_path)
+    if not info:
+        return video_path
+    reason = mezzanine_reason(info, scan_keyframes=False)
+    fingerprint = source_fingerprint(video_path)
+    mezzanine_path = os.path.join(config.MEZZANINE_DIR, f"{fingerprint}.mp4")
+    if not reason:
+        # An intermediate of this exact source means it was normalized before; only scan the keyframes if not
+        reason = "normalized before" if os.path.exists(mezzanine_path) else mezzanine_reason(info)
+    if not reason:
+        return video_path
+
+    os.makedirs(config.MEZZANINE_DIR, exist_ok=True)
+
+    # One transcode per source within this process; other processes are covered by the atomic publish
+    with _locks_guard:
+        lock = _locks.setdefault(fingerprint, threading.Lock())
+    with lock:
+        if os.path.exists(mezzanine_path):
+            # Refresh the modification time, which orders eviction
+            os.utime(mezzanine_path, None)
+            print(f"Using cached mezzanine file for {video_path} ({reason})")
+            return mezzanine_path
+
+        print(f"Normalizing {video_path} ({reason}) into a mezzanine file...")
+        if not _transcode(video_path, info, mezzanine_path):
+            return video_path
+    _evict(keep=mezzanine_path)
+    return mezzanine_path
+
+# For testing
+if __name__ == "__main__":
+    import sys
+    import time
+    import cv2
+
+    for source_path in sys.argv[1:]:
+        start = time.perf_counter()
+        render_path = get_render_source(source_path)
+        print(f"{source_path} -> {render_path} in {time.perf_counter() - start:.2f}s")
+        for path in dict.fromkeys([source_path, render_path]):
+            cap = cv2.VideoCapture(path)
+            start = time.perf_counter()
+            frames = 0
+            while cap.grab():
+                frames += 1
+            decode_time = time.perf_counter() - start
+            start = time.perf_counter()
+            cap.set(cv2.CAP_PROP_POS_FRAMES, frames // 2)
+            cap.read()
+            seek_time = time.perf_counter() - start
+            print(f"  {path}: {frames} frames decoded in {decode_time:.2f}s, "
+                  f"reported {int(cap.get(cv2.CAP_PROP_FRAME_COUNT))}, mid seek {seek_time * 1000:.0f} ms")
+            cap.release()
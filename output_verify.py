@@ -0,0 +1,239 @@
+"""
+Output verification module for the Video Modification Bot.
+Checks a finished output without decoding it again: the container metadata (streams,
+durations, frame count and keyframes from the index) is read with one ffprobe call, and only
+a few frames are decoded, right after word transitions or keyframes where decoding is cheapest,
+to confirm that the caption was drawn. A failed mux that
+left the captioned video without audio, a truncated encode or missing captions are reported
+as structured results with the time the checks took.
+"""
+
+import os
+import json
+import time
+import bisect
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+import cv2
+import numpy as np
+import config
+from caption_effects import IDENTITY_SCALE
+from caption_schedule import CaptionSchedule
+from media_info import probe_media
+
+# A caption pixel still matches the text color after chroma subsampling and compression
+# when no channel is further off than this
+COLOR_TOLERANCE = 60
+# Share of the glyph pixels of a sampled frame that must match the text color
+MIN_CAPTION_MATCH = 0.6
+# OpenCV seeks to the keyframe before (target - 16 frames) and decodes on from there
+SEEK_MARGIN = 16
+
+@dataclass(frozen=True)
+class VerificationCheck:
+    """Outcome of one check of an output (a skipped check counts as passed)."""
+    name: str
+    passed: bool
+    detail: str = ""
+    skipped: bool = False
+
+@dataclass(frozen=True)
+class VerificationResult:
+    """All checks of one output and how long they took."""
+    path: str
+    checks: Tuple[VerificationCheck, ...]
+    milliseconds: float
+
+    @property
+    def passed(self) -> bool:
+        return all(check.passed for check in self.checks)
+
+    @property
+    def failures(self) -> List[VerificationCheck]:
+        return [check for check in self.checks if not check.passed]
+
+    def summary(self) -> str:
+        """One line for the log."""
+        name = os.path.basename(self.path)
+        if self.passed:
+            skipped = [check.name for check in self.checks if check.skipped]
+            return (f"Verified {name}: {len(self.checks) - len(skipped)} checks passed"
+                    + (f", {', '.join(skipped)} skipped" if skipped else "") + f" in {self.milliseconds:.0f} ms")
+        failed = "; ".join(f"{check.name}: {check.detail}" for check in self.failures)
+        return f"Verification of {name} failed in {self.milliseconds:.0f} ms ({failed})"
+
+def _sample_frames(schedule: CaptionSchedule, animation, frame_count: int, keyframes: List[int],
+                   samples: int) -> List[int]:
+    """
+    Frames to check, one per stretch of the output: among the frames on which the caption is
+    fully opaque and at rest, the one closest after a keyframe, i.e. cheapest to decode. With
+    long GOPs that is the first settled frame after a word transition, or a keyframe itself.
+    """
+    settled = []
+    for frame in range(frame_count):
+        _, alpha = schedule.state_at(frame)
+        transform = animation.transform_at(schedule.entry_frame_at(frame)) if animation else None
+        if alpha == 255 and transform in (None, (IDENTITY_SCALE, 0.0, 0.0)):
+            settled.append(frame)
+
+    frames = []
+    for k in range(samples):
+        lo, hi = frame_count * k // samples, frame_count * (k + 1) // samples
+        stretch = [frame for frame in settled if lo <= frame < hi]
+        if stretch:
+            frames.append(min(stretch, key=lambda frame: frame - _keyframe_before(keyframes, frame)))
+    return frames
+
+def _keyframe_before(keyframes: List[int], frame: int) -> int:
+    """Keyframe a seek to a frame starts decoding from."""
+    index = bisect.bisect_right(keyframes, frame - SEEK_MARGIN) - 1
+    return keyframes[index] if index >= 0 else 0
+
+def _caption_match(frame: np.ndarray, text: str, renderer, placement=None) -> Optional[float]:
+    """Share of the caption's glyph pixels that have the text color, None if it has none to check."""
+    frame_height, frame_width = frame.shape[:2]
+    x, y, mask = renderer.text_pixels(text, frame_width, frame_height, placement)
+    # Crop the mask to the part of the caption inside the frame
+    sx, sy = max(0, -x), max(0, -y)
+    x, y = max(0, x), max(0, y)
+    mask = mask[sy:sy + frame_height - y, sx:sx + frame_width - x]
+    if not mask.any():
+        return None
+    region = frame[y:y + mask.shape[0], x:x + mask.shape[1]]
+    color = np.array(renderer.style.color[::-1], dtype=np.int16)
+    matches = np.abs(region[mask].astype(np.int16) - color).max(axis=1) < COLOR_TOLERANCE
+    return float(matches.mean())
+
+def _check_captions(path: str, schedule: CaptionSchedule, renderer, frame_count: int, keyframes: List[int],
+                    samples: int) -> VerificationCheck:
+    frames = _sample_frames(schedule, renderer.animation_for(schedule), frame_count, keyframes, samples)
+    if not frames:
+        return VerificationCheck("captions", True, "no settled caption frame to sample")
+
+    cap = cv2.VideoCapture(path)
+    decoded = 0
+    try:
+        if not cap.isOpened():
+            return VerificationCheck("captions", False, "could not open the video for sampling")
+        scores = []
+        position = 0  # Index of the next frame cap.read() returns
+        for frame_index in frames:
+            start = _keyframe_before(keyframes, frame_index)
+            if start <= position <= frame_index:
+                # Same GOP: decoding on from here is cheaper than seeking back to its keyframe
+                for _ in range(frame_index - position):
+                    cap.grab()
+                decoded += frame_index - position + 1
+            else:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+                decoded += frame_index - start + 1
+            ret, frame = cap.read()
+            position = frame_index + 1
+            if not ret:
+                return VerificationCheck("captions", False, f"could not decode frame {frame_index}")
+            text, _ = schedule.state_at(frame_index)
+            score = _caption_match(frame, text, renderer, schedule.placement_at(frame_index))
+            if score is not None:
+                scores.append((frame_index, score))
+    finally:
+        cap.release()
+
+    missing = [f"frame {frame_index} ({score * 100:.0f}%)" for frame_index, score in scores if score < MIN_CAPTION_MATCH]
+    if missing:
+        return VerificationCheck("captions", False, "caption not found on " + ", ".join(missing))
+    return VerificationCheck("captions", True, f"{len(scores)} sampled frames, {decoded} of {frame_count} frames decoded")
+
+def _duration_check(name: str, actual: Optional[float], expected: float, tolerance: float) -> VerificationCheck:
+    if actual is None:
+        return VerificationCheck(name, False, "unknown duration")
+    detail = f"{actual:.3f}s, expected {expected:.3f}s"
+    return VerificationCheck(name, abs(actual - expected) <= tolerance, detail)
+
+def write_report(result: VerificationResult, report_path: str = config.VERIFY_REPORT_FILE):
+    """Append a result to the JSON-lines verification report."""
+    os.makedirs(os.path.dirname(os.path.abspath(report_path)), exist_ok=True)
+    record = {"time": time.time(), "path": result.path, "passed": result.passed,
+              "milliseconds": round(result.milliseconds, 2),
+              "checks": [asdict(check) for check in result.checks]}
+    with open(report_path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+def verify_output(output_path: str, expected_duration: float, schedule: CaptionSchedule = None, renderer=None,
+                  caption_mode: str = "burn", expect_audio: bool = True,
+                  tolerance: float = config.VERIFY_DURATION_TOLERANCE,
+                  samples: int = config.VERIFY_SAMPLE_FRAMES) -> VerificationResult:
+    """
+    Verify a finished output from its container metadata and a few sampled frames.
+
+    Args:
+        output_path: Path to the output video
+        expected_duration: Planned length of the output in seconds
+        schedule: Caption schedule the output was rendered with (no frame sampling if None)
+        renderer: CaptionRenderer that drew the captions, used to locate the caption pixels
+        caption_mode: "burn" samples frames for the caption, "soft" checks for a subtitle track
+        expect_audio: If True, the output must have an audio stream of the expected length
+        tolerance: Allowed duration difference in seconds (one frame more is always allowed)
+        samples: Most frames decoded to look for the caption
+
+    Returns:
+        VerificationResult with one check per property
+    """
+    started = time.perf_counter()
+    checks = []
+
+    def result() -> VerificationResult:
+        return VerificationResult(output_path, tuple(checks), (time.perf_counter() - started) * 1000)
+
+    # One ffprobe call; keyframes come from the packet index, no frame is decoded
+    info = probe_media(output_path, keyframes=caption_mode == "burn") if os.path.exists(output_path) else None
+    if not info or not info.has_video:
+        checks.append(VerificationCheck("video", False, "missing or unreadable video stream"))
+        return result()
+    checks.append(VerificationCheck("video", True, f"{info.video.codec_name} {info.width}x{info.height}"))
+
+    fps = float(info.fps) if info.fps else 0.0
+    tolerance += 1 / fps if fps else 0.0
+    checks.append(_duration_check("duration", info.duration, expected_duration, tolerance))
+    checks.append(_duration_check("video_duration", info.video_duration, expected_duration, tolerance))
+    if info.video.frame_count and schedule is not None and caption_mode == "burn":
+        # Every planned frame was written, held tail frames included
+        checks.append(VerificationCheck("frame_count", abs(info.video.frame_count - schedule.total_frames) <= 1,
+                                        f"{info.video.frame_count} frames, expected {schedule.total_frames}"))
+
+    # The OpenCV fallback (no ffprobe) only sees the video stream, audio and subtitles are unknown
+    unknown = "unknown without ffprobe"
+    if expect_audio:
+        if not info.streams_complete:
+            checks.append(VerificationCheck("audio", True, unknown, skipped=True))
+        elif info.audio is None:
+            checks.append(VerificationCheck("audio", False, "no audio stream"))
+        else:
+            checks.append(VerificationCheck("audio", True, f"{info.audio.codec_name} {info.audio.sample_rate} Hz"))
+            if info.audio.duration is not None:
+                # Matroska doesn't store stream durations, the container duration is checked above
+                checks.append(_duration_check("audio_duration", info.audio.duration, expected_duration, tolerance))
+
+    if caption_mode == "soft":
+        if not info.streams_complete:
+            checks.append(VerificationCheck("captions", True, unknown, skipped=True))
+        else:
+            has_subtitles = any(stream.codec_type == "subtitle" for stream in info.streams)
+            checks.append(VerificationCheck("captions", has_subtitles,
+                                            "subtitle track" if has_subtitles else "no subtitle track"))
+    elif schedule is not None and renderer is not None and samples > 0:
+        frame_count = min(info.frame_count or schedule.total_frames, schedule.total_frames)
+        keyframes = sorted({int(round(t * fps)) for t in info.keyframes or ()})
+        checks.append(_check_captions(output_path, schedule, renderer, frame_count, keyframes, samples))
+    return result()
+
+# For testing
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 2:
+        print("Usage: python output_verify.py <video> [expected duration]")
+    else:
+        path = sys.argv[1]
+        probed = probe_media(path)
+        duration = float(sys.argv[2]) if len(sys.argv) > 2 else (probed.duration if probed else 0.0)
+        print(verify_output(path, duration or 0.0).summary())
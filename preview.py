@@ -0,0 +1,245 @@
+"""
+Preview module for the Video Modification Bot.
+Renders a cheap preview of a captioned video (reduced resolution and frame rate, with the
+voice muxed in) or a contact sheet with one frame per caption word, so the caption timing
+and style can be reviewed before committing to a full render.
+"""
+
+import os
+from typing import Optional
+import cv2
+import numpy as np
+import config
+from caption_placement import plan_caption_placement
+from caption_schedule import build_caption_schedule
+from caption_style import DEFAULT_STYLE, CaptionStyle
+from media_info import probe_media
+from mezzanine import get_render_source
+from video_editor import CaptionRenderer, add_audio_to_video, plan_output_duration
+from video_writer import open_video_writer
+
+class _FrameSeeker:
+    """Random access to source frames that grabs forward over short gaps and seeks over long ones."""
+
+    def __init__(self, cap, frame_count: int, seek_threshold: int):
+        self.cap = cap
+        self.frame_count = frame_count
+        self.seek_threshold = seek_threshold
+        self.position = 0  # Index of the next frame the decoder will return
+        self.last_frame = None
+
+    def read(self, frame_index: int) -> Optional[np.ndarray]:
+        """Return the source frame at an index; indexes past the end return the last frame."""
+        frame_index = min(frame_index, max(0, self.frame_count - 1))
+        if frame_index == self.position - 1 and self.last_frame is not None:
+            return self.last_frame
+
+        if frame_index < self.position or frame_index - self.position > self.seek_threshold:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
+            self.position = frame_index
+        # Skipped frames are only grabbed, never converted
+        while self.position < frame_index:
+            if not self.cap.grab():
+                return self.last_frame
+            self.position += 1
+
+        ret, frame = self.cap.read()
+        if not ret:
+            return self.last_frame
+        self.position += 1
+        self.last_frame = frame
+        return frame
+
+def _preview_durations(video_path: str, audio_path: Optional[str], audio_fit: str):
+    info = probe_media(get_render_source(video_path))
+    if not info or not info.has_video or not info.fps:
+        print(f"Error: Could not read video properties of {video_path}")
+        return None
+    audio_duration = None
+    if audio_path:
+        audio_info = probe_media(audio_path)
+        audio_duration = audio_info.duration if audio_info else None
+    output_duration = plan_output_duration(info.video_duration or 0.0, audio_duration, audio_fit)
+    return info, audio_duration, output_duration
+
+def render_preview(video_path: str, caption_text: str, audio_path: str, output_path: str = None,
+                   scale: float = config.PREVIEW_SCALE, fps: float = config.PREVIEW_FPS,
+                   word_by_word: bool = True, audio_fit: str = config.AUDIO_FIT,
+                   style: CaptionStyle = None) -> Optional[str]:
+    """
+    Render a low-cost preview: reduced resolution and frame rate, same caption timing as the full render.
+
+    Args:
+        video_path: Path to the input video file
+        caption_text: Text to display as caption
+        audio_path: Path to the voice audio to mux in
+        output_path: Path to save the preview (if None, a default path will be created)
+        scale: Resolution factor relative to the source
+        fps: Frame rate of the preview
+        word_by_word: If True, display one word at a time with animation
+        audio_fit: How the voice and video lengths are reconciled ("pad", "loop" or "trim")
+        style: Look of the captions (the CAPTION_* values in config if None)
+
+    Returns:
+        Path to the preview video or None if it fails
+    """
+    if not output_path:
+        name, ext = os.path.splitext(os.path.basename(video_path))
+        output_path = os.path.join(config.OUTPUT_VIDEOS_DIR, f"{name}_preview{ext}")
+
+    durations = _preview_durations(video_path, audio_path, audio_fit)
+    if not durations:
+        return None
+    info, audio_duration, output_duration = durations
+
+    source_fps = float(info.fps)
+    fps = min(fps, source_fps)
+    width = max(2, int(info.width * scale) // 2 * 2)
+    height = max(2, int(info.height * scale) // 2 * 2)
+
+    # The schedule is built for the full render so the preview shows the exact same timing and placement
+    # (the placement only if the source's shot analysis is cached, a preview never runs it)
+    total_frames = max(1, int(round(output_duration * source_fps)))
+    schedule = build_caption_schedule(caption_text, source_fps, total_frames, word_by_word=word_by_word,
+                                      audio_duration=audio_duration,
+                                      shot_placements=plan_caption_placement(video_path, style or DEFAULT_STYLE,
+                                                                             source_fps, total_frames,
+                                                                             cached_only=True))
+    renderer = CaptionRenderer((style or DEFAULT_STYLE).scaled(scale))
+    animation = renderer.animation_for(schedule)
+
+    cap = cv2.VideoCapture(info.path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video file {video_path}")
+        return None
+    silent_path = f"{os.path.splitext(output_path)[0]}_silent{os.path.splitext(output_path)[1]}"
+    out = open_video_writer(silent_path, fps, width, height)
+    if out is None:
+        cap.release()
+        print(f"Error: Could not create video writer for {silent_path}")
+        return None
+
+    seeker = _FrameSeeker(cap, info.frame_count, seek_threshold=int(source_fps * 2))
+    small = np.empty((height, width, 3), dtype=np.uint8)
+    preview_frames = max(1, int(round(output_duration * fps)))
+    print(f"Rendering preview: {preview_frames} frames at {width}x{height}, {fps:g} fps")
+
+    written = 0
+    try:
+        for preview_index in range(preview_frames):
+            source_index = int(preview_index * source_fps / fps)
+            frame = seeker.read(source_index)
+            if frame is None:
+                break
+            cv2.resize(frame, (width, height), dst=small, interpolation=cv2.INTER_AREA)
+            schedule_index = min(source_index, schedule.total_frames - 1)
+            text, alpha = schedule.state_at(schedule_index)
+            transform = animation.transform_at(schedule.entry_frame_at(schedule_index)) if animation else None
+            renderer.render_into(small, text, alpha, transform, schedule.placement_at(schedule_index))
+            out.write(small)
+            written += 1
+    finally:
+        cap.release()
+        ok = out.release() is not False
+
+    if not ok or written == 0:
+        print("Error: Preview rendering failed.")
+        return None
+
+    final_path = add_audio_to_video(silent_path, audio_path, output_path, audio_fit=audio_fit, duration=output_duration)
+    if final_path and final_path != silent_path and os.path.exists(silent_path):
+        os.remove(silent_path)
+    print(f"Preview saved to: {final_path}")
+    return final_path
+
+def render_contact_sheet(video_path: str, caption_text: str, audio_path: str = None, output_path: str = None,
+                         columns: int = 4, thumb_width: int = 320, word_by_word: bool = True,
+                         audio_fit: str = config.AUDIO_FIT, style: CaptionStyle = None) -> Optional[str]:
+    """
+    Render a contact sheet JPEG with one captioned frame per word transition.
+    Only the frames on the sheet are decoded in full; the decoder seeks or grabs past the rest.
+
+    Args:
+        video_path: Path to the input video file
+        caption_text: Text to display as caption
+        audio_path: Path to the voice audio, used for the caption timing
+        output_path: Path to save the JPEG (if None, a default path will be created)
+        columns: Number of thumbnails per row
+        thumb_width: Width of each thumbnail in pixels
+        word_by_word: If True, display one word at a time with animation
+        audio_fit: How the voice and video lengths are reconciled ("pad", "loop" or "trim")
+        style: Look of the captions (the CAPTION_* values in config if None)
+
+    Returns:
+        Path to the contact sheet or None if it fails
+    """
+    if not output_path:
+        name, _ = os.path.splitext(os.path.basename(video_path))
+        output_path = os.path.join(config.OUTPUT_VIDEOS_DIR, f"{name}_contact_sheet.jpg")
+
+    durations = _preview_durations(video_path, audio_path, audio_fit)
+    if not durations:
+        return None
+    info, audio_duration, output_duration = durations
+
+    source_fps = float(info.fps)
+    total_frames = max(1, int(round(output_duration * source_fps)))
+    schedule = build_caption_schedule(caption_text, source_fps, total_frames, word_by_word=word_by_word,
+                                      audio_duration=audio_duration,
+                                      shot_placements=plan_caption_placement(video_path, style or DEFAULT_STYLE,
+                                                                             source_fps, total_frames,
+                                                                             cached_only=True))
+    renderer = CaptionRenderer(style)
+    thumb_height = max(2, int(info.height * thumb_width / info.width))
+
+    cap = cv2.VideoCapture(info.path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video file {video_path}")
+        return None
+    seeker = _FrameSeeker(cap, info.frame_count, seek_threshold=int(source_fps * 2))
+
+    thumbs = []
+    try:
+        for start in schedule.transition_frames():
+            # Show each word once it has fully faded in
+            frame_index = min(start + schedule.fade_frames, schedule.total_frames - 1)
+            frame = seeker.read(frame_index)
+            if frame is None:
+                break
+            text, alpha = schedule.state_at(frame_index)
+            captioned = renderer.render(frame, text, alpha, placement=schedule.placement_at(frame_index))
+            thumb = cv2.resize(captioned, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+            cv2.putText(thumb, f"{frame_index / source_fps:.2f}s", (6, 18), cv2.FONT_HERSHEY_SIMPLEX,
+                        0.5, (255, 255, 255), 1, cv2.LINE_AA)
+            thumbs.append(thumb)
+    finally:
+        cap.release()
+
+    if not thumbs:
+        print("Error: Could not read any frames for the contact sheet.")
+        return None
+
+    columns = min(columns, len(thumbs))
+    rows = (len(thumbs) + columns - 1) // columns
+    sheet = np.zeros((rows * thumb_height, columns * thumb_width, 3), dtype=np.uint8)
+    for i, thumb in enumerate(thumbs):
+        row, column = divmod(i, columns)
+        sheet[row * thumb_height:(row + 1) * thumb_height, column * thumb_width:(column + 1) * thumb_width] = thumb
+
+    cv2.imwrite(output_path, sheet, [cv2.IMWRITE_JPEG_QUALITY, 85])
+    print(f"Contact sheet with {len(thumbs)} frames saved to: {output_path}")
+    return output_path
+
+# For testing
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) < 4:
+        print("Usage: python preview.py <video> <caption> <audio> [--sheet]")
+        sys.exit(1)
+
+    os.makedirs(config.OUTPUT_VIDEOS_DIR, exist_ok=True)
+    if "--sheet" in sys.argv[4:]:
+        render_contact_sheet(sys.argv[1], sys.argv[2], sys.argv[3])
+    else:
+        render_preview(sys.argv[1], sys.argv[2], sys.argv[3])
@@ -0,0 +1,336 @@
+"""
+Quote bank for the Video Modification Bot.
+A local collection of captions to fall back on when the language model misses its deadline.
+The quotes (from QUOTE_BANK_FILE, the built-in defaults and every caption in the response
+store) are packed into a compact index: one UTF-8 blob with offsets, grouped into length
+buckets that are pre-shuffled. Picking a quote of a given length is a cursor step in a
+bucket, and a quote only comes back once the rest of its bucket has been used, also across
+worker processes, which share the cursors. Captions added to the store later are merged in
+at the cursors, so the shuffle and the record of recently used quotes survive.
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import contextlib
+from typing import Iterable, List, Optional
+import numpy as np
+import config
+from text_cache import get_response_store
+
+# Width in characters of the length buckets
+BUCKET_CHARS = 20
+
+# Cursor steps a process reserves in the shared state at a time: the state file is written
+# once per this many picks of a bucket, and concurrent workers never get the same positions
+RESERVE_STEPS = 8
+# A state lock file older than this was left behind by a crashed process
+LOCK_STALE_SECONDS = 10.0
+
+# Bump when the index layout changes
+_INDEX_VERSION = 2
+
+# Built-in quotes, so the bank is never empty
+DEFAULT_QUOTES = [
+    "Life isn't about finding yourself; it's about creating yourself.",
+    "The best way to predict the future is to create it.",
+    "Every mountain top is within reach if you just keep climbing.",
+    "Stars can't shine without darkness.",
+    "Dream big, stay positive, work hard, and enjoy the journey.",
+    "Every journey begins with a single step. The path to success is paved with small victories."
+]
+
+class QuoteBank:
+    """
+    Quote index with per-bucket cursors that rotate through the shuffled quotes. The cursors are
+    shared through the state file: each process reserves a few steps at a time under a lock
+    file, so concurrent workers never hand out the same quotes.
+    """
+
+    def __init__(self, index_path: str, state_path: str = None):
+        self.index_path = index_path
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self):
+        with np.load(self.index_path) as data:
+            self.blob = data["blob"].tobytes()
+            self.offsets = data["offsets"]
+            self.order = data["order"]
+            self.bucket_starts = data["bucket_starts"]
+            self.signature = str(data["signature"])
+            self.store_version = str(data["store_version"])
+        self._index_state = _file_state(self.index_path)
+        self._known = None
+        # Cursor steps reserved by this process, next to end, per bucket
+        self._next = np.zeros(len(self.bucket_starts) - 1, dtype=np.int64)
+        self._end = np.zeros_like(self._next)
+
+    def _reload_if_changed(self):
+        """Pick up an index another process rebuilt or merged into."""
+        if _file_state(self.index_path) == self._index_state:
+            return
+        try:
+            self._load_index()
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Warning: Keeping the loaded quote bank, {self.index_path} is unreadable: {e}")
+
+    @staticmethod
+    def build(quotes: Iterable[str], index_path: str, signature: str = "", store_version: str = ""):
+        """Write the index of the given quotes (duplicates and blank lines are dropped)."""
+        unique = list(dict.fromkeys(q.strip() for q in quotes if q and q.strip()))
+        encoded = [q.encode("utf-8") for q in unique]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(e) for e in encoded], out=offsets[1:])
+
+        # Group the quotes by length bucket, shuffled within each bucket
+        lengths = np.array([len(q) for q in unique], dtype=np.int64)
+        buckets = lengths // BUCKET_CHARS
+        bucket_count = int(buckets.max()) + 1 if len(buckets) else 0
+        shuffle = np.random.default_rng().permutation(len(unique))
+        order = shuffle[np.argsort(buckets[shuffle], kind="stable")]
+        bucket_starts = np.searchsorted(buckets[order], np.arange(bucket_count + 1))
+        _write_index(index_path, b"".join(encoded), offsets, order, bucket_starts, signature, store_version)
+
+    def merge(self, quotes: Iterable[str], store_version: str) -> int:
+        """
+        Add the quotes the index doesn't have yet, without reshuffling it. New quotes go into
+        their bucket at its cursor, so they come up next and the recently used ones stay last.
+        The index and the cursors are saved right away.
+
+        Returns:
+            Number of quotes added
+        """
+        with self._lock, self._state_lock():
+            self._reload_if_changed()
+            if self._known is None:
+                self._known = {self.quote(i) for i in range(len(self))}
+            new = [q for q in dict.fromkeys(q.strip() for q in quotes if q and q.strip()) if q not in self._known]
+            if new:
+                self._known.update(new)
+                encoded = [q.encode("utf-8") for q in new]
+                first = len(self)
+                self.blob += b"".join(encoded)
+                self.offsets = np.append(self.offsets, self.offsets[-1] + np.cumsum([len(e) for e in encoded]))
+
+                shared = self._read_cursors()
+                buckets = np.array([len(q) for q in new], dtype=np.int64) // BUCKET_CHARS
+                bucket_count = max(len(shared), int(buckets.max()) + 1)
+                cursors = np.zeros(bucket_count, dtype=np.int64)
+                segments = []
+                rng = np.random.default_rng()
+                for bucket in range(bucket_count):
+                    if bucket < len(shared):
+                        segment = self.order[self.bucket_starts[bucket]:self.bucket_starts[bucket + 1]]
+                        cursors[bucket] = shared[bucket] % len(segment) if len(segment) else 0
+                    else:
+                        segment = self.order[:0]
+                    added = first + rng.permutation(np.flatnonzero(buckets == bucket))
+                    segments.append(np.concatenate([segment[:cursors[bucket]], added, segment[cursors[bucket]:]]))
+                self.order = np.concatenate(segments).astype(np.int64)
+                self.bucket_starts = np.append(0, np.cumsum([len(segment) for segment in segments]))
+                self._write_cursors(cursors)
+                # Reservations refer to the old positions
+                self._next = np.zeros(bucket_count, dtype=np.int64)
+                self._end = np.zeros_like(self._next)
+            self.store_version = store_version
+            _write_index(self.index_path, self.blob, self.offsets, self.order, self.bucket_starts,
+                         self.signature, self.store_version)
+            self._index_state = _file_state(self.index_path)
+            return len(new)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def quote(self, index: int) -> str:
+        return self.blob[self.offsets[index]:self.offsets[index + 1]].decode("utf-8")
+
+    def _state_lock(self):
+        return _file_lock(self.state_path) if self.state_path else contextlib.nullcontext()
+
+    def _read_cursors(self) -> np.ndarray:
+        """Shared cursors from the state file (zeros if it belongs to another index)."""
+        cursors = np.zeros(len(self.bucket_starts) - 1, dtype=np.int64)
+        if not self.state_path or not os.path.exists(self.state_path):
+            return cursors
+        try:
+            with open(self.state_path, "r") as f:
+                state = json.load(f)
+            if (state.get("signature") == self.signature and state.get("count") == len(self)
+                    and len(state.get("cursors", [])) == len(cursors)):
+                cursors[:] = state["cursors"]
+        except (OSError, ValueError) as e:
+            print(f"Warning: Ignoring quote bank state {self.state_path}: {e}")
+        return cursors
+
+    def _write_cursors(self, cursors: np.ndarray):
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"signature": self.signature, "count": len(self), "cursors": cursors.tolist()}, f)
+        os.replace(tmp_path, self.state_path)
+
+    def _reserve(self, bucket: int):
+        """Take the bucket's next RESERVE_STEPS cursor steps from the shared state."""
+        with self._state_lock():
+            if not self.state_path:
+                start = self._end[bucket]
+            elif _file_state(self.index_path) != self._index_state:
+                # Another process changed the index since this pick began; its state isn't ours
+                # to write, the next pick reloads
+                start = self._end[bucket]
+            else:
+                cursors = self._read_cursors()
+                start = cursors[bucket]
+                cursors[bucket] += RESERVE_STEPS
+                self._write_cursors(cursors)
+        self._next[bucket] = start
+        self._end[bucket] = start + RESERVE_STEPS
+
+    def _step(self, bucket: int) -> int:
+        if self._next[bucket] >= self._end[bucket]:
+            self._reserve(bucket)
+        step = self._next[bucket]
+        self._next[bucket] += 1
+        return int(step)
+
+    def pick(self, max_chars: int = None, min_chars: int = 0) -> Optional[str]:
+        """
+        Pick a quote whose length is within [min_chars, max_chars], preferring the least recently used.
+        Buckets that straddle a limit are used too, skipping the quotes outside the range.
+
+        Returns:
+            A quote, or None if no quote has a matching length
+        """
+        upper = max_chars if max_chars is not None else np.iinfo(np.int64).max
+        with self._lock:
+            self._reload_if_changed()
+            sizes = np.diff(self.bucket_starts)
+            low = np.arange(len(sizes)) * BUCKET_CHARS
+            # Buckets weighted by the share of their lengths in range, so every quote in range is
+            # about equally likely
+            overlap = np.clip(np.minimum(low + BUCKET_CHARS - 1, upper) - np.maximum(low, min_chars) + 1,
+                              0, BUCKET_CHARS)
+            weights = sizes * overlap / BUCKET_CHARS
+            while weights.any():
+                bucket = random.choices(range(len(weights)), weights=weights.tolist())[0]
+                weights[bucket] = 0
+                for _ in range(sizes[bucket]):
+                    position = self.bucket_starts[bucket] + self._step(bucket) % sizes[bucket]
+                    text = self.quote(int(self.order[position]))
+                    if min_chars <= len(text) <= upper:
+                        return text
+        return None
+
+def _file_state(path: str):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+@contextlib.contextmanager
+def _file_lock(path: str):
+    """Exclusive lock between processes: a lock file next to path, broken once it is stale."""
+    lock_path = f"{path}.lock"
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    while True:
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.stat(lock_path).st_mtime > LOCK_STALE_SECONDS:
+                    # Left behind by a crashed process
+                    os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            time.sleep(0.005)
+    try:
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except FileNotFoundError:
+            pass
+
+def _write_index(index_path: str, blob: bytes, offsets: np.ndarray, order: np.ndarray, bucket_starts: np.ndarray,
+                 signature: str, store_version: str):
+    os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp.npz"
+    np.savez(tmp_path, blob=np.frombuffer(blob, dtype=np.uint8), offsets=offsets, order=order,
+             bucket_starts=bucket_starts, signature=signature, store_version=store_version)
+    os.replace(tmp_path, index_path)
+
+def _bank_sources() -> List[str]:
+    quotes = list(DEFAULT_QUOTES)
+    if config.QUOTE_BANK_FILE and os.path.exists(config.QUOTE_BANK_FILE):
+        with open(config.QUOTE_BANK_FILE, "r", encoding="utf-8") as f:
+            quotes.extend(f.read().splitlines())
+    return quotes
+
+def _source_signature() -> str:
+    """Identifies the quote file; captions from the response store are merged in, not part of it."""
+    parts = [str(_INDEX_VERSION)]
+    if config.QUOTE_BANK_FILE and os.path.exists(config.QUOTE_BANK_FILE):
+        stat = os.stat(config.QUOTE_BANK_FILE)
+        parts.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+    return "|".join(parts)
+
+_bank = None
+_bank_lock = threading.Lock()
+
+def get_quote_bank() -> QuoteBank:
+    """The quote bank, rebuilt when the quote file changes and topped up from the response store."""
+    global _bank
+    with _bank_lock:
+        signature = _source_signature()
+        store = get_response_store()
+        # Read before the texts, so a caption stored in between is merged next time
+        store_version = store.version() if store is not None else ""
+        if _bank is None or _bank.signature != signature:
+            index_path = os.path.join(config.CACHE_DIR, "quote_bank.npz")
+            state_path = os.path.join(config.CACHE_DIR, "quote_bank_state.json")
+            bank = None
+            if os.path.exists(index_path):
+                try:
+                    bank = QuoteBank(index_path, state_path)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"Warning: Rebuilding unreadable quote bank {index_path}: {e}")
+            if bank is None or bank.signature != signature:
+                # Every caption the model ever delivered is a candidate too
+                QuoteBank.build(_bank_sources() + (store.cleaned_texts() if store is not None else []),
+                                index_path, signature, store_version)
+                bank = QuoteBank(index_path, state_path)
+                print(f"Quote bank indexed: {len(bank)} quotes")
+            _bank = bank
+        if store is not None and store_version != _bank.store_version:
+            added = _bank.merge(store.cleaned_texts(), store_version)
+            if added:
+                print(f"Quote bank: {added} new captions merged from the response store")
+        return _bank
+
+# For testing
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bank.npz")
+        rng = random.Random(1)
+        words = "life dream journey courage light step heart mind future today hope start".split()
+        sample = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 30))).capitalize() + "."
+                  for _ in range(5000)]
+        start = time.perf_counter()
+        QuoteBank.build(sample, path)
+        test_bank = QuoteBank(path, os.path.join(tmp, "state.json"))
+        print(f"Indexed {len(test_bank)} quotes in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        picks = [test_bank.pick(max_chars=80, min_chars=40) for _ in range(1000)]
+        elapsed = (time.perf_counter() - start) * 1000
+        print(f"1000 picks in {elapsed:.1f} ms, {len(set(picks))} distinct, "
+              f"lengths {min(map(len, picks))}-{max(map(len, picks))}")
@@ -0,0 +1,79 @@
+"""
+Shared-memory frame ring for the Video Modification Bot.
+A fixed set of frame slots in one multiprocessing.shared_memory block. Processes attach to
+the ring by name and read or write frames in place, so only slot indices travel between them.
+"""
+
+from multiprocessing import shared_memory
+from typing import List, Optional, Tuple
+import numpy as np
+from frame_pool import FramePool
+
+class SharedFrameRing:
+    """
+    Frame slots backed by shared memory.
+
+    The creating process owns the block (and unlinks it on close); worker processes
+    attach with SharedFrameRing.attach() using the name, shape and count of the owner.
+    """
+
+    def __init__(self, shape: Tuple[int, ...], count: int, name: Optional[str] = None):
+        self.shape = tuple(shape)
+        self.count = count
+        self.owner = name is None
+        frame_bytes = int(np.prod(self.shape))
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(1, frame_bytes * count))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((count,) + self.shape, dtype=np.uint8, buffer=self.shm.buf)
+
+    @classmethod
+    def attach(cls, name: str, shape: Tuple[int, ...], count: int) -> "SharedFrameRing":
+        return cls(shape, count, name=name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    @property
+    def nbytes(self) -> int:
+        return self.frames.nbytes
+
+    def buffer(self, slot: int) -> np.ndarray:
+        return self.frames[slot]
+
+    def buffers(self) -> List[np.ndarray]:
+        return [self.frames[slot] for slot in range(self.count)]
+
+    def pool(self) -> FramePool:
+        """A FramePool handing out this ring's slots (only meaningful in the owning process)."""
+        return FramePool(self.shape, self.count, buffers=self.buffers())
+
+    def close(self):
+        # Views must be dropped before the mapping can be closed
+        self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+def _fill_slot(name: str, shape: Tuple[int, ...], count: int, slot: int, value: int):
+    ring = SharedFrameRing.attach(name, shape, count)
+    ring.buffer(slot)[:] = value
+    ring.close()
+
+# For testing
+if __name__ == "__main__":
+    import multiprocessing
+
+    demo_shape = (1080, 1920, 3)
+    demo_ring = SharedFrameRing(demo_shape, 4)
+    children = [multiprocessing.Process(target=_fill_slot, args=(demo_ring.name, demo_shape, 4, slot, slot * 50))
+                for slot in range(4)]
+    for child in children:
+        child.start()
+    for child in children:
+        child.join()
+    print(f"Slots written in place by child processes: {[int(demo_ring.buffer(slot).mean()) for slot in range(4)]}")
+    print(f"Shared frame memory: {demo_ring.nbytes / (1024 * 1024):.1f} MB")
+    demo_ring.close()
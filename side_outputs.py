@@ -0,0 +1,110 @@
+"""
+Side outputs module for the Video Modification Bot.
+Captures a poster JPEG and a short animated WebP preview from the captioned frames while
+they are rendered, so publishing never has to decode the finished video again.
+Frames are scored for sharpness on a small grayscale copy; the files are encoded on a
+background thread.
+"""
+
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List
+import cv2
+import numpy as np
+from PIL import Image
+import config
+
+# Width of the grayscale copy the sharpness score is computed on
+SCORE_WIDTH = 160
+
+# Poster candidates scored per second of video; neighbouring frames barely differ
+SCORES_PER_SECOND = 5
+
+def sharpness_score(frame: np.ndarray) -> float:
+    """Variance of the Laplacian on a downscaled grayscale copy; higher means sharper."""
+    height, width = frame.shape[:2]
+    small = cv2.resize(frame, (SCORE_WIDTH, max(1, height * SCORE_WIDTH // width)), interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return float(cv2.Laplacian(gray, cv2.CV_32F).var())
+
+class SideOutputCapture:
+    """
+    Watches the captioned frames of one output and keeps what the side outputs need:
+    the sharpest frame with the caption fully visible, and small frames for the animation.
+    """
+
+    def __init__(self, output_path: str, fps: float, poster: bool = True, animated: bool = True):
+        base = os.path.splitext(output_path)[0]
+        self.poster_path = f"{base}_poster.jpg" if poster else None
+        self.animated_path = f"{base}_preview.webp" if animated else None
+        self.fps = fps
+        self.best_score = -1.0
+        self.best_index = None
+        self.poster_frame = None
+        self.animation_frames: List[np.ndarray] = []
+        self.animation_step = max(1, int(round(fps / config.ANIMATED_PREVIEW_FPS)))
+        self.animation_end = int(config.ANIMATED_PREVIEW_SECONDS * fps)
+        self.score_step = max(1, int(round(fps / SCORES_PER_SECOND)))
+
+    def observe(self, frame_index: int, frame: np.ndarray, caption_alpha: int = 255):
+        """Look at one captioned frame; only cheap work happens here."""
+        if self.animated_path and frame_index < self.animation_end and frame_index % self.animation_step == 0:
+            height, width = frame.shape[:2]
+            size = (config.ANIMATED_PREVIEW_WIDTH, max(2, height * config.ANIMATED_PREVIEW_WIDTH // width))
+            self.animation_frames.append(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+
+        # The poster should show the caption at full opacity
+        if self.poster_path and caption_alpha >= 255 and frame_index % self.score_step == 0:
+            score = sharpness_score(frame)
+            if score > self.best_score:
+                self.best_score = score
+                self.best_index = frame_index
+                if self.poster_frame is None:
+                    self.poster_frame = np.empty_like(frame)
+                np.copyto(self.poster_frame, frame)
+
+    def _encode(self) -> List[str]:
+        written = []
+        if self.poster_path and self.poster_frame is not None:
+            cv2.imwrite(self.poster_path, self.poster_frame, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            print(f"Poster frame {self.best_index} ({self.best_index / self.fps:.2f}s) saved to: {self.poster_path}")
+            written.append(self.poster_path)
+        if self.animated_path and self.animation_frames:
+            images = [Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)) for frame in self.animation_frames]
+            images[0].save(self.animated_path, save_all=True, append_images=images[1:],
+                           duration=int(1000 * self.animation_step / self.fps), loop=0, quality=70, method=2)
+            print(f"Animated preview ({len(images)} frames) saved to: {self.animated_path}")
+            written.append(self.animated_path)
+        return written
+
+    def finish(self) -> Future:
+        """Encode the side outputs on a background thread; the future returns the written paths."""
+        executor = ThreadPoolExecutor(max_workers=1)
+        future = executor.submit(self._encode)
+        executor.shutdown(wait=False)
+        return future
+
+# For testing
+if __name__ == "__main__":
+    import sys
+    import time
+
+    if len(sys.argv) < 2:
+        print("Usage: python side_outputs.py <video>")
+        sys.exit(1)
+
+    cap = cv2.VideoCapture(sys.argv[1])
+    capture = SideOutputCapture(sys.argv[1], cap.get(cv2.CAP_PROP_FPS) or 30)
+    observe_time = 0.0
+    index = 0
+    while True:
+        ret, video_frame = cap.read()
+        if not ret:
+            break
+        start = time.perf_counter()
+        capture.observe(index, video_frame)
+        observe_time += time.perf_counter() - start
+        index += 1
+    cap.release()
+    print(f"Observed {index} frames, {observe_time / max(index, 1) * 1000:.2f} ms per frame")
+    print(capture.finish().result())
@@ -1,32 +1,110 @@
 """
 Text-to-speech module for the Video Modification Bot.
 Handles converting generated text to speech using Google Text-to-Speech (gTTS).
+
+Long texts are split at sentence and clause boundaries, the chunks are synthesized
+concurrently, and the decoded pieces are joined into one gapless audio file.
 """
 
+import io
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+import numpy as np
+import requests
 from gtts import gTTS
-from typing import Optional
 import config
+from audio_processing import VOICE_SAMPLE_RATE, decode_audio, process_voice, write_audio
+
+class GTTSBackend:
+    """Synthesizes speech with Google Text-to-Speech."""
 
-def text_to_speech(text: str, output_file: str = None, 
-                   language: str = config.TTS_LANGUAGE, 
-                   slow: bool = config.TTS_SLOW) -> Optional[str]:
+    def synthesize(self, text: str, language: str, slow: bool) -> bytes:
+        buffer = io.BytesIO()
+        gTTS(text=text, lang=language, slow=slow).write_to_fp(buffer)
+        return buffer.getvalue()
+
+class HTTPTTSBackend:
+    """
+    Synthesizes speech with any HTTP service that takes a JSON body
+    {"text", "lang", "slow"} and responds with encoded audio (e.g. a local stand-in server).
+    """
+
+    def __init__(self, url: str, timeout: float = 30):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def synthesize(self, text: str, language: str, slow: bool) -> bytes:
+        response = self.session.post(self.url, json={"text": text, "lang": language, "slow": slow},
+                                     timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+def get_tts_backend(name: str = config.TTS_BACKEND):
+    """Create the TTS backend named in config ("gtts" or "http")."""
+    if name == "http":
+        return HTTPTTSBackend(config.TTS_HTTP_URL)
+    if name != "gtts":
+        print(f"Warning: Unknown TTS backend '{name}', using gTTS")
+    return GTTSBackend()
+
+def _split_long(piece: str, pattern: str, max_chars: int) -> List[str]:
+    """Split a piece at the given boundaries, packing the parts into chunks of at most max_chars."""
+    chunks = []
+    current = ""
+    for part in re.split(pattern, piece):
+        if current and len(current) + 1 + len(part) > max_chars:
+            chunks.append(current)
+            current = part
+        else:
+            current = f"{current} {part}" if current else part
+    if current:
+        chunks.append(current)
+    return chunks
+
+def split_text_for_tts(text: str, max_chars: int = config.TTS_CHUNK_CHARS) -> List[str]:
+    """
+    Split text into chunks for synthesis: one per sentence, with sentences longer than
+    max_chars split further at clause boundaries and, as a last resort, between words.
+    """
+    chunks = []
+    for sentence in re.split(r'(?<=[.!?])\s+', text.strip()):
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            chunks.append(sentence)
+            continue
+        for clause in _split_long(sentence, r'(?<=[,;:])\s+', max_chars):
+            if len(clause) <= max_chars:
+                chunks.append(clause)
+            else:
+                chunks.extend(_split_long(clause, r'\s+', max_chars))
+    return chunks
+
+def text_to_speech(text: str, output_file: str = None,
+                   language: str = config.TTS_LANGUAGE,
+                   slow: bool = config.TTS_SLOW,
+                   backend=None) -> Optional[str]:
     """
     Convert text to speech using Google Text-to-Speech.
-    
+
     Args:
         text: The text to convert to speech
         output_file: Path to save the audio file (if None, a temporary file will be created)
         language: Language code for the speech
         slow: Whether to speak slowly
-        
+        backend: TTS backend with a synthesize(text, language, slow) method returning encoded
+                 audio (if None, the one named by config.TTS_BACKEND is used)
+
     Returns:
         Path to the generated audio file or None if conversion fails
     """
     if not text:
         print("Error: No text provided for text-to-speech conversion.")
         return None
-    
+
     # If no output file is specified, create one in the output directory
     if not output_file:
         # Create a filename based on the first few words of the text
@@ -34,31 +112,100 @@ def text_to_speech(text: str, output_file: str = None,
         filename = "_".join(words).lower()
         filename = "".join(c if c.isalnum() or c == "_" else "" for c in filename)
         output_file = os.path.join(config.OUTPUT_VIDEOS_DIR, f"{filename}_audio.mp3")
-    
+
+    backend = backend or get_tts_backend()
+
+    def synthesize(chunk: str) -> np.ndarray:
+        samples = decode_audio(backend.synthesize(chunk, language, slow), VOICE_SAMPLE_RATE)
+        if samples is None:
+            raise RuntimeError(f"could not decode the speech for '{chunk}'")
+        return samples
+
     try:
-        # Create gTTS object
-        tts = gTTS(text=text, lang=language, slow=slow)
-        
-        # Save the audio file
-        tts.save(output_file)
-        
-        print(f"Speech generated and saved to: {output_file}")
+        # Synthesize all chunks concurrently; map() keeps them in text order
+        chunks = split_text_for_tts(text)
+        with ThreadPoolExecutor(max_workers=max(1, min(config.TTS_MAX_WORKERS, len(chunks)))) as executor:
+            pieces = list(executor.map(synthesize, chunks))
+
+        # Join the decoded samples back to back, so no gaps or encoder padding end up between chunks
+        samples = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+        if config.VOICE_NORMALIZE:
+            # Silence at the ends would stretch the caption timing and the render
+            raw_duration = len(samples) / VOICE_SAMPLE_RATE
+            samples = process_voice(samples, VOICE_SAMPLE_RATE)
+            print(f"Voice trimmed from {raw_duration:.2f}s to {len(samples) / VOICE_SAMPLE_RATE:.2f}s "
+                  f"and leveled to {config.VOICE_TARGET_LOUDNESS:g} dB")
+        output_file = write_audio(samples, output_file, VOICE_SAMPLE_RATE)
+        if not output_file:
+            return None
+
+        print(f"Speech generated from {len(chunks)} chunks ({len(samples) / VOICE_SAMPLE_RATE:.2f}s) "
+              f"and saved to: {output_file}")
         return output_file
-        
+
     except Exception as e:
         print(f"Error generating speech: {e}")
         return None
 
 # For testing
 if __name__ == "__main__":
+    import sys
+    import threading
+    import time
+    import json
+    import wave
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from media_info import probe_media
+
     # Create output directory if it doesn't exist
     os.makedirs(config.OUTPUT_VIDEOS_DIR, exist_ok=True)
-    
+
     # Test with a sample text
     sample_text = "Life is about making an impact, not making an income. Whatever the mind can conceive and believe, it can achieve."
-    audio_file = text_to_speech(sample_text)
-    
-    if audio_file:
-        print(f"Successfully generated speech: {audio_file}")
-    else:
-        print("Failed to generate speech.")
+
+    if "--offline" not in sys.argv:
+        audio_file = text_to_speech(sample_text)
+        if audio_file:
+            print(f"Successfully generated speech: {audio_file}")
+        else:
+            print("Failed to generate speech.")
+        sys.exit(0)
+
+    class StandInTTSHandler(BaseHTTPRequestHandler):
+        """Answers after a fixed latency with a WAV tone of 60 ms per character."""
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            time.sleep(0.3)
+            samples = 0.2 * np.sin(np.arange(int(0.06 * len(request["text"]) * 22050)) * 0.05)
+            pcm = (samples * 32767).astype('<i2')
+            buffer = io.BytesIO()
+            with wave.open(buffer, 'wb') as f:
+                f.setnchannels(1)
+                f.setsampwidth(2)
+                f.setframerate(22050)
+                f.writeframes(pcm.tobytes())
+            self.send_response(200)
+            self.send_header("Content-Type", "audio/wav")
+            self.end_headers()
+            self.wfile.write(buffer.getvalue())
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandInTTSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    stand_in = HTTPTTSBackend(f"http://127.0.0.1:{server.server_address[1]}/")
+
+    chunks = split_text_for_tts(" ".join([sample_text] * 2))
+    print(f"{len(chunks)} chunks: {chunks}")
+    expected = sum(0.06 * len(chunk) for chunk in chunks)
+    for workers in (1, config.TTS_MAX_WORKERS):
+        config.TTS_MAX_WORKERS = workers
+        start = time.perf_counter()
+        audio_file = text_to_speech(" ".join([sample_text] * 2), os.path.join(config.OUTPUT_VIDEOS_DIR, "tts_offline_test.mp3"),
+                                    backend=stand_in)
+        elapsed = time.perf_counter() - start
+        print(f"{workers} workers: {elapsed:.2f}s, duration {probe_media(audio_file).duration:.3f}s "
+              f"(expected about {expected:.3f}s)")
+    server.shutdown()
@@ -0,0 +1,147 @@
+"""
+Stage scheduler for the Video Modification Bot.
+The pipeline stages use different resources: caption text comes from the LLM host, speech from
+the TTS service, compositing from local cores and the final audio encode/mux from ffmpeg. Each
+stage gets its own number of slots, so several jobs can be in flight at once (one waiting for
+the LLM while another renders) without oversubscribing any resource. The scheduler also splits
+the cores between render slots for OpenCV's thread pool and the frame encoder, and records
+queue depths and utilization per stage.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict
+import cv2
+import config
+
+@dataclass
+class StageStats:
+    """Counters of one stage."""
+    slots: int
+    active: int = 0
+    waiting: int = 0
+    peak_waiting: int = 0
+    completed: int = 0
+    busy_seconds: float = 0.0
+    wait_seconds: float = 0.0
+
+class StageScheduler:
+    """Named slot pools, one per stage, with statistics."""
+
+    def __init__(self, slots: Dict[str, int] = None, cpu_count: int = None):
+        slots = dict(slots or config.STAGE_SLOTS)
+        self.cpu_count = cpu_count or os.cpu_count() or 1
+        self._semaphores = {name: threading.BoundedSemaphore(max(1, count)) for name, count in slots.items()}
+        self._stats = {name: StageStats(slots=max(1, count)) for name, count in slots.items()}
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+        # OpenCV's pool is process-wide: give it the cores of one render slot, so concurrent
+        # renders don't each spin up a thread per core
+        self.render_threads = self.thread_budget("render")
+        cv2.setNumThreads(self.render_threads)
+
+    def thread_budget(self, stage: str) -> int:
+        """Cores available to each slot of a stage."""
+        stats = self._stats.get(stage)
+        return max(1, self.cpu_count // stats.slots) if stats else self.cpu_count
+
+    @contextmanager
+    def slot(self, stage: str):
+        """Hold one slot of a stage for the duration of the block (unknown stages are unlimited)."""
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            yield
+            return
+        stats = self._stats[stage]
+        requested = time.monotonic()
+        queued = not semaphore.acquire(blocking=False)
+        if queued:
+            with self._lock:
+                stats.waiting += 1
+                stats.peak_waiting = max(stats.peak_waiting, stats.waiting)
+            semaphore.acquire()
+        acquired = time.monotonic()
+        with self._lock:
+            if queued:
+                stats.waiting -= 1
+            stats.active += 1
+            stats.wait_seconds += acquired - requested
+        try:
+            yield
+        finally:
+            released = time.monotonic()
+            with self._lock:
+                stats.active -= 1
+                stats.completed += 1
+                stats.busy_seconds += released - acquired
+            semaphore.release()
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Current queue depth, activity and utilization (busy time over slot time) of every stage."""
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        with self._lock:
+            return {
+                name: {
+                    "slots": stats.slots,
+                    "active": stats.active,
+                    "queued": stats.waiting,
+                    "peak_queued": stats.peak_waiting,
+                    "completed": stats.completed,
+                    "mean_wait": stats.wait_seconds / stats.completed if stats.completed else 0.0,
+                    "utilization": stats.busy_seconds / (stats.slots * elapsed),
+                }
+                for name, stats in self._stats.items()
+            }
+
+    def report(self):
+        """Print the statistics of every stage."""
+        print(f"Stage metrics ({self.cpu_count} cores, {self.render_threads} OpenCV threads per render):")
+        for name, stats in self.snapshot().items():
+            print(f"  {name:<7} slots {stats['slots']}, done {stats['completed']}, queued {stats['queued']} "
+                  f"(peak {stats['peak_queued']}), mean wait {stats['mean_wait']:.2f}s, "
+                  f"utilization {stats['utilization'] * 100:.0f}%")
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> StageScheduler:
+    """The process-wide scheduler, created from config.STAGE_SLOTS on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = StageScheduler()
+        return _scheduler
+
+def stage_slot(stage: str):
+    """Context manager holding a slot of the given stage in the process-wide scheduler."""
+    return get_scheduler().slot(stage)
+
+# For testing
+if __name__ == "__main__":
+    import random
+
+    # Simulated jobs: LLM 0.3s, TTS 0.2s, render 0.4s, encode 0.1s
+    durations = {"text": 0.3, "speech": 0.2, "render": 0.4, "encode": 0.1}
+
+    def job():
+        for stage, seconds in durations.items():
+            with scheduler.slot(stage):
+                time.sleep(seconds * random.uniform(0.8, 1.2))
+
+    for in_flight in (1, 3):
+        scheduler = StageScheduler({"text": 1, "speech": 2, "render": 1, "encode": 2}, cpu_count=4)
+        start = time.monotonic()
+        threads = []
+        for i in range(6):
+            if len(threads) >= in_flight:
+                threads.pop(0).join()
+            threads.append(threading.Thread(target=job))
+            threads[-1].start()
+        for thread in threads:
+            thread.join()
+        print(f"{in_flight} job(s) in flight: 6 jobs in {time.monotonic() - start:.2f}s")
+        scheduler.report()
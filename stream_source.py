@@ -0,0 +1,322 @@
+"""
+Streaming input module for the Video Modification Bot.
+Renders from sources that are not complete local files: stdin ("-" or "pipe:"), HTTP(S) URLs
+that ffmpeg reads progressively, and "range+http(s)://" URLs of object stores, which are
+fetched as parallel byte-range requests. An ffmpeg process decodes the stream into raw
+frames, so compositing starts as soon as the first GOP has arrived; read-ahead is bounded
+by STREAM_READAHEAD_MB. The original soundtrack is extracted during the same pass.
+"""
+
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Optional
+import numpy as np
+import requests
+import config
+from media_info import MediaInfo, probe_stream
+from toolchain import get_ffmpeg_path
+
+RANGE_PREFIX = "range+"
+
+def is_stream_source(source: str) -> bool:
+    """True for sources that are read as streams instead of local files."""
+    return source in ("-", "pipe:", "pipe:0") or bool(re.match(r"^(range\+)?https?://", source))
+
+def stream_name(source: str) -> str:
+    """File-name-safe base name for outputs rendered from a stream."""
+    if not re.match(r"^(range\+)?https?://", source):
+        return "stdin"
+    path = source.split("?", 1)[0].rstrip("/")
+    name = os.path.splitext(os.path.basename(path))[0]
+    return re.sub(r"[^A-Za-z0-9_-]", "_", name) or "stream"
+
+class RangeReader:
+    """
+    Reads an object with HTTP byte-range requests, several chunks in flight, in order.
+    At most readahead_bytes are buffered ahead of the consumer.
+    """
+
+    def __init__(self, url: str, chunk_bytes: int = config.STREAM_CHUNK_BYTES,
+                 readahead_bytes: int = config.STREAM_READAHEAD_MB * 1024 * 1024,
+                 connections: int = config.STREAM_RANGE_CONNECTIONS):
+        self.url = url
+        self.chunk_bytes = chunk_bytes
+        self.max_in_flight = max(1, readahead_bytes // chunk_bytes)
+        self.connections = connections
+        self.session = requests.Session()
+        response = self.session.head(url, allow_redirects=True, timeout=30)
+        response.raise_for_status()
+        self.size = int(response.headers.get("Content-Length", 0) or 0)
+        self.ranged = response.headers.get("Accept-Ranges", "").lower() == "bytes" and self.size > 0
+
+    def _fetch(self, start: int, end: int) -> bytes:
+        response = self.session.get(self.url, headers={"Range": f"bytes={start}-{end}"}, timeout=30)
+        response.raise_for_status()
+        if response.status_code != 206:
+            raise IOError(f"{self.url} ignored the range request")
+        return response.content
+
+    def chunks(self) -> Iterator[bytes]:
+        if not self.ranged:
+            # No range support: a single progressive download
+            with self.session.get(self.url, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                yield from response.iter_content(self.chunk_bytes)
+            return
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            in_flight = deque()
+            next_start = 0
+            # Small first ranges get the header and first GOP in quickly, then they grow
+            request_bytes = min(64 * 1024, self.chunk_bytes)
+            while in_flight or next_start < self.size:
+                while next_start < self.size and len(in_flight) < self.max_in_flight:
+                    end = min(next_start + request_bytes, self.size) - 1
+                    in_flight.append(executor.submit(self._fetch, next_start, end))
+                    next_start = end + 1
+                    request_bytes = min(request_bytes * 2, self.chunk_bytes)
+                yield in_flight.popleft().result()
+
+def _stdin_chunks(chunk_bytes: int = config.STREAM_CHUNK_BYTES) -> Iterator[bytes]:
+    while True:
+        chunk = sys.stdin.buffer.read1(chunk_bytes) if hasattr(sys.stdin.buffer, "read1") else sys.stdin.buffer.read(chunk_bytes)
+        if not chunk:
+            return
+        yield chunk
+
+class StreamFrameReader:
+    """
+    cv2.VideoCapture stand-in that decodes a stream with ffmpeg into BGR frames of the probed
+    display size. read(image=buffer) fills the buffer in place.
+    """
+
+    def __init__(self, cmd: list, width: int, height: int, chunks: Iterator[bytes] = None, prefix: bytes = b"",
+                 started: float = None):
+        self.width = width
+        self.height = height
+        self.frame_bytes = width * height * 3
+        self.started = started or time.monotonic()
+        self.first_frame_seconds = None
+        self.frames_read = 0
+        self.bytes_fed = 0
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE if chunks is not None else subprocess.DEVNULL,
+                                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0)
+        self._stderr = []
+        threading.Thread(target=self._drain_stderr, daemon=True).start()
+        self._pump = None
+        if chunks is not None:
+            self._pump = threading.Thread(target=self._feed, args=(prefix, chunks), daemon=True)
+            self._pump.start()
+
+    def _drain_stderr(self):
+        for line in self._process.stderr:
+            self._stderr.append(line.decode(errors="replace"))
+
+    def _feed(self, prefix: bytes, chunks: Iterator[bytes]):
+        # Blocking writes to ffmpeg's stdin keep the read-ahead bounded by the pipe and the reader
+        try:
+            if prefix:
+                self._process.stdin.write(prefix)
+                self.bytes_fed += len(prefix)
+            for chunk in chunks:
+                self._process.stdin.write(chunk)
+                self.bytes_fed += len(chunk)
+        except (BrokenPipeError, OSError):
+            pass  # The decoder stopped early (enough frames, or released)
+        except Exception as e:
+            print(f"Error reading stream: {e}")
+        finally:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+
+    def isOpened(self) -> bool:
+        return self._process.poll() is None or self.frames_read > 0
+
+    def read(self, image: np.ndarray = None):
+        frame = image if image is not None and image.nbytes == self.frame_bytes else \
+            np.empty((self.height, self.width, 3), dtype=np.uint8)
+        view = memoryview(frame).cast('B')
+        filled = 0
+        while filled < self.frame_bytes:
+            count = self._process.stdout.readinto(view[filled:])
+            if not count:
+                return False, None
+            filled += count
+        self.frames_read += 1
+        if self.first_frame_seconds is None:
+            self.first_frame_seconds = time.monotonic() - self.started
+        return True, frame
+
+    def release(self):
+        """Stop decoding; the extracted audio is finalized before this returns."""
+        if self._process.poll() is None:
+            # Closing our end of the frame pipe makes ffmpeg stop and write its trailers
+            self._process.stdout.close()
+            try:
+                self._process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        if self._pump is not None:
+            self._pump.join(timeout=5)
+        first = f"{self.first_frame_seconds:.2f}s" if self.first_frame_seconds is not None else "n/a"
+        print(f"Stream decode: {self.frames_read} frames, first frame after {first}"
+              + (f", {self.bytes_fed / (1024 * 1024):.1f} MB read" if self._pump is not None else ""))
+        errors = "".join(self._stderr).strip()
+        if self.frames_read == 0 and errors:
+            print(f"Error decoding stream: {errors}")
+
+class StreamSource:
+    """
+    A video stream opened for one render: probed from its first bytes (or by URL), then
+    decoded once. The soundtrack is written to audio_path while the frames are read.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.name = stream_name(source)
+        self.started = time.monotonic()
+        self.info: Optional[MediaInfo] = None
+        self.audio_path: Optional[str] = None
+        self._prefix = b""
+        self._chunks: Optional[Iterator[bytes]] = None
+        self._url = None
+
+        if source.startswith(RANGE_PREFIX):
+            reader = RangeReader(source[len(RANGE_PREFIX):])
+            self._chunks = reader.chunks()
+        elif source.startswith(("http://", "https://")):
+            self._url = source
+        else:
+            self._chunks = _stdin_chunks()
+
+    def open(self) -> Optional[MediaInfo]:
+        """Probe the stream; for pipes, the probed bytes are kept and fed to the decoder first."""
+        if self._url:
+            self.info = probe_stream(self._url)
+        else:
+            # Probe as soon as the header may be complete, with more data only if that fails
+            buffered = []
+            size = 0
+            probe_at = min(64 * 1024, config.STREAM_PROBE_BYTES)
+            for chunk in self._chunks:
+                buffered.append(chunk)
+                size += len(chunk)
+                if size >= probe_at:
+                    self.info = probe_stream(self.source, b"".join(buffered))
+                    if (self.info and self.info.has_video and self.info.fps) or size >= config.STREAM_PROBE_BYTES:
+                        break
+                    probe_at *= 4
+            self._prefix = b"".join(buffered)
+            if self.info is None or size < probe_at:
+                # The whole stream was shorter than the probe size
+                self.info = probe_stream(self.source, self._prefix)
+        if self.info is None or not self.info.has_video:
+            print(f"Error: Could not read a video stream from {self.source} "
+                  "(MP4 streams need their index at the start, e.g. written with -movflags +faststart)")
+            return None
+        return self.info
+
+    def open_reader(self, extract_audio: bool = True) -> Optional[StreamFrameReader]:
+        """Start decoding. Can only be called once per stream."""
+        ffmpeg_path = get_ffmpeg_path()
+        if not ffmpeg_path or self.info is None:
+            print("Error: FFmpeg is required to decode streams.")
+            return None
+        fps = self.info.fps
+        cmd = [ffmpeg_path, '-v', 'error', '-nostdin']
+        if self._url:
+            cmd += ['-reconnect', '1', '-reconnect_streamed', '1', '-i', self._url]
+        else:
+            cmd += ['-i', 'pipe:0']
+        # Constant frame rate, like the mezzanine copies of local sources
+        cmd += ['-map', '0:v:0', '-an', '-sn', '-vf', f'fps={fps.numerator}/{fps.denominator}',
+                '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+        if extract_audio and self.info.has_audio:
+            fd, self.audio_path = tempfile.mkstemp(prefix=f"{self.name}_", suffix=".mka", dir=config.OUTPUT_VIDEOS_DIR)
+            os.close(fd)
+            cmd += ['-map', '0:a:0', '-vn', '-c:a', 'copy', '-y', self.audio_path]
+        chunks = None if self._url else self._chunks
+        return StreamFrameReader(cmd, self.info.width, self.info.height, chunks, self._prefix, self.started)
+
+    def cleanup(self):
+        """Remove the extracted soundtrack."""
+        if self.audio_path and os.path.exists(self.audio_path):
+            os.remove(self.audio_path)
+
+# For testing
+if __name__ == "__main__":
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    if len(sys.argv) < 2:
+        print("Usage: python stream_source.py <video> [bytes per second]")
+        sys.exit(1)
+    served_path = sys.argv[1]
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else 2 * 1024 * 1024
+
+    class ThrottledRangeHandler(BaseHTTPRequestHandler):
+        """Serves one file with Range support at a limited rate, like a slow object store."""
+
+        def _send(self, head_only: bool):
+            size = os.path.getsize(served_path)
+            start, end = 0, size - 1
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            if match:
+                start = int(match.group(1))
+                end = min(int(match.group(2) or end), size - 1)
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            if head_only:
+                return
+            with open(served_path, "rb") as f:
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    block = f.read(min(65536, remaining))
+                    try:
+                        self.wfile.write(block)
+                    except (BrokenPipeError, ConnectionResetError):
+                        return
+                    remaining -= len(block)
+                    time.sleep(len(block) / rate)
+
+        def do_HEAD(self):
+            self._send(True)
+
+        def do_GET(self):
+            self._send(False)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledRangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/{os.path.basename(served_path)}"
+    print(f"Serving {served_path} ({os.path.getsize(served_path) / (1024 * 1024):.1f} MB) at "
+          f"{rate / (1024 * 1024):.1f} MB/s, a full download takes {os.path.getsize(served_path) / rate:.2f}s")
+
+    for source in (url, RANGE_PREFIX + url):
+        start_time = time.monotonic()
+        stream = StreamSource(source)
+        if not stream.open():
+            continue
+        reader = stream.open_reader(extract_audio=False)
+        frames = 0
+        while reader.read()[0]:
+            frames += 1
+        reader.release()
+        print(f"{source}: {frames} frames in {time.monotonic() - start_time:.2f}s")
+    server.shutdown()
@@ -0,0 +1,53 @@
+"""
+Subtitle module for the Video Modification Bot.
+Writes a caption schedule as an SRT or WebVTT file so it can be muxed as a soft subtitle track.
+"""
+
+import os
+from typing import List, Tuple
+
+# Subtitle codec to use inside each output container
+CONTAINER_SUBTITLE_CODECS = {
+    ".mp4": "mov_text",
+    ".m4v": "mov_text",
+    ".mov": "mov_text",
+    ".mkv": "srt",
+    ".webm": "webvtt",
+}
+
+def _format_timestamp(seconds: float, separator: str) -> str:
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{separator}{milliseconds:03d}"
+
+def write_subtitles(cues: List[Tuple[float, float, str]], output_path: str) -> str:
+    """
+    Write caption cues to a subtitle file. The format follows the extension (.srt or .vtt).
+
+    Args:
+        cues: List of (start, end, text) with times in seconds
+        output_path: Path of the subtitle file to create
+
+    Returns:
+        Path to the subtitle file
+    """
+    webvtt = os.path.splitext(output_path)[1].lower() == ".vtt"
+    separator = "." if webvtt else ","
+    lines = ["WEBVTT", ""] if webvtt else []
+
+    for number, (start, end, text) in enumerate(cues, start=1):
+        if not webvtt:
+            lines.append(str(number))
+        lines.append(f"{_format_timestamp(start, separator)} --> {_format_timestamp(end, separator)}")
+        lines.append(text)
+        lines.append("")
+
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines))
+    return output_path
+
+def subtitle_codec_for(output_path: str) -> str:
+    """Subtitle codec that the container of output_path can hold."""
+    return CONTAINER_SUBTITLE_CODECS.get(os.path.splitext(output_path)[1].lower(), "mov_text")
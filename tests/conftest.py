@@ -0,0 +1,92 @@
+"""
+Shared test fixtures: a local threaded HTTP server with Range support, like an object store.
+"""
+
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+
+class RangeServer:
+    """
+    Serves the files of a directory with Range support. Every request is recorded as
+    (file name, Range header). A range whose start is in interrupt_starts is cut off halfway,
+    once, like a dropped connection.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.requests = []
+        self.interrupt_starts = set()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_HEAD(self):
+                self._send(head_only=True)
+
+            def do_GET(self):
+                self._send(head_only=False)
+
+            def _send(self, head_only: bool):
+                name = os.path.basename(self.path.split("?", 1)[0])
+                range_header = self.headers.get("Range")
+                if not head_only:
+                    with server._lock:
+                        server.requests.append((name, range_header))
+                path = os.path.join(server.directory, name)
+                if not os.path.isfile(path):
+                    self.send_error(404)
+                    return
+                with open(path, "rb") as f:
+                    data = f.read()
+                start, end = 0, len(data) - 1
+                match = re.match(r"bytes=(\d+)-(\d*)", range_header or "")
+                if match:
+                    start = int(match.group(1))
+                    end = min(int(match.group(2) or end), len(data) - 1)
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                else:
+                    self.send_response(200)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.send_header("ETag", f'"{len(data)}"')
+                self.end_headers()
+                if head_only:
+                    return
+                body = data[start:end + 1]
+                with server._lock:
+                    interrupted = match is not None and start in server.interrupt_starts
+                    server.interrupt_starts.discard(start)
+                try:
+                    self.wfile.write(body[:len(body) // 2] if interrupted else body)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/{name}"
+
+    def ranges_of(self, name: str) -> list:
+        with self._lock:
+            return [header for served, header in self.requests if served == name]
+
+    def shutdown(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+@pytest.fixture
+def range_server(tmp_path):
+    served = tmp_path / "served"
+    served.mkdir()
+    server = RangeServer(str(served))
+    yield server
+    server.shutdown()
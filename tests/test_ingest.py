@@ -0,0 +1,69 @@
+"""
+Ingest tests against a local Range server (see conftest.py): parallel segments, resuming after
+an interrupted segment, and rejecting a file whose SHA-256 doesn't match.
+"""
+
+import hashlib
+import os
+import subprocess
+import pytest
+import config
+from ingest import download_file
+from toolchain import get_ffmpeg_path
+
+SEGMENT_BYTES = 4 * 1024
+
+@pytest.fixture
+def clip(range_server, monkeypatch):
+    ffmpeg_path = get_ffmpeg_path()
+    if not ffmpeg_path:
+        pytest.skip("FFmpeg is required to create the test clip")
+    path = os.path.join(range_server.directory, "clip.mp4")
+    subprocess.run([ffmpeg_path, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=30:duration=2',
+                    '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-g', '10', path], check=True)
+    monkeypatch.setattr(config, "INGEST_SEGMENT_MB", SEGMENT_BYTES / (1024 * 1024))
+    monkeypatch.setattr(config, "INGEST_RETRIES", 1)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert len(data) > 4 * SEGMENT_BYTES
+    return range_server.url("clip.mp4"), data
+
+def _segment_count(size: int) -> int:
+    return -(-size // SEGMENT_BYTES)
+
+def test_download_uses_parallel_range_requests(clip, range_server, tmp_path):
+    url, data = clip
+    library = str(tmp_path / "library")
+    result = download_file(url, library, connections=4)
+    assert result is not None
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert result.resumed_bytes == 0
+    with open(result.path, "rb") as f:
+        assert f.read() == data
+    assert os.listdir(library) == ["clip.mp4"]
+    ranges = range_server.ranges_of("clip.mp4")
+    # One probe of the first byte, then one request per segment
+    assert ranges[0] == "bytes=0-0"
+    assert len(ranges) == 1 + _segment_count(len(data))
+
+def test_interrupted_segment_is_resumed(clip, range_server, tmp_path):
+    url, data = clip
+    library = str(tmp_path / "library")
+    range_server.interrupt_starts.add(2 * SEGMENT_BYTES)
+    assert download_file(url, library, connections=4) is None
+    assert os.path.exists(os.path.join(library, "clip.mp4.part.json"))
+
+    range_server.requests.clear()
+    result = download_file(url, library, connections=4)
+    assert result is not None
+    assert result.sha256 == hashlib.sha256(data).hexdigest()
+    assert result.resumed_bytes == len(data) - SEGMENT_BYTES
+    # Only the interrupted segment is downloaded again
+    assert range_server.ranges_of("clip.mp4") == ["bytes=0-0", f"bytes={2 * SEGMENT_BYTES}-{3 * SEGMENT_BYTES - 1}"]
+    assert os.listdir(library) == ["clip.mp4"]
+
+def test_sha256_mismatch_is_rejected(clip, tmp_path):
+    url, _ = clip
+    library = str(tmp_path / "library")
+    assert download_file(url, library, sha256="0" * 64, connections=4) is None
+    assert os.listdir(library) == []
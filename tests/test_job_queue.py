@@ -0,0 +1,98 @@
+"""
+Job queue tests: leases on a shared directory (here tmp_path) with a short TTL.
+"""
+
+import os
+import time
+import pytest
+import config
+import main
+from job_queue import JobQueue
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "queue"), lease_ttl=0.5, worker_id="test", max_attempts=3)
+
+def test_failed_job_is_retried_until_the_attempt_limit(queue):
+    for _ in range(3):
+        lease = queue.try_claim("clip.mp4")
+        assert lease is not None
+        lease.release("failed")
+    assert queue.is_done("clip.mp4")
+    assert queue.try_claim("clip.mp4") is None
+
+def test_done_job_is_not_claimed_again(queue):
+    queue.try_claim("clip.mp4").release("failed")
+    queue.try_claim("clip.mp4").release("done")
+    assert queue.is_done("clip.mp4")
+    assert queue.pending(["clip.mp4"]) == []
+
+def _crash(lease):
+    """Stop a lease's heartbeats without releasing it, as a crashed worker would."""
+    lease._stop.set()
+    lease._thread.join()
+
+def test_live_lease_blocks_other_workers(queue):
+    other = JobQueue(queue.queue_dir, lease_ttl=queue.lease_ttl, worker_id="other")
+    lease = queue.try_claim("clip.mp4")
+    assert lease is not None
+    # Heartbeats keep the lease alive past its TTL
+    time.sleep(queue.lease_ttl * 2)
+    assert other.try_claim("clip.mp4") is None
+    assert lease.is_valid()
+    lease.release("done")
+    assert other.is_done("clip.mp4")
+
+def test_expired_lease_is_reclaimed_and_the_old_render_discarded(queue):
+    other = JobQueue(queue.queue_dir, lease_ttl=queue.lease_ttl, worker_id="other")
+    lease = queue.try_claim("clip.mp4")
+    _crash(lease)
+    assert other.try_claim("clip.mp4") is None
+    time.sleep(queue.lease_ttl * 1.5)
+    reclaimed = other.try_claim("clip.mp4")
+    assert reclaimed is not None
+    assert not lease.is_valid()
+    # The old owner's late result leaves no marker and doesn't touch the new lease
+    lease.release("done")
+    assert not other.is_done("clip.mp4")
+    assert reclaimed.is_valid()
+    reclaimed.release("done")
+    assert other.is_done("clip.mp4")
+
+def _stub_pipeline(monkeypatch, tmp_path, render):
+    """Run main's real job steps with the caption, speech and render stubbed; returns remembered captions."""
+    remembered = []
+    monkeypatch.setattr(config, "OUTPUT_VIDEOS_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "generate_text", lambda seed=None: "Keep going")
+    monkeypatch.setattr(main, "text_to_speech", lambda text, audio_file=None: audio_file)
+    monkeypatch.setattr(main, "process_video", render)
+    monkeypatch.setattr(main, "remember_caption", remembered.append)
+    return remembered
+
+def _touch(path: str) -> str:
+    open(path, "w").close()
+    return path
+
+def test_lost_lease_render_is_discarded_and_its_caption_not_remembered(queue, tmp_path, monkeypatch):
+    other = JobQueue(queue.queue_dir, lease_ttl=queue.lease_ttl, worker_id="other")
+
+    def render_while_the_lease_expires(video_path, caption_text, audio_path, output_path):
+        _crash(lease)
+        time.sleep(queue.lease_ttl * 1.5)
+        assert other.try_claim(lease.job_id) is not None
+        return _touch(output_path)
+
+    remembered = _stub_pipeline(monkeypatch, tmp_path, render_while_the_lease_expires)
+    lease = queue.try_claim("clip.mp4")
+    assert not main.process_leased_video(str(tmp_path / "clip.mp4"), lease)
+    assert remembered == []
+    assert os.listdir(tmp_path) == ["queue"]
+
+def test_published_render_remembers_its_caption(queue, tmp_path, monkeypatch):
+    remembered = _stub_pipeline(monkeypatch, tmp_path,
+                                lambda video_path, caption_text, audio_path, output_path: _touch(output_path))
+    lease = queue.try_claim("clip.mp4")
+    assert main.process_leased_video(str(tmp_path / "clip.mp4"), lease)
+    lease.release("done")
+    assert remembered == ["Keep going"]
+    assert os.path.exists(tmp_path / "clip_processed.mp4")
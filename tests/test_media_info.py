@@ -0,0 +1,27 @@
+"""
+Media probe cache tests: the memoized results are bounded by PROBE_CACHE_SIZE, dropping the
+least recently used first.
+"""
+
+import config
+import media_info
+from media_info import clear_probe_cache, remember_audio_duration
+
+def test_probe_cache_drops_the_least_recently_used(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROBE_CACHE_SIZE", 2)
+    clear_probe_cache()
+    paths = []
+    for name in ("a.wav", "b.wav", "c.wav"):
+        path = tmp_path / name
+        path.write_bytes(b"")
+        paths.append(str(path))
+
+    remember_audio_duration(paths[0], 1.0, 24000)
+    remember_audio_duration(paths[1], 1.0, 24000)
+    # Using the first result keeps it over the second
+    assert media_info.probe_media(paths[0]).duration == 1.0
+    remember_audio_duration(paths[2], 1.0, 24000)
+
+    cached = {key[0] for key in media_info._probe_cache}
+    assert cached == {paths[0], paths[2]}
+    clear_probe_cache()
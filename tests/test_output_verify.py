@@ -0,0 +1,62 @@
+"""
+Output verification tests: without ffprobe, media_info falls back to OpenCV, which can't see
+audio or subtitle streams. Those checks must be skipped then, not failed.
+"""
+
+import subprocess
+import pytest
+import config
+import media_info
+from media_info import clear_probe_cache, probe_media
+from output_verify import verify_output
+from toolchain import get_ffmpeg_path, get_ffprobe_path
+from video_editor import process_video
+
+@pytest.fixture
+def media(tmp_path):
+    ffmpeg_path = get_ffmpeg_path()
+    if not ffmpeg_path:
+        pytest.skip("FFmpeg is required to create the test clips")
+    video_path = str(tmp_path / "clip.mp4")
+    voice_path = str(tmp_path / "voice.wav")
+    subprocess.run([ffmpeg_path, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=30:duration=2',
+                    '-f', 'lavfi', '-i', 'sine=frequency=440:duration=2', '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+                    '-c:a', 'aac', '-shortest', video_path], check=True)
+    subprocess.run([ffmpeg_path, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=1',
+                    voice_path], check=True)
+    clear_probe_cache()
+    yield video_path, voice_path, tmp_path
+    clear_probe_cache()
+
+@pytest.fixture
+def without_ffprobe(monkeypatch):
+    monkeypatch.setattr(media_info, "get_ffprobe_path", lambda: None)
+    clear_probe_cache()
+
+def test_opencv_fallback_sees_only_the_video_stream(media, without_ffprobe):
+    video_path, _, _ = media
+    info = probe_media(video_path)
+    assert info.has_video and not info.has_audio
+    assert not info.streams_complete
+
+@pytest.mark.parametrize("caption_mode", ["burn", "soft"])
+def test_container_checks_are_skipped_without_ffprobe(media, without_ffprobe, caption_mode):
+    video_path, _, _ = media
+    result = verify_output(video_path, 2.0, caption_mode=caption_mode)
+    assert result.passed, result.summary()
+    skipped = {check.name for check in result.checks if check.skipped}
+    assert skipped == ({"audio", "captions"} if caption_mode == "soft" else {"audio"})
+
+def test_missing_subtitle_track_fails_with_ffprobe(media):
+    if not get_ffprobe_path():
+        pytest.skip("ffprobe is required to see the streams")
+    video_path, _, _ = media
+    result = verify_output(video_path, 2.0, caption_mode="soft")
+    assert [check.name for check in result.failures] == ["captions"]
+
+def test_process_video_passes_verification_without_ffprobe(media, without_ffprobe, monkeypatch):
+    video_path, voice_path, tmp_path = media
+    monkeypatch.setattr(config, "VERIFY_REPORT_FILE", str(tmp_path / "verification.jsonl"))
+    output_path = str(tmp_path / "out.mp4")
+    assert process_video(video_path, "Keep going", voice_path, output_path, caption_mode="burn",
+                         side_outputs=False, highlight=False) == output_path
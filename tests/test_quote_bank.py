@@ -0,0 +1,50 @@
+"""
+Quote bank tests: worker processes share the cursors through the state file (here in tmp_path),
+so together they still go through a bucket before any quote comes back. Each worker may leave
+up to RESERVE_STEPS reserved steps unused, which the cycle then skips.
+"""
+
+import multiprocessing
+from quote_bank import QuoteBank, RESERVE_STEPS
+
+QUOTES = [f"Quote number {i:03d} keeps going" for i in range(120)]
+
+def _paths(tmp_path):
+    return str(tmp_path / "quotes.npz"), str(tmp_path / "quotes_state.json")
+
+def _pick_many(index_path, state_path, count, results):
+    bank = QuoteBank(index_path, state_path)
+    results.extend([bank.pick() for _ in range(count)])
+
+def test_banks_sharing_a_state_file_pick_disjoint_quotes(tmp_path):
+    index_path, state_path = _paths(tmp_path)
+    QuoteBank.build(QUOTES, index_path)
+    first, second = QuoteBank(index_path, state_path), QuoteBank(index_path, state_path)
+    rounds = (len(QUOTES) - 2 * RESERVE_STEPS) // 2
+    picks = [bank.pick() for _ in range(rounds) for bank in (first, second)]
+    assert len(set(picks)) == len(picks)
+
+def test_worker_processes_pick_disjoint_quotes(tmp_path):
+    index_path, state_path = _paths(tmp_path)
+    QuoteBank.build(QUOTES, index_path)
+    with multiprocessing.Manager() as manager:
+        results = manager.list()
+        count = (len(QUOTES) - 3 * RESERVE_STEPS) // 3
+        workers = [multiprocessing.Process(target=_pick_many, args=(index_path, state_path, count, results))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert len(results) == 3 * count
+        assert len(set(results)) == len(results)
+
+def test_merge_is_seen_by_other_banks(tmp_path):
+    index_path, state_path = _paths(tmp_path)
+    QuoteBank.build(QUOTES[:100], index_path)
+    first, second = QuoteBank(index_path, state_path), QuoteBank(index_path, state_path)
+    first.pick()
+    assert first.merge(QUOTES, store_version="1") == 20
+    assert second.merge(QUOTES, store_version="1") == 0
+    picks = [second.pick() for _ in range(len(QUOTES) - 1)]
+    assert set(QUOTES[100:]) <= set(picks)
@@ -0,0 +1,40 @@
+"""
+Soft subtitle tests: every caption word must reach the muxed subtitle track, even when the
+planned output (voice padded to the video plus the tail) is longer than the copied video.
+"""
+
+import subprocess
+import pytest
+from toolchain import get_ffmpeg_path
+from video_editor import add_soft_subtitles_to_video
+
+CAPTION = "Every mountain top is within reach for you"
+
+@pytest.fixture
+def media(tmp_path):
+    ffmpeg_path = get_ffmpeg_path()
+    if not ffmpeg_path:
+        pytest.skip("FFmpeg is required for soft subtitles")
+    video_path = str(tmp_path / "clip.mp4")
+    voice_path = str(tmp_path / "voice.wav")
+    subprocess.run([ffmpeg_path, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=30:duration=3',
+                    '-c:v', 'libx264', '-pix_fmt', 'yuv420p', video_path], check=True)
+    subprocess.run([ffmpeg_path, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=2',
+                    voice_path], check=True)
+    return ffmpeg_path, video_path, voice_path, tmp_path
+
+def _subtitle_text(ffmpeg_path: str, path: str) -> str:
+    result = subprocess.run([ffmpeg_path, '-v', 'error', '-i', path, '-map', '0:s:0', '-f', 'srt', 'pipe:1'],
+                            capture_output=True, text=True, check=True)
+    return result.stdout
+
+@pytest.mark.parametrize("audio_fit", ["pad", "loop", "trim"])
+def test_every_word_is_in_the_subtitle_track(media, audio_fit):
+    ffmpeg_path, video_path, voice_path, tmp_path = media
+    output_path = add_soft_subtitles_to_video(video_path, CAPTION, voice_path, str(tmp_path / f"out_{audio_fit}.mkv"),
+                                              audio_fit=audio_fit, mix_original=False)
+    assert output_path
+    track = _subtitle_text(ffmpeg_path, output_path)
+    cue_words = [line.strip() for line in track.splitlines()
+                 if line.strip() and not line.strip().isdigit() and "-->" not in line]
+    assert cue_words == CAPTION.split()
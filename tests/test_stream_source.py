@@ -0,0 +1,64 @@
+"""
+Stream source tests: a short clip rendered from stdin, from an HTTP URL and from range requests
+(served locally, see conftest.py), without a local copy of the source. Skipped without FFmpeg.
+"""
+
+import io
+import os
+import shutil
+import subprocess
+import sys
+import pytest
+import config
+from media_info import probe_media
+from toolchain import get_ffmpeg_path, get_ffprobe_path
+from video_editor import process_video
+
+@pytest.fixture
+def media(tmp_path, monkeypatch):
+    ffmpeg_path = get_ffmpeg_path()
+    if not ffmpeg_path or not get_ffprobe_path():
+        pytest.skip("FFmpeg and ffprobe are required to probe and decode streams")
+    video_path = str(tmp_path / "clip.mp4")
+    voice_path = str(tmp_path / "voice.wav")
+    # The index goes first so the clip can be decoded as it arrives
+    subprocess.run([ffmpeg_path, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=30:duration=3',
+                    '-f', 'lavfi', '-i', 'sine=frequency=440:duration=3', '-c:v', 'libx264', '-pix_fmt', 'yuv420p',
+                    '-c:a', 'aac', '-shortest', '-movflags', '+faststart', video_path], check=True)
+    subprocess.run([ffmpeg_path, '-v', 'error', '-y', '-f', 'lavfi', '-i', 'sine=frequency=440:duration=1',
+                    voice_path], check=True)
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    monkeypatch.setattr(config, "OUTPUT_VIDEOS_DIR", str(output_dir))
+    monkeypatch.setattr(config, "VERIFY_REPORT_FILE", str(output_dir / "verification.jsonl"))
+    return video_path, voice_path, output_dir
+
+def _render(source: str, voice_path: str, output_dir) -> str:
+    output_path = str(output_dir / "out.mp4")
+    assert process_video(source, "Keep going", voice_path, output_path, caption_mode="burn",
+                         side_outputs=False, highlight=False) == output_path
+    info = probe_media(output_path)
+    assert info is not None and info.has_video
+    assert (info.width, info.height) == (320, 240)
+    # The extracted soundtrack is removed after the render
+    assert sorted(os.listdir(output_dir)) == ["out.mp4", "verification.jsonl"]
+    return output_path
+
+class _Stdin:
+    def __init__(self, data: bytes):
+        self.buffer = io.BytesIO(data)
+
+def test_render_from_stdin(media, monkeypatch):
+    video_path, voice_path, output_dir = media
+    with open(video_path, "rb") as f:
+        monkeypatch.setattr(sys, "stdin", _Stdin(f.read()))
+    _render("-", voice_path, output_dir)
+
+@pytest.mark.parametrize("prefix", ["", "range+"])
+def test_render_from_http(media, range_server, prefix):
+    video_path, voice_path, output_dir = media
+    shutil.copy(video_path, range_server.directory)
+    _render(prefix + range_server.url("clip.mp4"), voice_path, output_dir)
+    # ffmpeg reads a URL as one open-ended range, range+ URLs are fetched in bounded chunks
+    chunked = [header for header in range_server.ranges_of("clip.mp4") if header and not header.endswith("-")]
+    assert bool(chunked) == (prefix == "range+")
@@ -0,0 +1,142 @@
+"""
+Response store for the Video Modification Bot.
+Keeps the raw and cleaned output of every LLM request in a small SQLite database, keyed by
+everything that determines the response (model, prompts, options and seed). Seeded requests
+are reproducible, so re-running a job or rendering another variant reuses the stored caption
+instead of waiting for the model again.
+"""
+
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+import config
+
+@dataclass(frozen=True)
+class StoredResponse:
+    """One stored LLM response."""
+    raw: str
+    cleaned: Optional[str]  # None if the cleanup rejected the response
+    created_at: float
+
+def request_key(model: str, system_prompt: str, prompt: str, options: dict, seed: Optional[int]) -> str:
+    """Stable key of a request; options are serialized with sorted keys so their order doesn't matter."""
+    payload = json.dumps([model, system_prompt, prompt, options, seed], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class ResponseStore:
+    """
+    SQLite-backed store of LLM responses with TTL and size eviction.
+    Safe to share between threads and between processes on the same machine.
+    """
+
+    def __init__(self, path: str = config.TEXT_CACHE_FILE, ttl_seconds: float = config.TEXT_CACHE_TTL_DAYS * 86400,
+                 max_entries: int = config.TEXT_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        # WAL lets other processes read while one writes
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, model TEXT, seed INTEGER, raw TEXT NOT NULL, cleaned TEXT,"
+            " created_at REAL NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[StoredResponse]:
+        """Look up a response; expired entries count as misses."""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT raw, cleaned, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, key))
+            self._db.commit()
+        return StoredResponse(raw=row[0], cleaned=row[1], created_at=row[2])
+
+    def put(self, key: str, raw: str, cleaned: Optional[str], model: str = None, seed: Optional[int] = None):
+        """Store a response and evict what no longer fits."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, model, seed, raw, cleaned, created_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model, seed, raw, cleaned, now, now)
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now: float):
+        if self.ttl_seconds:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        if self.max_entries:
+            # Least recently used entries go first
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                " SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def cleaned_texts(self) -> List[str]:
+        """Every distinct usable (cleaned) response in the store."""
+        with self._lock:
+            rows = self._db.execute("SELECT DISTINCT cleaned FROM responses WHERE cleaned IS NOT NULL").fetchall()
+        return [row[0] for row in rows]
+
+    def version(self) -> str:
+        """Changes whenever responses are added or removed."""
+        with self._lock:
+            count, newest = self._db.execute("SELECT COUNT(*), MAX(created_at) FROM responses").fetchone()
+        return f"{count}:{newest}"
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_response_store() -> Optional[ResponseStore]:
+    """The shared store, or None if TEXT_CACHE_ENABLED is off or the database can't be opened."""
+    global _store
+    if not config.TEXT_CACHE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            try:
+                _store = ResponseStore()
+            except sqlite3.Error as e:
+                print(f"Warning: Could not open the response store {config.TEXT_CACHE_FILE}: {e}")
+                return None
+        return _store
+
+# For testing
+if __name__ == "__main__":
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ResponseStore(os.path.join(tmp, "responses.sqlite"), ttl_seconds=3600, max_entries=3)
+        keys = [request_key("model", "system", "prompt", {"temperature": 0.7}, seed) for seed in range(5)]
+        for seed, key in enumerate(keys):
+            store.put(key, f"raw {seed}", f"cleaned {seed}", model="model", seed=seed)
+        print(f"{len(store)} entries after 5 puts (max 3)")
+        print(f"seed 0: {store.get(keys[0])}")
+        print(f"seed 4: {store.get(keys[4])}")
+        store.close()
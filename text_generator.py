@@ -1,121 +1,332 @@
 """
 Text generation module for the Video Modification Bot.
 Handles generating motivational, fun, and philosophical text using Ollama's DeepSeek model.
+
+Requests are seeded and their raw and cleaned responses kept in the response store
+(text_cache.py), so the same request is answered without calling the model again.
+Each caption has a latency budget: a slow request is hedged with a second one, and when
+the deadline passes a quote from the local quote bank (quote_bank.py) is used instead.
+Captions that are near-duplicates of recently rendered ones (caption_index.py) are
+regenerated with the next seeds.
 """
 
 import os
+import hashlib
+import random
+import threading
+import time
 import requests
 import json
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 from typing import Optional
 import config
 import re
+from caption_index import get_caption_index
+from quote_bank import get_quote_bank
+from text_cache import get_response_store, request_key
+
+SYSTEM_PROMPT = "You are a creative writer who specializes in short, impactful motivational quotes. Always respond with ONLY the quote, no explanations."
+
+# Let's try a more direct prompt that skips the thinking
+DIRECT_PROMPT = "Create one short, motivational quote (higher than 200 characters and under 500 characters). Don't include any explanations, just the quote."
+
+# Timeout of a single chat request; requests abandoned at the deadline keep running up to this long
+REQUEST_TIMEOUT = 30
+
+# Longest caption that is used as is
+MAX_CAPTION_CHARS = 150
+
+FALLBACK_QUOTE = "Every journey begins with a single step. The path to success is paved with small victories."
+
+def caption_seed(key: str = None) -> int:
+    """
+    Seed for a caption request: derived from key (e.g. a job id) so re-runs of the same job
+    reproduce their caption, or random if key is None. Seeds stay within config.TEXT_SEED_POOL
+    if it is set (to serve captions from a warmed-up response store).
+    """
+    limit = config.TEXT_SEED_POOL or 2 ** 31
+    if key is None:
+        return random.randrange(limit)
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big") % limit
+
+def _is_duplicate(text: str) -> bool:
+    """True if the caption is a near-duplicate of a recently rendered one."""
+    index = get_caption_index()
+    match = index.find_duplicate(text) if index is not None and text else None
+    if match:
+        print(f"Caption is a near-duplicate ({match[1]:.2f}) of a recent video: {match[0]}")
+    return bool(match)
+
+def remember_caption(text: str):
+    """Add a rendered caption to the near-duplicate index."""
+    index = get_caption_index()
+    if index is not None and text:
+        try:
+            index.add(text)
+        except Exception as e:
+            print(f"Warning: Could not update the caption index: {e}")
+
+def clean_generated_text(generated_text: str) -> Optional[str]:
+    """
+    Extract the quote from a raw model response.
+
+    Returns:
+        The quote, or None if the response is empty or too long to use
+    """
+    generated_text = generated_text.strip()
+    
+    # Remove any thinking tags
+    if '<think>' in generated_text:
+        # Remove everything between <think> and </think> tags
+        generated_text = re.sub(r'<think>.*?</think>', '', generated_text, flags=re.DOTALL).strip()
+    
+    # If there are quotes in the text, try to extract just the quoted part
+    quote_match = re.search(r'"([^"]*)"', generated_text)
+    if quote_match:
+        generated_text = quote_match.group(1).strip()
+    
+    if not generated_text or len(generated_text) > MAX_CAPTION_CHARS:
+        return None
+    return generated_text
 
-def generate_text(prompt: str = config.TEXT_PROMPT, model: str = config.TEXT_MODEL) -> Optional[str]:
+def generate_text(prompt: str = config.TEXT_PROMPT, model: str = config.TEXT_MODEL, seed: Optional[int] = None,
+                  deadline: Optional[float] = config.TEXT_DEADLINE_SECONDS) -> Optional[str]:
     """
     Generate text using Ollama with a local model.
     
+    A caption that is a near-duplicate of a recently rendered one is regenerated with the
+    following seeds (up to config.CAPTION_DEDUP_ATTEMPTS, within the same deadline), then
+    replaced by a quote from the bank.
+    
     Args:
         prompt: The prompt to send to the language model
         model: The model name to use (defaults to config.TEXT_MODEL)
+        seed: Sampling seed; the same seed gives the same caption (if None, see caption_seed)
+        deadline: Seconds to wait for the model before a quote bank caption is used (None to wait
+                  for the request timeout)
         
     Returns:
         Generated text or None if generation fails
     """
     try:
         print(f"Using Ollama with model: {model}")
-        
-        # Let's try a more direct prompt that skips the thinking
-        direct_prompt = "Create one short, motivational quote (higher than 200 characters and under 500 characters). Don't include any explanations, just the quote."
-        
-        # Try with the chat API first since it tends to follow instructions better
-        return generate_text_with_chat(direct_prompt, model)
+        if seed is None:
+            seed = caption_seed()
+        started = time.monotonic()
+        attempts = max(1, config.CAPTION_DEDUP_ATTEMPTS) if get_caption_index() is not None else 1
+        for attempt in range(attempts):
+            remaining = deadline - (time.monotonic() - started) if deadline else None
+            if remaining is not None and remaining <= 0:
+                break
+            # Following seeds stay reproducible for the job and are often already stored
+            attempt_seed = (seed + attempt) % (config.TEXT_SEED_POOL or 2 ** 31)
+            
+            # Try with the chat API first since it tends to follow instructions better
+            text = generate_text_with_chat(DIRECT_PROMPT, model, attempt_seed, remaining)
+            if not _is_duplicate(text):
+                return text
+        return _fallback_quote("No new caption from the model")
         
     except Exception as e:
         print(f"Error generating text: {e}")
         # Return a default quote as fallback
-        default_quote = "Every journey begins with a single step. The path to success is paved with small victories."
-        print(f"Using default quote as fallback: {default_quote}")
-        return default_quote
+        print(f"Using default quote as fallback: {FALLBACK_QUOTE}")
+        return FALLBACK_QUOTE
+
+def _request_chat(prompt: str, model: str, options: dict, api_base: str = config.OLLAMA_API_BASE,
+                  timeout: float = REQUEST_TIMEOUT) -> Optional[str]:
+    """Send one chat request to Ollama and return the raw response text."""
+    api_url = f"{api_base}/api/chat"
+    request_data = {
+        "model": model,
+        "messages": [
+            {
+                "role": "system", 
+                "content": SYSTEM_PROMPT
+            },
+            {
+                "role": "user", 
+                "content": prompt
+            }
+        ],
+        "stream": False,
+        "options": options
+    }
+    
+    print(f"Sending request to: {api_url}")
+    
+    response = requests.post(
+        api_url,
+        json=request_data,
+        timeout=timeout
+    )
+    
+    if response.status_code != 200:
+        print(f"Error from Ollama Chat API: {response.status_code} - {response.text}")
+        return None
+    
+    response_json = response.json()
+    message = response_json.get("message", {})
+    return message.get("content", "")
+
+def _chat_request_key(prompt: str, model: str, seed: int):
+    """Ollama options of a chat request and its response store key."""
+    options = {"temperature": config.TEXT_TEMPERATURE, "seed": seed}
+    return options, request_key(model, SYSTEM_PROMPT, prompt, options, seed)
+
+def _fallback_quote(reason: str) -> str:
+    """A quote from the local bank that fits the caption length and wasn't used recently."""
+    quote = None
+    try:
+        bank = get_quote_bank()
+        # Bank picks rotate through the quotes, skip the ones rendered recently
+        for _ in range(20):
+            quote = bank.pick(max_chars=MAX_CAPTION_CHARS)
+            if not quote or not _is_duplicate(quote):
+                break
+    except Exception as e:
+        print(f"Error reading the quote bank: {e}")
+    quote = quote or FALLBACK_QUOTE
+    print(f"{reason}, using a quote from the bank: {quote}")
+    return quote
+
+def _start_request(fn, *args) -> Future:
+    """Run fn on a daemon thread, so an abandoned request never delays the exit."""
+    future = Future()
+    
+    def run():
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+    
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
+def _hedged_chat(prompt: str, model: str, options: dict, on_response, deadline: Optional[float]) -> Optional[str]:
+    """
+    Run the chat request within the deadline. If no answer has arrived after
+    config.TEXT_HEDGE_AFTER_SECONDS (or the first request failed), a second identical request is
+    sent, to OLLAMA_HEDGE_API_BASE if set; the first usable answer wins. Requests still running
+    at the deadline are abandoned but keep going in the background, so their answer is stored.
+    
+    Returns:
+        The cleaned text ("" if the response was unusable) or None if nothing arrived in time
+    """
+    budget = deadline if deadline else REQUEST_TIMEOUT
+    started = time.monotonic()
+    
+    def fetch(api_base: str) -> Optional[str]:
+        raw_text = _request_chat(prompt, model, options, api_base)
+        return None if raw_text is None else on_response(raw_text)
+    
+    pending = {_start_request(fetch, config.OLLAMA_API_BASE)}
+    hedged = not deadline  # Without a deadline there is nothing to hedge against
+    while True:
+        elapsed = time.monotonic() - started
+        if elapsed >= budget:
+            return None
+        if not hedged and (elapsed >= config.TEXT_HEDGE_AFTER_SECONDS or not pending):
+            print(f"No answer after {elapsed:.1f}s, sending a hedged request...")
+            pending.add(_start_request(fetch, config.OLLAMA_HEDGE_API_BASE or config.OLLAMA_API_BASE))
+            hedged = True
+        if not pending:
+            return None
+        
+        wake = budget if hedged else min(budget, config.TEXT_HEDGE_AFTER_SECONDS)
+        done, pending = wait(pending, timeout=max(0.0, wake - elapsed), return_when=FIRST_COMPLETED)
+        for future in done:
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"Error from chat request: {e}")
+                continue
+            if result is not None:
+                return result
 
-def generate_text_with_chat(prompt: str, model: str) -> Optional[str]:
+def generate_text_with_chat(prompt: str, model: str, seed: Optional[int] = None,
+                            deadline: Optional[float] = config.TEXT_DEADLINE_SECONDS) -> Optional[str]:
     """
     Generate text using Ollama's chat API.
+    The response is looked up in (and added to) the response store by model, prompts, options and seed.
+    If no usable caption arrives within the deadline, a quote bank caption is returned.
     """
     try:
         print("Using chat API for text generation...")
-        api_url = f"{config.OLLAMA_API_BASE}/api/chat"
-        request_data = {
-            "model": model,
-            "messages": [
-                {
-                    "role": "system", 
-                    "content": "You are a creative writer who specializes in short, impactful motivational quotes. Always respond with ONLY the quote, no explanations."
-                },
-                {
-                    "role": "user", 
-                    "content": prompt
-                }
-            ],
-            "stream": False,
-            "options": {
-                "temperature": 0.7
-            }
-        }
-        
-        print(f"Sending request to: {config.OLLAMA_API_BASE}/api/chat")
+        if seed is None:
+            seed = caption_seed()
+        options, key = _chat_request_key(prompt, model, seed)
+        store = get_response_store()
         
-        response = requests.post(
-            api_url,
-            json=request_data,
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            print(f"Error from Ollama Chat API: {response.status_code} - {response.text}")
-            return None
-        
-        response_json = response.json()
-        message = response_json.get("message", {})
-        generated_text = message.get("content", "").strip()
-        
-        # Clean up the text - extract just the quote
-        # Remove any thinking tags
-        if '<think>' in generated_text:
-            # Remove everything between <think> and </think> tags
-            generated_text = re.sub(r'<think>.*?</think>', '', generated_text, flags=re.DOTALL).strip()
-        
-        # If there are quotes in the text, try to extract just the quoted part
-        quote_match = re.search(r'"([^"]*)"', generated_text)
-        if quote_match:
-            generated_text = quote_match.group(1).strip()
-        
-        # If the text is too long or empty, use a default quote
-        if not generated_text or len(generated_text) > 150:
-            default_quotes = [
-                "Life isn't about finding yourself; it's about creating yourself.",
-                "The best way to predict the future is to create it.",
-                "Every mountain top is within reach if you just keep climbing.",
-                "Stars can't shine without darkness.",
-                "Dream big, stay positive, work hard, and enjoy the journey."
-            ]
-            import random
-            generated_text = random.choice(default_quotes)
-            print(f"Using random default quote: {generated_text}")
+        stored = store.get(key) if store is not None else None
+        if stored:
+            print(f"Using stored response (seed {seed})")
+            generated_text = stored.cleaned
         else:
-            print(f"Generated text from API: {generated_text}")
+            def on_response(raw_text: str) -> str:
+                # Clean up the text - extract just the quote
+                cleaned = clean_generated_text(raw_text)
+                if store is not None:
+                    store.put(key, raw_text, cleaned, model=model, seed=seed)
+                return cleaned or ""
             
+            started = time.monotonic()
+            generated_text = _hedged_chat(prompt, model, options, on_response, deadline)
+            if generated_text is None:
+                return _fallback_quote(f"No answer from the model within {time.monotonic() - started:.1f}s")
+        
+        # If the text is too long or empty, use a quote from the bank
+        if not generated_text:
+            return _fallback_quote("The model's response was unusable")
+        
+        print(f"Generated text from API (seed {seed}): {generated_text}")
         return generated_text
         
     except Exception as e:
         print(f"Error generating text with chat API: {e}")
         
         # Last resort: return a default quote
-        default_quote = "Every journey begins with a single step. The path to success is paved with small victories."
-        print(f"Using default quote as fallback: {default_quote}")
-        return default_quote
+        return _fallback_quote("Text generation failed")
+
+def warm_up_responses(count: int = config.TEXT_WARM_UP_COUNT, model: str = config.TEXT_MODEL) -> int:
+    """
+    Pre-fill the response store with the captions of seeds 0 to count - 1, ahead of rendering.
+    Seeds that are already stored are skipped. Renders only use them with config.TEXT_SEED_POOL set.
+    
+    Returns:
+        Number of captions generated
+    """
+    store = get_response_store()
+    if store is None:
+        print("Error: The response store is disabled (TEXT_CACHE_ENABLED), nothing to warm up.")
+        return 0
+    if not config.TEXT_SEED_POOL:
+        print(f"Note: Caption seeds are unbounded; set TEXT_SEED_POOL = {count} to render from the warmed-up captions")
+    elif count > config.TEXT_SEED_POOL:
+        print(f"Warning: Only seeds below TEXT_SEED_POOL ({config.TEXT_SEED_POOL}) are used for captions")
+    
+    generated = 0
+    for seed in range(count):
+        _, key = _chat_request_key(DIRECT_PROMPT, model, seed)
+        if store.get(key):
+            continue
+        print(f"\nWarming up caption {seed + 1}/{count}...")
+        generate_text_with_chat(DIRECT_PROMPT, model, seed, deadline=None)
+        if not store.get(key):
+            print("Error: The model did not answer, stopping the warm-up.")
+            break
+        generated += 1
+    print(f"Response store warmed up: {generated} new caption(s), {len(store)} stored")
+    return generated
 
 # For testing
 if __name__ == "__main__":
+    import sys
+
+    if "--warm-up" in sys.argv:
+        warm_up_responses(int(sys.argv[sys.argv.index("--warm-up") + 1]))
+        sys.exit(0)
+
     text = generate_text()
     if text:
         print(f"Final quote: {text}")
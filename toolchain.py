@@ -0,0 +1,276 @@
+"""
+FFmpeg toolchain module for the Video Modification Bot.
+Resolves the ffmpeg/ffprobe executables once per process and detects which encoders,
+hardware accelerators and filters the installed build supports, so the encoding
+stages can pick the fastest available path.
+"""
+
+import os
+import json
+import shutil
+import subprocess
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import FrozenSet, List, Optional
+import config
+
+# Version of the on-disk capability cache layout
+_CACHE_VERSION = 1
+
+# H.264 encoders in order of preference. Hardware encoders are only used after a
+# trial encode succeeds, because builds often list encoders the machine can't run.
+_VIDEO_ENCODER_PREFERENCE = [
+    ("h264_nvenc", ["-preset", "p1"], True),
+    ("h264_qsv", ["-preset", "veryfast"], True),
+    ("h264_videotoolbox", ["-realtime", "1"], True),
+    ("h264_amf", ["-quality", "speed"], True),
+    ("libx264", ["-preset", "veryfast", "-crf", "20"], False),
+    ("libopenh264", [], False),
+    ("mpeg4", ["-q:v", "3"], False),
+]
+
+_AUDIO_ENCODER_PREFERENCE = [
+    ("aac", ["-b:a", "192k"]),
+    ("libfdk_aac", ["-b:a", "192k"]),
+    ("libmp3lame", ["-q:a", "2"]),
+]
+
+@dataclass(frozen=True)
+class FFmpegCapabilities:
+    """Features supported by the resolved ffmpeg build."""
+    ffmpeg_path: str
+    version: str
+    encoders: FrozenSet[str]
+    hwaccels: FrozenSet[str]
+    filters: FrozenSet[str]
+    working_hw_encoders: FrozenSet[str]
+
+    def has_encoder(self, name: str) -> bool:
+        return name in self.encoders
+
+    def has_filter(self, name: str) -> bool:
+        return name in self.filters
+
+_capabilities_lock = threading.Lock()
+_capabilities: Optional[FFmpegCapabilities] = None
+
+def _common_windows_paths(exe_name: str) -> List[str]:
+    return [
+        f"C:\\Program Files\\ffmpeg\\bin\\{exe_name}",
+        f"C:\\Program Files (x86)\\ffmpeg\\bin\\{exe_name}",
+        f"C:\\ffmpeg\\bin\\{exe_name}",
+        os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Programs', 'ffmpeg', 'bin', exe_name),
+        os.path.join(os.environ.get('APPDATA', ''), 'ffmpeg', 'bin', exe_name),
+    ]
+
+@lru_cache(maxsize=None)
+def find_executable(name: str) -> Optional[str]:
+    """
+    Locate an FFmpeg tool ('ffmpeg' or 'ffprobe'). The lookup runs once per process.
+
+    The config override (FFMPEG_PATH / FFPROBE_PATH) is checked first, then PATH,
+    then the directory of the other configured tool and common Windows locations.
+
+    Args:
+        name: Tool name without extension
+
+    Returns:
+        Full path to the executable or None if it cannot be found
+    """
+    configured = getattr(config, f"{name.upper()}_PATH", None)
+    if configured:
+        if os.path.exists(configured):
+            return configured
+        print(f"Warning: {name} path specified in config ({configured}) does not exist.")
+
+    found = shutil.which(f"{name}.exe") or shutil.which(name)
+    if found:
+        return found
+
+    # A custom ffmpeg location usually ships ffprobe alongside it (and vice versa)
+    for other in ("FFMPEG_PATH", "FFPROBE_PATH"):
+        other_path = getattr(config, other, None)
+        if other_path:
+            for exe_name in (f"{name}.exe", name):
+                candidate = os.path.join(os.path.dirname(other_path), exe_name)
+                if os.path.exists(candidate):
+                    return candidate
+
+    for candidate in _common_windows_paths(f"{name}.exe"):
+        if os.path.exists(candidate):
+            return candidate
+
+    return None
+
+def get_ffmpeg_path() -> Optional[str]:
+    """Return the resolved ffmpeg executable, or None if it is not installed."""
+    return find_executable("ffmpeg")
+
+def get_ffprobe_path() -> Optional[str]:
+    """Return the resolved ffprobe executable, or None if it is not installed."""
+    return find_executable("ffprobe")
+
+def _run_listing(ffmpeg_path: str, flag: str) -> str:
+    result = subprocess.run([ffmpeg_path, '-hide_banner', flag], capture_output=True, text=True)
+    return result.stdout if result.returncode == 0 else ""
+
+def _parse_codec_listing(output: str) -> FrozenSet[str]:
+    """Parse `ffmpeg -encoders` / `-filters` output into a set of names."""
+    names = set()
+    in_body = False
+    for line in output.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        if parts[0].startswith("------"):
+            in_body = True
+            continue
+        # The encoder listing starts after a separator line, filter lines carry an "A->V" signature
+        if len(parts) >= 3 and (in_body or "->" in parts[2]):
+            names.add(parts[1])
+    return frozenset(names)
+
+def _parse_hwaccels(output: str) -> FrozenSet[str]:
+    lines = [line.strip() for line in output.splitlines()]
+    return frozenset(line for line in lines if line and not line.endswith(":"))
+
+def _trial_encode(ffmpeg_path: str, encoder: str) -> bool:
+    """Check that a hardware encoder actually works on this machine."""
+    cmd = [
+        ffmpeg_path, '-v', 'error', '-f', 'lavfi', '-i', 'color=black:s=256x256:d=0.1',
+        '-frames:v', '1', '-pix_fmt', 'yuv420p', '-c:v', encoder, '-f', 'null', '-'
+    ]
+    try:
+        return subprocess.run(cmd, capture_output=True, timeout=20).returncode == 0
+    except (subprocess.TimeoutExpired, OSError):
+        return False
+
+def _cache_signature(ffmpeg_path: str) -> dict:
+    stat = os.stat(ffmpeg_path)
+    return {"version": _CACHE_VERSION, "path": ffmpeg_path, "size": stat.st_size, "mtime": stat.st_mtime}
+
+def _load_cached_capabilities(ffmpeg_path: str) -> Optional[FFmpegCapabilities]:
+    cache_file = config.TOOLCHAIN_CACHE_FILE
+    try:
+        with open(cache_file, "r") as f:
+            data = json.load(f)
+        if data.get("signature") != _cache_signature(ffmpeg_path):
+            return None
+        return FFmpegCapabilities(
+            ffmpeg_path=ffmpeg_path,
+            version=data["version"],
+            encoders=frozenset(data["encoders"]),
+            hwaccels=frozenset(data["hwaccels"]),
+            filters=frozenset(data["filters"]),
+            working_hw_encoders=frozenset(data["working_hw_encoders"]),
+        )
+    except (OSError, ValueError, KeyError):
+        return None
+
+def _save_cached_capabilities(caps: FFmpegCapabilities):
+    cache_file = config.TOOLCHAIN_CACHE_FILE
+    data = {
+        "signature": _cache_signature(caps.ffmpeg_path),
+        "version": caps.version,
+        "encoders": sorted(caps.encoders),
+        "hwaccels": sorted(caps.hwaccels),
+        "filters": sorted(caps.filters),
+        "working_hw_encoders": sorted(caps.working_hw_encoders),
+    }
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        print(f"Warning: Could not write toolchain cache: {e}")
+
+def _detect_capabilities(ffmpeg_path: str) -> FFmpegCapabilities:
+    version_output = _run_listing(ffmpeg_path, '-version')
+    version = version_output.splitlines()[0] if version_output else ""
+    encoders = _parse_codec_listing(_run_listing(ffmpeg_path, '-encoders'))
+    filters = _parse_codec_listing(_run_listing(ffmpeg_path, '-filters'))
+    hwaccels = _parse_hwaccels(_run_listing(ffmpeg_path, '-hwaccels'))
+
+    working_hw_encoders = frozenset(
+        name for name, _, is_hw in _VIDEO_ENCODER_PREFERENCE
+        if is_hw and name in encoders and _trial_encode(ffmpeg_path, name)
+    )
+
+    return FFmpegCapabilities(
+        ffmpeg_path=ffmpeg_path,
+        version=version,
+        encoders=encoders,
+        hwaccels=hwaccels,
+        filters=filters,
+        working_hw_encoders=working_hw_encoders,
+    )
+
+def get_capabilities() -> Optional[FFmpegCapabilities]:
+    """
+    Detect the capabilities of the resolved ffmpeg build.
+
+    The result is computed once per process and cached on disk, validated against
+    the size and modification time of the ffmpeg executable.
+
+    Returns:
+        FFmpegCapabilities or None if ffmpeg is not installed
+    """
+    global _capabilities
+    with _capabilities_lock:
+        if _capabilities is not None:
+            return _capabilities
+
+        ffmpeg_path = get_ffmpeg_path()
+        if not ffmpeg_path:
+            return None
+
+        caps = _load_cached_capabilities(ffmpeg_path)
+        if caps is None:
+            caps = _detect_capabilities(ffmpeg_path)
+            _save_cached_capabilities(caps)
+            hw = ", ".join(sorted(caps.working_hw_encoders)) or "none"
+            print(f"Detected FFmpeg capabilities ({caps.version}); working hardware encoders: {hw}")
+
+        _capabilities = caps
+        return caps
+
+def select_video_encoder() -> List[str]:
+    """
+    Return the ffmpeg arguments for the fastest available H.264 (or fallback) encoder.
+
+    Returns:
+        Argument list such as ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '20']
+    """
+    caps = get_capabilities()
+    if caps:
+        for name, args, is_hw in _VIDEO_ENCODER_PREFERENCE:
+            if is_hw and name not in caps.working_hw_encoders:
+                continue
+            if caps.has_encoder(name):
+                return ['-c:v', name] + args
+    return ['-c:v', 'mpeg4', '-q:v', '3']
+
+def select_audio_encoder() -> List[str]:
+    """Return the ffmpeg arguments for the preferred available audio encoder."""
+    caps = get_capabilities()
+    if caps:
+        for name, args in _AUDIO_ENCODER_PREFERENCE:
+            if caps.has_encoder(name):
+                return ['-c:a', name] + args
+    return ['-c:a', 'aac']
+
+# For testing
+if __name__ == "__main__":
+    print(f"ffmpeg: {get_ffmpeg_path()}")
+    print(f"ffprobe: {get_ffprobe_path()}")
+    capabilities = get_capabilities()
+    if capabilities:
+        print(f"Version: {capabilities.version}")
+        print(f"{len(capabilities.encoders)} encoders, {len(capabilities.filters)} filters")
+        print(f"Hardware accelerators: {', '.join(sorted(capabilities.hwaccels)) or 'none'}")
+        print(f"Working hardware encoders: {', '.join(sorted(capabilities.working_hw_encoders)) or 'none'}")
+        print(f"Selected video encoder: {' '.join(select_video_encoder())}")
+        print(f"Selected audio encoder: {' '.join(select_audio_encoder())}")
@@ -5,75 +5,604 @@ This is a replacement for the previous implementation that used MoviePy with Ima
 
 import os
 import sys
-from typing import Optional
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
 import cv2
 import numpy as np
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 import config
+from caption_layout import caption_origin_y, layout_caption
+from caption_style import DEFAULT_STYLE, CaptionStyle, find_system_font
+from caption_effects import IDENTITY_SCALE, SCALE_STEP, CaptionAnimation, CaptionTransform, build_caption_animation
+from caption_placement import plan_caption_placement
+from caption_schedule import CaptionPlacement, CaptionSchedule, build_caption_schedule
+from frame_pool import FramePool
+from highlights import select_highlight_window
+from side_outputs import SideOutputCapture
+from stage_scheduler import stage_slot
+from stream_source import StreamSource, is_stream_source
+from shm_ring import SharedFrameRing
+from subtitles import subtitle_codec_for, write_subtitles
+from media_info import probe_media
+from mezzanine import get_render_source
+from output_verify import verify_output, write_report
+from toolchain import get_capabilities, get_ffmpeg_path, select_audio_encoder
+from video_writer import open_video_writer
 
-def find_system_font(font_name=None):
+# How often a blocked parent checks that its compositing processes are still alive
+WORKER_POLL_SECONDS = 0.5
+
+class _CaptionSprite:
+    """A caption rasterized once: premultiplied BGR color and alpha, ready for blending."""
+    
+    def __init__(self, premultiplied: np.ndarray, alpha: np.ndarray):
+        self.premultiplied = premultiplied
+        self.alpha = alpha
+        self.height, self.width = alpha.shape[:2]
+    
+    @classmethod
+    def from_rgba(cls, rgba: np.ndarray) -> "_CaptionSprite":
+        alpha = rgba[:, :, 3:4].astype(np.float32) / 255.0
+        return cls(cv2.cvtColor(rgba[:, :, :3], cv2.COLOR_RGB2BGR).astype(np.float32) * alpha, alpha)
+    
+    def scaled(self, scale: float) -> "_CaptionSprite":
+        """Resample the sprite around its center; premultiplied colors keep the edges clean."""
+        width = max(1, int(round(self.width * scale)))
+        height = max(1, int(round(self.height * scale)))
+        matrix = np.float32([[scale, 0, (width - self.width * scale) / 2],
+                             [0, scale, (height - self.height * scale) / 2]])
+        premultiplied = cv2.warpAffine(self.premultiplied, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                                       borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        alpha = cv2.warpAffine(self.alpha, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                               borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+        return _CaptionSprite(premultiplied, alpha.reshape(height, width, 1))
+    
+    @property
+    def nbytes(self) -> int:
+        return self.premultiplied.nbytes + self.alpha.nbytes
+
+class _SpriteCache:
+    """
+    Caption sprites of every style, shared by all renderers of the process and keyed by
+    (style, text, frame size, scale step). Least recently used sprites go past the byte budget.
     """
-    Find a system font that can be used with Pillow.
     
-    Args:
-        font_name: Name of the font to look for (e.g., 'Arial', 'Impact')
-                  If None, will try to use the font specified in config
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._sprites = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key) -> Optional[_CaptionSprite]:
+        with self._lock:
+            sprite = self._sprites.get(key)
+            if sprite is not None:
+                self._sprites.move_to_end(key)
+            return sprite
+    
+    def put(self, key, sprite: _CaptionSprite) -> _CaptionSprite:
+        with self._lock:
+            # Another job may have rasterized the same caption meanwhile; keep the first
+            existing = self._sprites.get(key)
+            if existing is not None:
+                return existing
+            self._sprites[key] = sprite
+            self.nbytes += sprite.nbytes
+            while self.nbytes > self.max_bytes and len(self._sprites) > 1:
+                _, evicted = self._sprites.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+            return sprite
+
+_sprite_cache = _SpriteCache(config.CAPTION_SPRITE_CACHE_MB * 1024 * 1024)
+
+class CaptionRenderer:
+    """
+    Draws caption text onto video frames in one CaptionStyle (the CAPTION_* values in config if None).
+    
+    Each distinct text is laid out (wrapped, shrunk to fit and placed) and rasterized once
+    per style and frame size into a small sprite, shared with every other renderer of the
+    process; per frame only the region under the sprite is blended, in place, using
+    preallocated scratch buffers. Animated effects scale the sprite (not the frame), and
+    each (text, scale step) is resampled only once. A shot's CaptionPlacement moves the caption
+    and changes its box opacity; each placement is a style of its own in the sprite cache.
+    """
+    
+    BACKGROUND_PADDING = 10
+    LINE_SPACING = 0.1  # Extra space between wrapped lines, relative to the line height
+    MAX_HEIGHT_FRACTION = 1 / 3  # Captions never cover more than this part of the frame height
+    
+    def __init__(self, style: Optional[CaptionStyle] = None):
+        self.style = style or DEFAULT_STYLE
+        # Loaded once per font and process, shared with every other style using the font
+        self.fonts = self.style.fonts
+        self._placed_styles = {}
+        self._scratch_shape = (0, 0)
+        # Rasterizations by this renderer, reported once per job instead of per caption
+        self.rasterized = 0
+        self.shrunk = 0
+        self.cropped = 0
+    
+    def style_for(self, placement: Optional[CaptionPlacement]) -> CaptionStyle:
+        """This renderer's style moved and boxed for one shot (the style itself if placement is None)."""
+        if placement is None:
+            return self.style
+        style = self._placed_styles.get(placement)
+        if style is None:
+            style = self.style.with_changes(position=placement.position, background_alpha=placement.background_alpha)
+            self._placed_styles[placement] = style
+        return style
+    
+    def _rasterize(self, text: str, frame_width: int, frame_height: int, style: CaptionStyle) -> _CaptionSprite:
+        """Lay out the text for a frame size and draw it with its background box into an RGBA sprite."""
+        padding = self.BACKGROUND_PADDING
+        margin = style.margin_pixels(frame_width, frame_height)
+        layout = layout_caption(
+            text, self.fonts, style.font_size,
+            max_width=frame_width - 2 * margin - 2 * padding,
+            max_height=frame_height * self.MAX_HEIGHT_FRACTION - 2 * padding,
+            min_font_size=min(style.min_font_size, style.font_size),
+            stroke_width=style.stroke_width,
+            line_spacing=self.LINE_SPACING,
+        )
+        self.rasterized += 1
+        if not layout.fits:
+            self.cropped += 1
+        elif layout.font_size < style.font_size:
+            self.shrunk += 1
+        
+        size = (layout.width + 2 * padding, layout.height + 2 * padding)
+        
+        # Semi-transparent background for better readability
+        sprite = Image.new('RGBA', size, (0, 0, 0, style.background_alpha))
+        
+        # Text with stroke (outline) on its own layer, composited over the box; lines are centered
+        text_layer = Image.new('RGBA', size, (0, 0, 0, 0))
+        draw = ImageDraw.Draw(text_layer)
+        font = self.fonts.font(layout.font_size)
+        for i, (line, line_width) in enumerate(zip(layout.lines, layout.line_widths)):
+            draw.text(
+                (padding + (layout.width - line_width) / 2, padding + style.stroke_width + i * layout.line_step),
+                line,
+                font=font,
+                fill=style.color,
+                stroke_width=style.stroke_width,
+                stroke_fill=style.stroke_color
+            )
+        sprite = Image.alpha_composite(sprite, text_layer)
+        return _CaptionSprite.from_rgba(np.asarray(sprite))
+    
+    def _sprite(self, text: str, frame_size: Tuple[int, int], scale_step: int = IDENTITY_SCALE,
+                style: CaptionStyle = None) -> _CaptionSprite:
+        style = style or self.style
+        key = (style, text, frame_size, IDENTITY_SCALE)
+        sprite = _sprite_cache.get(key)
+        if sprite is None:
+            sprite = _sprite_cache.put(key, self._rasterize(text, *frame_size, style))
+        if scale_step == IDENTITY_SCALE:
+            return sprite
+        key = (style, text, frame_size, scale_step)
+        scaled = _sprite_cache.get(key)
+        if scaled is None:
+            scaled = _sprite_cache.put(key, sprite.scaled(scale_step * SCALE_STEP))
+        return scaled
+    
+    def animation_for(self, schedule: CaptionSchedule) -> Optional[CaptionAnimation]:
+        """Easing table of this renderer's effect for a caption schedule (None for a plain fade)."""
+        return build_caption_animation(self.style.effect, schedule)
+    
+    def _ensure_scratch(self, height: int, width: int):
+        # Scratch buffers only grow, and only to the largest sprite seen
+        if height <= self._scratch_shape[0] and width <= self._scratch_shape[1]:
+            return
+        height = max(height, self._scratch_shape[0])
+        width = max(width, self._scratch_shape[1])
+        self._alpha = np.empty((height, width, 1), dtype=np.float32)
+        self._color = np.empty((height, width, 3), dtype=np.float32)
+        self._blend = np.empty((height, width, 3), dtype=np.float32)
+        self._scratch_shape = (height, width)
+    
+    @property
+    def scratch_nbytes(self) -> int:
+        if not self._scratch_shape[0]:
+            return 0
+        return self._alpha.nbytes + self._color.nbytes + self._blend.nbytes
+    
+    def render_into(self, frame: np.ndarray, text: str, alpha: int, transform: Optional[CaptionTransform] = None,
+                    placement: Optional[CaptionPlacement] = None):
+        """
+        Blend a caption into a BGR frame in place, centered horizontally at the configured position.
+        
+        Args:
+            frame: Frame to draw on (modified in place)
+            text: Caption text
+            alpha: Opacity from 0 to 255; the background box fades along with the text
+            transform: (scale step, dx, dy) from a CaptionAnimation, offsets in caption heights;
+                       None draws the caption at rest
+            placement: Position and box opacity of the current shot (CaptionSchedule.placement_at);
+                       None keeps the style's own
+        """
+        if alpha <= 0 or not text:
+            return
+        scale_step, dx, dy = transform or (IDENTITY_SCALE, 0.0, 0.0)
+        if scale_step <= 0:
+            return
+        frame_height, frame_width = frame.shape[:2]
+        frame_size = (frame_width, frame_height)
+        style = self.style_for(placement)
+        base = self._sprite(text, frame_size, style=style)
+        sprite = self._sprite(text, frame_size, scale_step, style)
+        
+        # Place the caption at rest, then center the (scaled) sprite on that box and offset it;
+        # parts outside the frame are cropped
+        rest_y = caption_origin_y(style.position, frame_height, base.height,
+                                  style.margin_pixels(frame_width, frame_height))
+        x = (frame_width - sprite.width) // 2 + int(round(dx * base.height))
+        y = rest_y + (base.height - sprite.height) // 2 + int(round(dy * base.height))
+        sx, sy = max(0, -x), max(0, -y)
+        x, y = max(0, x), max(0, y)
+        w = min(sprite.width - sx, frame_width - x)
+        h = min(sprite.height - sy, frame_height - y)
+        if w <= 0 or h <= 0:
+            return
+        
+        self._ensure_scratch(h, w)
+        fade = alpha / 255.0
+        region = frame[y:y + h, x:x + w]
+        sprite_alpha = self._alpha[:h, :w]
+        color = self._color[:h, :w]
+        blend = self._blend[:h, :w]
+        
+        # region = region * (1 - alpha * fade) + premultiplied * fade
+        np.multiply(sprite.alpha[sy:sy + h, sx:sx + w], -fade, out=sprite_alpha)
+        np.add(sprite_alpha, 1.0, out=sprite_alpha)
+        np.multiply(region, sprite_alpha, out=blend)
+        np.multiply(sprite.premultiplied[sy:sy + h, sx:sx + w], fade, out=color)
+        np.add(blend, color, out=blend)
+        np.copyto(region, blend, casting='unsafe')
+    
+    def text_pixels(self, text: str, frame_width: int, frame_height: int,
+                    placement: Optional[CaptionPlacement] = None) -> Tuple[int, int, np.ndarray]:
+        """
+        Where a caption at rest is drawn in its solid text color, for checking rendered frames.
+        
+        Returns:
+            Tuple of (x, y, mask): the sprite's top-left corner in the frame and a boolean mask of
+            the sprite's size, True on glyph pixels at least one pixel away from their outline
+        """
+        style = self.style_for(placement)
+        sprite = self._sprite(text, (frame_width, frame_height), style=style)
+        x = (frame_width - sprite.width) // 2
+        y = caption_origin_y(style.position, frame_height, sprite.height,
+                             style.margin_pixels(frame_width, frame_height))
+        color = sprite.premultiplied / np.maximum(sprite.alpha, 1e-6)
+        solid = (sprite.alpha[:, :, 0] > 0.99) & (np.abs(color - self.style.color[::-1]).max(axis=2) < 8)
+        # Edges are blurred by chroma subsampling, only glyph interiors are reliable
+        mask = cv2.erode(solid.astype(np.uint8), np.ones((3, 3), np.uint8)).astype(bool)
+        return x, y, mask
+    
+    def sprite_summary(self) -> str:
+        """One line on the captions this renderer rasterized (sprite cache misses)."""
+        summary = f"{self.rasterized} caption sprites rasterized"
+        if self.shrunk:
+            summary += f", {self.shrunk} shrunk to fit the frame"
+        if self.cropped:
+            summary += f", {self.cropped} too large even at the minimum font size (cropped)"
+        return summary
+    
+    def render(self, frame: np.ndarray, text: str, alpha: int = 255,
+               transform: Optional[CaptionTransform] = None,
+               placement: Optional[CaptionPlacement] = None) -> np.ndarray:
+        """Return a copy of the frame with the caption drawn on it."""
+        output = frame.copy()
+        self.render_into(output, text, alpha, transform, placement)
+        return output
+
+class _CaptionJob:
+    """One captioned output fed from the shared decode loop."""
+    
+    def __init__(self, schedule: CaptionSchedule, renderer: CaptionRenderer, writer, output_path: str,
+                 capture: Optional[SideOutputCapture] = None):
+        self.schedule = schedule
+        self.renderer = renderer
+        self.writer = writer
+        self.output_path = output_path
+        self.capture = capture
+        self.animation = renderer.animation_for(schedule)
+        self.output_buffer = None
+        self.error = None
+    
+    def caption_state(self, frame_index: int):
+        """(text, alpha, transform, placement) of the caption at an output frame."""
+        text, alpha = self.schedule.state_at(frame_index)
+        transform = None
+        if self.animation is not None:
+            transform = self.animation.transform_at(self.schedule.entry_frame_at(frame_index))
+        return text, alpha, transform, self.schedule.placement_at(frame_index)
+    
+    def process(self, frame_index: int, frame: np.ndarray):
+        if frame_index >= self.schedule.total_frames or self.error:
+            return
+        # Decoded frames are shared between jobs, draw on this job's own reusable buffer
+        if self.output_buffer is None:
+            self.output_buffer = np.empty_like(frame)
+        np.copyto(self.output_buffer, frame)
+        text, alpha, transform, placement = self.caption_state(frame_index)
+        self.renderer.render_into(self.output_buffer, text, alpha, transform, placement)
+        if self.capture is not None:
+            self.capture.observe(frame_index, self.output_buffer, alpha)
+        self.writer.write(self.output_buffer)
+
+def _frame_pool_size(frame_bytes: int, job_count: int) -> int:
+    """Number of decode buffers that fits the per-worker frame memory budget."""
+    budget = config.FRAME_MEMORY_LIMIT_MB * 1024 * 1024
+    # Each job also keeps one output buffer of its own
+    size = budget // frame_bytes - job_count
+    if size < 2:
+        print(f"Warning: FRAME_MEMORY_LIMIT_MB={config.FRAME_MEMORY_LIMIT_MB} is too small for "
+              f"{job_count} outputs at this resolution, using the minimum of 2 decode buffers")
+        return 2
+    return int(min(size, config.VARIANT_QUEUE_SIZE + 2))
+
+def _peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of this process in MB, None where it can't be measured."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def _iter_output_frames(cap, pool: FramePool, frame_count: int, total_frames: int, acquire=None):
+    """
+    Yield (index, slot) for every output frame, decoding each source frame once into the pool.
+    Frames past the end of the source repeat its last frame.
+    acquire, if given, replaces pool.acquire (e.g. to keep checking on the consumers while waiting).
+    
+    The caller owns one reference to each yielded slot and must release it.
+    """
+    acquire = acquire or pool.acquire
+    held_slot = None  # Reference kept on the latest decoded frame so it can be repeated
+    try:
+        for frame_index in range(total_frames):
+            slot = None
+            if held_slot is None or frame_index < frame_count:
+                slot = acquire()
+                buffer = pool.buffer(slot)
+                ret, frame = cap.read(image=buffer)
+                if ret and frame is not buffer:
+                    if frame.shape != buffer.shape:
+                        print(f"Error: Decoded frame size {frame.shape} doesn't match the probed size {buffer.shape}")
+                        ret = False
+                    else:
+                        np.copyto(buffer, frame)
+                if not ret:
+                    pool.release(slot)
+                    slot = None
+            if slot is None:
+                if held_slot is None:
+                    return
+                slot = held_slot
+            elif held_slot is not None:
+                pool.release(held_slot)
+            held_slot = slot
+            pool.retain(slot)
+            yield frame_index, slot
+    finally:
+        if held_slot is not None:
+            pool.release(held_slot)
+
+def _run_caption_jobs(cap, pool: FramePool, frame_count: int, jobs: List[_CaptionJob]) -> int:
+    """
+    Decode the source once and feed every frame to all caption jobs.
+    With several jobs, each one composites and encodes on its own thread.
     
     Returns:
-        Path to the font file if found, None otherwise
+        Number of output frames produced
     """
-    if font_name is None:
-        font_name = config.CAPTION_FONT
-    
-    # Common font directories and extensions to check
-    font_dirs = [
-        "/usr/share/fonts/truetype/",  # Linux
-        "/usr/share/fonts/TTF/",       # Linux
-        "/Library/Fonts/",             # macOS
-        "C:\\Windows\\Fonts\\"         # Windows
-    ]
+    total_frames = max(job.schedule.total_frames for job in jobs)
+    produced = 0
+    
+    if len(jobs) == 1:
+        for frame_index, slot in _iter_output_frames(cap, pool, frame_count, total_frames):
+            if frame_index % 100 == 0:
+                print(f"Processing frame {frame_index + 1}/{total_frames}")
+            try:
+                jobs[0].process(frame_index, pool.buffer(slot))
+            finally:
+                pool.release(slot)
+            produced += 1
+        return produced
+    
+    def worker(job: _CaptionJob, frames: queue.Queue):
+        while True:
+            item = frames.get()
+            if item is None:
+                break
+            frame_index, slot = item
+            try:
+                job.process(frame_index, pool.buffer(slot))
+            except Exception as e:
+                # Keep draining the queue so the decoder never blocks on a failed variant
+                job.error = e
+            finally:
+                pool.release(slot)
     
-    font_extensions = ['.ttf', '.otf', '.TTF', '.OTF']
-    
-    # Try exact name match first
-    for font_dir in font_dirs:
-        if os.path.exists(font_dir):
-            for ext in font_extensions:
-                font_path = os.path.join(font_dir, f"{font_name}{ext}")
-                if os.path.exists(font_path):
-                    return font_path
-    
-    # Try case-insensitive partial match
-    for font_dir in font_dirs:
-        if os.path.exists(font_dir):
-            for root, dirs, files in os.walk(font_dir):
-                for file in files:
-                    if any(file.lower().endswith(ext.lower()) for ext in font_extensions):
-                        if font_name.lower() in file.lower():
-                            return os.path.join(root, file)
-    
-    # Try some common fallback fonts
-    fallback_fonts = [
-        "DejaVuSans-Bold.ttf",
-        "LiberationSans-Bold.ttf",
-        "Arial.ttf",
-        "Verdana.ttf",
-        "TimesNewRoman.ttf",
-        "Calibri.ttf"
+    queues = [queue.Queue(maxsize=config.VARIANT_QUEUE_SIZE) for _ in jobs]
+    threads = [threading.Thread(target=worker, args=(job, q), daemon=True) for job, q in zip(jobs, queues)]
+    for thread in threads:
+        thread.start()
+    try:
+        for frame_index, slot in _iter_output_frames(cap, pool, frame_count, total_frames):
+            if frame_index % 100 == 0:
+                print(f"Processing frame {frame_index + 1}/{total_frames} for {len(jobs)} variants")
+            # Frames are shared read-only between the variants
+            consumers = [q for job, q in zip(jobs, queues) if frame_index < job.schedule.total_frames]
+            pool.retain(slot, len(consumers))
+            pool.release(slot)
+            for q in consumers:
+                q.put((frame_index, slot))
+            produced += 1
+    finally:
+        for q in queues:
+            q.put(None)
+        for thread in threads:
+            thread.join()
+    return produced
+
+def _composite_worker(decode_ring_name: str, output_ring_name: str, shape, decode_count: int, output_count: int,
+                      styles: List[CaptionStyle], tasks, results):
+    """
+    Compositing process: copies decoded frames into output slots and draws the captions there,
+    both in shared memory. Only slot indices and caption state arrive through the task queue.
+    """
+    decode_ring = SharedFrameRing.attach(decode_ring_name, shape, decode_count)
+    output_ring = SharedFrameRing.attach(output_ring_name, shape, output_count)
+    renderers = [CaptionRenderer(style) for style in styles]
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            job_index, frame_index, decode_slot, output_slot, text, alpha, transform, placement = task
+            error = None
+            try:
+                frame = output_ring.buffer(output_slot)
+                np.copyto(frame, decode_ring.buffer(decode_slot))
+                renderers[job_index].render_into(frame, text, alpha, transform, placement)
+            except Exception as e:
+                error = str(e)
+            results.put((job_index, frame_index, decode_slot, output_slot, error))
+    finally:
+        for renderer in renderers:
+            if renderer.rasterized:
+                print(f"Compositing process {os.getpid()}: {renderer.sprite_summary()}")
+        decode_ring.close()
+        output_ring.close()
+
+def _run_caption_jobs_multiprocess(cap, frame_shape, frame_count: int, jobs: List[_CaptionJob], processes: int):
+    """
+    Decode the source once into a shared-memory ring and composite the frames in worker processes.
+    The decoder and the encoders stay in this process; frames are written to their encoder in order.
+    
+    Returns:
+        Tuple of (number of output frames produced, bytes of shared frame memory)
+    """
+    import multiprocessing
+    
+    total_frames = max(job.schedule.total_frames for job in jobs)
+    # Enough slots to keep every worker busy while the encoders reorder finished frames
+    decode_ring = SharedFrameRing(frame_shape, processes * 2 + 2)
+    output_ring = SharedFrameRing(frame_shape, processes * 2 + 2 * len(jobs))
+    decode_pool = decode_ring.pool()
+    output_pool = output_ring.pool()
+    
+    context = multiprocessing.get_context("spawn")
+    tasks = context.Queue()
+    results = context.Queue()
+    workers = [
+        context.Process(target=_composite_worker,
+                        args=(decode_ring.name, output_ring.name, frame_shape, decode_ring.count, output_ring.count,
+                              [job.renderer.style for job in jobs], tasks, results),
+                        daemon=True)
+        for _ in range(processes)
     ]
+    for worker in workers:
+        worker.start()
     
-    for font_dir in font_dirs:
-        if os.path.exists(font_dir):
-            for fallback in fallback_fonts:
-                for root, dirs, files in os.walk(font_dir):
-                    for file in files:
-                        if fallback.lower() in file.lower():
-                            return os.path.join(root, file)
+    def lost_worker() -> Optional[str]:
+        """Why a compositing process is gone before it was told to stop (its frames never come back)."""
+        for worker in workers:
+            if not worker.is_alive() and worker.exitcode != 0:
+                return f"Compositing process {worker.pid} exited with code {worker.exitcode}"
+        return None
     
-    print(f"Warning: Could not find font '{font_name}' or any suitable fallback.")
-    return None
+    def check_workers():
+        lost = lost_worker()
+        if lost:
+            raise RuntimeError(lost)
+    
+    def acquire(pool: FramePool) -> int:
+        while True:
+            try:
+                return pool.acquire(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                check_workers()
+    
+    def encode():
+        # Finished frames arrive in any order; write each job's frames in sequence
+        next_index = [0] * len(jobs)
+        pending = [{} for _ in jobs]
+        while True:
+            try:
+                item = results.get(timeout=WORKER_POLL_SECONDS)
+            except queue.Empty:
+                if lost_worker():
+                    # The decode loop notices too and fails the jobs
+                    break
+                continue
+            if item is None:
+                break
+            job_index, frame_index, decode_slot, output_slot, error = item
+            decode_pool.release(decode_slot)
+            job = jobs[job_index]
+            if error and not job.error:
+                job.error = RuntimeError(error)
+            pending[job_index][frame_index] = output_slot
+            while next_index[job_index] in pending[job_index]:
+                slot = pending[job_index].pop(next_index[job_index])
+                if not job.error:
+                    if job.capture is not None:
+                        job.capture.observe(next_index[job_index], output_pool.buffer(slot),
+                                            job.caption_state(next_index[job_index])[1])
+                    job.writer.write(output_pool.buffer(slot))
+                output_pool.release(slot)
+                next_index[job_index] += 1
+    
+    encoder = threading.Thread(target=encode, daemon=True)
+    encoder.start()
+    produced = 0
+    try:
+        for frame_index, slot in _iter_output_frames(cap, decode_pool, frame_count, total_frames,
+                                                     lambda: acquire(decode_pool)):
+            if frame_index % 100 == 0:
+                print(f"Processing frame {frame_index + 1}/{total_frames} on {processes} processes")
+            check_workers()
+            for job_index, job in enumerate(jobs):
+                if frame_index >= job.schedule.total_frames:
+                    continue
+                output_slot = acquire(output_pool)
+                decode_pool.retain(slot)
+                tasks.put((job_index, frame_index, slot, output_slot) + tuple(job.caption_state(frame_index)))
+            decode_pool.release(slot)
+            produced += 1
+    finally:
+        for _ in workers:
+            tasks.put(None)
+        for worker in workers:
+            worker.join()
+        # Every worker has flushed its results, stop the encoder after the last one
+        results.put(None)
+        encoder.join()
+        lost = lost_worker()
+        if lost:
+            # Frames of a process that died after the last task was queued are missing too
+            for job in jobs:
+                job.error = job.error or RuntimeError(lost)
+        shared_bytes = decode_ring.nbytes + output_ring.nbytes
+        # Drop the pools' views into the shared blocks before unmapping them
+        decode_pool.close()
+        output_pool.close()
+        decode_ring.close()
+        output_ring.close()
+    return produced, shared_bytes
 
-def add_caption_to_video(video_path: str, caption_text: str, output_path: str = None, word_by_word: bool = True, audio_duration: float = None) -> Optional[str]:
+def add_caption_to_video(video_path: str, caption_text: str, output_path: str = None, word_by_word: bool = True, audio_duration: float = None, output_duration: float = None, style: CaptionStyle = None) -> Optional[str]:
     """
     Add caption to a video using Pillow for text rendering and OpenCV for video processing.
     
@@ -83,418 +612,227 @@ def add_caption_to_video(video_path: str, caption_text: str, output_path: str =
         output_path: Path to save the output video (if None, a default path will be created)
         word_by_word: If True, display one word at a time with animation
         audio_duration: Duration of the audio in seconds, used for timing the words (if None, will use video duration)
+        output_duration: Exact length of the rendered video in seconds. Frames past the end of the
+                         source repeat its last frame, source frames past this length are never rendered.
+                         If None, the video duration plus config.TAIL_SECONDS is used.
+        style: Look of the captions (the CAPTION_* values in config if None)
         
     Returns:
         Path to the output video or None if processing fails
     """
-    if not os.path.exists(video_path):
-        print(f"Error: Video file {video_path} does not exist.")
-        return None
-    
-    # If no output path is specified, create one in the output directory
     if not output_path:
         video_name = os.path.basename(video_path)
         name, ext = os.path.splitext(video_name)
         output_path = os.path.join(config.OUTPUT_VIDEOS_DIR, f"{name}_captioned{ext}")
     
+    variant = CaptionVariant(caption_text, audio_path=None, output_path=output_path, style=style, word_by_word=word_by_word)
+    results = _add_captions_to_video(video_path, [variant], [audio_duration], [output_duration], [output_path])
+    return results[0] if results else None
+
+def _schedule_for(video_path: str, variant: "CaptionVariant", fps: float, total_frames: int,
+                  audio_duration: Optional[float], start_time: float = 0.0,
+                  stream: Optional[StreamSource] = None) -> CaptionSchedule:
+    """Caption schedule of a variant, placed per shot of the source (streams can't be analyzed ahead)."""
+    shot_placements = ()
+    if stream is None:
+        shot_placements = plan_caption_placement(video_path, variant.style or DEFAULT_STYLE, fps, total_frames, start_time)
+    return build_caption_schedule(variant.caption_text, fps, total_frames, word_by_word=variant.word_by_word,
+                                  audio_duration=audio_duration, shot_placements=shot_placements)
+
+def _add_captions_to_video(video_path: str, variants: List["CaptionVariant"], audio_durations: List[Optional[float]],
+                           output_durations: List[Optional[float]], output_paths: List[str],
+                           captures: Optional[List[Optional[SideOutputCapture]]] = None,
+                           start_time: float = 0.0, stream: Optional[StreamSource] = None) -> Optional[List[Optional[str]]]:
+    """
+    Render the captioned (silent) video of every variant from a single decode of the source.
+    Each variant's SideOutputCapture (if any) sees its captioned frames as they are rendered.
+    Decoding starts start_time seconds into the source (a keyframe, for a cheap seek).
+    If stream is given (an opened StreamSource), frames are decoded from it instead of video_path.
+    
+    Returns:
+        List with the captioned video path of each variant (None for variants that failed),
+        or None if the source could not be decoded
+    """
+    if stream is None and not os.path.exists(video_path):
+        print(f"Error: Video file {video_path} does not exist.")
+        return None
+    
+    jobs = []
+    cap = None
     try:
-        # Open the video file with OpenCV
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            print(f"Error: Could not open video file {video_path}")
+        if stream is not None:
+            info = stream.info
+        else:
+            # Hostile sources are decoded from a normalized (CFR, short-GOP) copy
+            decode_path = get_render_source(video_path)
+            
+            # Get video properties from the shared probe
+            info = probe_media(decode_path)
+        if not info or not info.has_video or not info.fps:
+            print(f"Error: Could not read video properties of {video_path}")
             return None
         
-        # Get video properties
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        width = info.width
+        height = info.height
+        fps = float(info.fps)
+        frame_count = info.frame_count
         video_duration = frame_count / fps
-        
-        # Calculate the number of additional frames for 3-second buffer
-        buffer_seconds = 3.0
-        buffer_frames = int(buffer_seconds * fps)
-        new_frame_count = frame_count + buffer_frames
-        
         print(f"Original video duration: {video_duration:.2f} seconds ({frame_count} frames)")
-        print(f"Adding {buffer_seconds} seconds buffer ({buffer_frames} frames)")
-        print(f"New video duration: {(video_duration + buffer_seconds):.2f} seconds ({new_frame_count} frames)")
         
-        # Create video writer
-        fourcc = cv2.VideoWriter_fourcc(*'mp4v')  # Use mp4v codec
-        out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-        
-        # Find a suitable font
-        font_path = find_system_font(config.CAPTION_FONT)
-        font_size = config.CAPTION_FONTSIZE
-        
-        # Load font
-        if (font_path):
-            try:
-                font = ImageFont.truetype(font_path, font_size)
-                print(f"Using font: {font_path}")
-            except Exception as e:
-                print(f"Error loading font: {e}. Using default font.")
-                font = ImageFont.load_default()
-        else:
-            font = ImageFont.load_default()
-            print("Using default font")
-        
-        # Convert colors from config
-        # Note: Pillow uses RGB, but config might be in different format
-        if isinstance(config.CAPTION_COLOR, str):
-            # Convert color name to RGB
-            color_map = {
-                "white": (255, 255, 255),
-                "black": (0, 0, 0),
-                "red": (255, 0, 0),
-                "green": (0, 255, 0),
-                "blue": (0, 0, 255),
-                "yellow": (255, 255, 0),
-                "cyan": (0, 255, 255),
-                "magenta": (255, 0, 255)
-            }
-            text_color = color_map.get(config.CAPTION_COLOR.lower(), (255, 255, 255))
+        if stream is not None:
+            # Decode until the stream ends; its frame count is only an estimate (or unknown)
+            frame_count = sys.maxsize
+            cap = stream.open_reader()
         else:
-            # Assume it's already an RGB tuple
-            text_color = config.CAPTION_COLOR
-        
-        # Same for stroke color
-        if isinstance(config.CAPTION_STROKE_COLOR, str):
-            color_map = {
-                "white": (255, 255, 255),
-                "black": (0, 0, 0),
-                "red": (255, 0, 0),
-                "green": (0, 255, 0),
-                "blue": (0, 0, 255),
-                "yellow": (255, 255, 0),
-                "cyan": (0, 255, 255),
-                "magenta": (255, 0, 255)
-            }
-            stroke_color = color_map.get(config.CAPTION_STROKE_COLOR.lower(), (0, 0, 0))
-        else:
-            stroke_color = config.CAPTION_STROKE_COLOR
+            # Open the video file with OpenCV for decoding
+            cap = cv2.VideoCapture(decode_path)
+        if cap is None or not cap.isOpened():
+            print(f"Error: Could not open video file {video_path}")
+            return None
         
-        print(f"Processing video with {frame_count} frames plus {buffer_frames} buffer frames...")
-            
-        # For word-by-word animation
-        if word_by_word:
-            # Split the caption into words
-            words = caption_text.split()
-            num_words = len(words)
-            
-            # Use audio duration if provided, otherwise use video duration
-            # But ensure we use at least the video duration to prevent cutting the video
-            # Add buffer seconds to ensure text doesn't get cut at the end
-            duration_to_use = video_duration
-            if audio_duration is not None:
-                # Make sure we're using the longer of video or audio duration
-                duration_to_use = max(video_duration, audio_duration)
-                
-            # Add buffer for text display
-            text_display_duration = duration_to_use + buffer_seconds
-            print(f"Using duration: {text_display_duration:.2f} seconds for {num_words} words")
-            
-            # Calculate how many frames each word should appear
-            # Each word gets an equal portion of the total duration
-            seconds_per_word = text_display_duration / num_words
-            frames_per_word = int(seconds_per_word * fps)
-            
-            # Ensure minimum visibility (at least 0.3 seconds per word)
-            min_frames = max(5, int(0.3 * fps))
-            if frames_per_word < min_frames:
-                frames_per_word = min_frames
-                print(f"Adjusted to minimum {frames_per_word} frames per word")
-                
-            # Calculate fade-in and fade-out frames (15% of word time for each transition)
-            fade_frames = max(2, int(frames_per_word * 0.15))
-            
-            print(f"Each word will display for {frames_per_word} frames ({frames_per_word/fps:.2f} seconds)")
-            print(f"Fade in/out: {fade_frames} frames ({fade_frames/fps:.2f} seconds)")
-            
-            # Process each frame
-            frame_number = 0
-            current_word_index = -1
-            current_word = ""
-            word_frame_count = 0
-            
-            # Process original video frames
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                frame_number += 1
-                if frame_number % 100 == 0 or frame_number == 1:
-                    print(f"Processing frame {frame_number}/{new_frame_count}")
-                
-                # Determine which word to show
-                word_frame_count += 1
-                if word_frame_count > frames_per_word:
-                    word_frame_count = 1
-                    current_word_index += 1
-                    if current_word_index >= len(words):
-                        current_word_index = len(words) - 1  # Stay on last word instead of looping
-                    current_word = words[current_word_index]
-                
-                # Calculate alpha (transparency) for fade effect
-                alpha = 255  # Full opacity
-                if word_frame_count <= fade_frames:  # Fade in
-                    alpha = int(255 * (word_frame_count / fade_frames))
-                elif word_frame_count > frames_per_word - fade_frames:  # Fade out
-                    alpha = int(255 * ((frames_per_word - word_frame_count) / fade_frames))
-                
-                # Ensure alpha is within bounds
-                alpha = max(0, min(255, alpha))
-                
-                # Create a sample image to measure current word dimensions
-                sample_img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-                sample_draw = ImageDraw.Draw(sample_img)
-                text_bbox = sample_draw.textbbox((0, 0), current_word, font=font)
-                text_width = text_bbox[2] - text_bbox[0]
-                text_height = text_bbox[3] - text_bbox[1]
-                
-                # Center the text both horizontally and vertically
-                text_x = (width - text_width) // 2
-                text_y = (height - text_height) // 2
-                
-                # Convert OpenCV BGR to RGB for Pillow
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # Create a Pillow Image from the frame
-                pil_image = Image.fromarray(rgb_frame)
-                
-                # Create a transparent overlay for the background
-                overlay = Image.new('RGBA', pil_image.size, (0, 0, 0, 0))
-                overlay_draw = ImageDraw.Draw(overlay)
-                
-                # Add semi-transparent background for better readability
-                background_padding = 10
-                background_x1 = text_x - background_padding
-                background_y1 = text_y - background_padding
-                background_x2 = text_x + text_width + background_padding
-                background_y2 = text_y + text_height + background_padding
-                
-                # Draw semi-transparent background with fade effect
-                background_alpha = min(128, alpha // 2)  # Half the text opacity for background
-                overlay_draw.rectangle(
-                    [background_x1, background_y1, background_x2, background_y2],
-                    fill=(0, 0, 0, background_alpha)  # Black with variable opacity
-                )
-                
-                # Convert PIL image to RGBA if it's not already
-                if pil_image.mode != 'RGBA':
-                    pil_image = pil_image.convert('RGBA')
-                    
-                # Composite the overlay onto the image
-                pil_image = Image.alpha_composite(pil_image, overlay)
-                
-                # Draw text with stroke (outline) and adjusted opacity
-                draw = ImageDraw.Draw(pil_image)
-                text_color_with_alpha = text_color + (alpha,)  # Add alpha to RGB
-                stroke_color_with_alpha = stroke_color + (alpha,)  # Add alpha to RGB
-                
-                draw.text(
-                    (text_x, text_y),
-                    current_word,
-                    font=font,
-                    fill=text_color_with_alpha,
-                    stroke_width=config.CAPTION_STROKE_WIDTH,
-                    stroke_fill=stroke_color_with_alpha
-                )
-                
-                # Convert back to OpenCV format (RGB to BGR)
-                cv_frame = cv2.cvtColor(np.array(pil_image.convert('RGB')), cv2.COLOR_RGB2BGR)
-                
-                # Write the frame to the output video
-                out.write(cv_frame)
-            
-            # Get the last frame to duplicate for buffer
-            if frame_number > 0:
-                # Reset cap to get the last frame
-                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number - 1)
-                ret, last_frame = cap.read()
-                
-                if ret:
-                    print(f"Adding {buffer_frames} buffer frames using last frame...")
-                    
-                    # Add buffer frames using the last frame
-                    for i in range(buffer_frames):
-                        frame_number += 1
-                        if frame_number % 100 == 0:
-                            print(f"Processing buffer frame {i+1}/{buffer_frames} (total: {frame_number}/{new_frame_count})")
-                        
-                        # Continue word animation in buffer frames
-                        word_frame_count += 1
-                        if word_frame_count > frames_per_word:
-                            word_frame_count = 1
-                            current_word_index += 1
-                            if current_word_index >= len(words):
-                                current_word_index = len(words) - 1  # Stay on last word
-                            current_word = words[current_word_index]
-                        
-                        # Calculate alpha for buffer frames
-                        alpha = 255  # Full opacity
-                        if word_frame_count <= fade_frames:  # Fade in
-                            alpha = int(255 * (word_frame_count / fade_frames))
-                        elif word_frame_count > frames_per_word - fade_frames:  # Fade out
-                            alpha = int(255 * ((frames_per_word - word_frame_count) / fade_frames))
-                        
-                        # Ensure alpha is within bounds
-                        alpha = max(0, min(255, alpha))
-                        
-                        # Create a sample image to measure current word dimensions
-                        sample_img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-                        sample_draw = ImageDraw.Draw(sample_img)
-                        text_bbox = sample_draw.textbbox((0, 0), current_word, font=font)
-                        text_width = text_bbox[2] - text_bbox[0]
-                        text_height = text_bbox[3] - text_bbox[1]
-                        
-                        # Center the text both horizontally and vertically
-                        text_x = (width - text_width) // 2
-                        text_y = (height - text_height) // 2
-                        
-                        # Convert OpenCV BGR to RGB for Pillow
-                        rgb_frame = cv2.cvtColor(last_frame, cv2.COLOR_BGR2RGB)
-                        
-                        # Create a Pillow Image from the frame
-                        pil_image = Image.fromarray(rgb_frame)
-                        
-                        # Create a transparent overlay for the background
-                        overlay = Image.new('RGBA', pil_image.size, (0, 0, 0, 0))
-                        overlay_draw = ImageDraw.Draw(overlay)
-                        
-                        # Add semi-transparent background for better readability
-                        background_padding = 10
-                        background_x1 = text_x - background_padding
-                        background_y1 = text_y - background_padding
-                        background_x2 = text_x + text_width + background_padding
-                        background_y2 = text_y + text_height + background_padding
-                        
-                        # Draw semi-transparent background with fade effect
-                        background_alpha = min(128, alpha // 2)
-                        overlay_draw.rectangle(
-                            [background_x1, background_y1, background_x2, background_y2],
-                            fill=(0, 0, 0, background_alpha)
-                        )
-                        
-                        # Convert PIL image to RGBA if it's not already
-                        if pil_image.mode != 'RGBA':
-                            pil_image = pil_image.convert('RGBA')
-                            
-                        # Composite the overlay onto the image
-                        pil_image = Image.alpha_composite(pil_image, overlay)
-                        
-                        # Draw text with stroke and adjusted opacity
-                        draw = ImageDraw.Draw(pil_image)
-                        text_color_with_alpha = text_color + (alpha,)
-                        stroke_color_with_alpha = stroke_color + (alpha,)
-                        
-                        draw.text(
-                            (text_x, text_y),
-                            current_word,
-                            font=font,
-                            fill=text_color_with_alpha,
-                            stroke_width=config.CAPTION_STROKE_WIDTH,
-                            stroke_fill=stroke_color_with_alpha
-                        )
-                        
-                        # Convert back to OpenCV format
-                        cv_frame = cv2.cvtColor(np.array(pil_image.convert('RGB')), cv2.COLOR_RGB2BGR)
-                        
-                        # Write the buffer frame to the output video
-                        out.write(cv_frame)
-        else:
-            # Original implementation for displaying the entire caption text
-            # Create a sample image to measure text dimensions
-            sample_img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-            sample_draw = ImageDraw.Draw(sample_img)
-            text_bbox = sample_draw.textbbox((0, 0), caption_text, font=font)
-            text_width = text_bbox[2] - text_bbox[0]
-            text_height = text_bbox[3] - text_bbox[1]
+        if start_time > 0:
+            # Only the frames from the start of the window on are decoded
+            start_frame = min(int(round(start_time * fps)), frame_count)
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+            frame_count -= start_frame
+            video_duration = frame_count / fps
+            print(f"Rendering from {start_time:.2f} seconds ({frame_count} frames left)")
+        
+        captures = captures or [None] * len(variants)
+        for variant, audio_duration, output_duration, variant_output, capture in zip(
+                variants, audio_durations, output_durations, output_paths, captures):
+            if output_duration is None:
+                output_duration = plan_output_duration(video_duration, None, "pad")
+            total_frames = max(1, int(round(output_duration * fps)))
+            print(f"Output video duration: {output_duration:.2f} seconds ({total_frames} frames) -> {variant_output}")
             
-            # Center the text both horizontally and vertically
-            text_x = (width - text_width) // 2
-            text_y = (height - text_height) // 2
+            schedule = _schedule_for(video_path, variant, fps, total_frames, audio_duration, start_time, stream)
+            if schedule.word_by_word and schedule.words:
+                print(f"Each word will display for {schedule.frames_per_word} frames "
+                      f"({schedule.frames_per_word/fps:.2f} seconds), fade in/out {schedule.fade_frames} frames")
+            if schedule.placements:
+                print("Caption placement per shot: " + ", ".join(
+                    f"{start / fps:.1f}s {placement.position} (box {placement.background_alpha})"
+                    for start, placement in zip(schedule.shot_starts, schedule.placements)))
             
-            # Process each frame
-            frame_number = 0
-            while True:
-                ret, frame = cap.read()
-                if not ret:
-                    break
-                    
-                frame_number += 1
-                if frame_number % 100 == 0 or frame_number == 1:
-                    print(f"Processing frame {frame_number}/{frame_count}")
-                
-                # Convert OpenCV BGR to RGB for Pillow
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                
-                # Create a Pillow Image from the frame
-                pil_image = Image.fromarray(rgb_frame)
-                
-                # Create a transparent overlay for the background
-                overlay = Image.new('RGBA', pil_image.size, (0, 0, 0, 0))
-                overlay_draw = ImageDraw.Draw(overlay)
-                
-                # Add semi-transparent background for better readability
-                background_padding = 10
-                background_x1 = text_x - background_padding
-                background_y1 = text_y - background_padding
-                background_x2 = text_x + text_width + background_padding
-                background_y2 = text_y + text_height + background_padding
-                
-                # Draw semi-transparent background
-                overlay_draw.rectangle(
-                    [background_x1, background_y1, background_x2, background_y2],
-                    fill=(0, 0, 0, 128)  # Black with 50% opacity
-                )
-                
-                # Convert PIL image to RGBA if it's not already
-                if pil_image.mode != 'RGBA':
-                    pil_image = pil_image.convert('RGBA')
-                    
-                # Composite the overlay onto the image
-                pil_image = Image.alpha_composite(pil_image, overlay)
-                
-                # Draw text with stroke (outline)
-                draw = ImageDraw.Draw(pil_image)
-                draw.text(
-                    (text_x, text_y),
-                    caption_text,
-                    font=font,
-                    fill=text_color,
-                    stroke_width=config.CAPTION_STROKE_WIDTH,
-                    stroke_fill=stroke_color
-                )
-                
-                # Convert back to OpenCV format (RGB to BGR)
-                cv_frame = cv2.cvtColor(np.array(pil_image.convert('RGB')), cv2.COLOR_RGB2BGR)
-                
-                # Write the frame to the output video
-                out.write(cv_frame)
+            # Create video writer (ffmpeg with the fastest available encoder, or OpenCV)
+            out = open_video_writer(variant_output, info.fps, width, height)
+            if out is None:
+                print(f"Error: Could not create video writer for {variant_output}")
+                continue
+            jobs.append(_CaptionJob(schedule, CaptionRenderer(variant.style), out, variant_output, capture=capture))
         
-        # Release resources
-        cap.release()
-        out.release()
+        if not jobs:
+            return [None] * len(variants)
         
-        print(f"Caption added to video. Output saved to: {output_path}")
-        return output_path
+        frame_shape = (height, width, 3)
+        start_time = time.time()
+        if config.RENDER_PROCESSES > 1:
+            # Composite in worker processes, frames stay in shared memory
+            produced, buffer_bytes = _run_caption_jobs_multiprocess(cap, frame_shape, frame_count, jobs,
+                                                                    config.RENDER_PROCESSES)
+            buffer_description = f"shared ring, {config.RENDER_PROCESSES} processes"
+        else:
+            # Fixed pool of decode buffers bounded by FRAME_MEMORY_LIMIT_MB
+            pool = FramePool(frame_shape, _frame_pool_size(int(np.prod(frame_shape)), len(jobs)))
+            produced = _run_caption_jobs(cap, pool, frame_count, jobs)
+            buffer_bytes = pool.nbytes + sum(
+                (job.output_buffer.nbytes if job.output_buffer is not None else 0) + job.renderer.scratch_nbytes
+                for job in jobs
+            )
+            buffer_description = f"{pool.count} decode buffers"
+        elapsed = time.time() - start_time
+        if produced == 0:
+            print(f"Error: Could not read any frames from {video_path}")
         
+        # Render metrics
+        peak_rss = _peak_rss_mb()
+        print(f"Render metrics: {produced} frames x {len(jobs)} outputs in {elapsed:.2f}s "
+              f"({produced / max(elapsed, 1e-6):.1f} fps), frame buffers {buffer_bytes / (1024 * 1024):.1f} MB "
+              f"({buffer_description}), peak RSS "
+              + (f"{peak_rss:.1f} MB" if peak_rss is not None else "n/a"))
+        if config.RENDER_PROCESSES <= 1:
+            for job in jobs:
+                print(f"{os.path.basename(job.output_path)}: {job.renderer.sprite_summary()}")
+    
     except Exception as e:
         print(f"Error adding caption to video: {e}")
-        return None
+        for job in jobs:
+            job.error = job.error or e
+        produced = 0
+    
+    finally:
+        # Release resources
+        if cap is not None:
+            cap.release()
+    
+    finished = {}
+    for job in jobs:
+        ok = job.writer.release() is not False
+        if job.error:
+            print(f"Error adding caption to video {job.output_path}: {job.error}")
+        elif ok and produced > 0:
+            print(f"Caption added to video. Output saved to: {job.output_path}")
+            finished[job.output_path] = job.output_path
+    return [finished.get(path) for path in output_paths]
 
-def add_audio_to_video(video_path: str, audio_path: str, output_path: str = None) -> Optional[str]:
+def plan_output_duration(video_duration: float, audio_duration: Optional[float], audio_fit: str = config.AUDIO_FIT, tail_seconds: float = config.TAIL_SECONDS) -> float:
     """
-    Add audio to a video, replacing the original audio.
+    Decide how long the finished video will be, before any frame is rendered.
+    
+    Args:
+        video_duration: Duration of the source video in seconds
+        audio_duration: Duration of the voice audio in seconds (None if unknown)
+        audio_fit: "pad" or "loop" keep the whole video (and the whole voice),
+                   "trim" cuts the video to the voice length
+        tail_seconds: Seconds added after the video (or voice) ends
+        
+    Returns:
+        Output duration in seconds
+    """
+    if audio_fit == "trim" and audio_duration:
+        return audio_duration + tail_seconds
+    return max(video_duration, audio_duration or 0.0) + tail_seconds
+
+def _build_audio_filter(audio_fit: str, mix_original: bool, original_volume: float, voice_input: str = "1:a", original_input: str = "2:a") -> str:
+    """Build the filter graph that fits the voice to the video and optionally ducks the original soundtrack."""
+    if audio_fit == "loop":
+        # Repeat the voice until the output duration is reached
+        voice_chain = f"[{voice_input}]aloop=loop=-1:size=2147483647"
+    else:
+        # Pad the voice with silence up to the output duration
+        voice_chain = f"[{voice_input}]apad"
+    
+    if not mix_original:
+        return f"{voice_chain}[aout]"
+    
+    caps = get_capabilities()
+    graph = [f"[{original_input}]volume={original_volume},apad[bg]"]
+    if caps and caps.has_filter("sidechaincompress"):
+        # Duck the original soundtrack whenever the voice is speaking
+        graph.append(f"{voice_chain},asplit=2[voice][sc]")
+        graph.append("[bg][sc]sidechaincompress=threshold=0.02:ratio=8:attack=20:release=400[ducked]")
+    else:
+        graph.append(f"{voice_chain}[voice]")
+        graph.append("[bg]anull[ducked]")
+    # amix halves both inputs, restore the levels afterwards
+    graph.append("[voice][ducked]amix=inputs=2:duration=first:dropout_transition=0,volume=2[aout]")
+    return ";".join(graph)
+
+def add_audio_to_video(video_path: str, audio_path: str, output_path: str = None, audio_fit: str = config.AUDIO_FIT, original_audio_path: str = None, duration: float = None, original_offset: float = 0.0) -> Optional[str]:
+    """
+    Add audio to a video in a single FFmpeg filter graph invocation.
     This function uses FFmpeg via subprocess since OpenCV doesn't support audio.
     
     Args:
         video_path: Path to the input video file
         audio_path: Path to the audio file to add
         output_path: Path to save the output video (if None, a default path will be created)
+        audio_fit: "pad" pads the voice with silence, "loop" repeats it to the video length,
+                   "trim" ends the video after the voice plus config.TAIL_SECONDS
+        original_audio_path: File whose soundtrack is ducked and mixed under the voice (None to drop it)
+        duration: Output duration in seconds (if None, it is derived from the inputs and audio_fit)
+        original_offset: Position in the original soundtrack where the video starts (for highlight windows)
         
     Returns:
         Path to the output video or None if processing fails
@@ -515,65 +853,8 @@ def add_audio_to_video(video_path: str, audio_path: str, output_path: str = None
     
     try:
         import subprocess
-        import shutil
-        
-        # DEBUG: Print PATH environment variable
-        print("\nDEBUG: Checking PATH environment variable:")
-        path_env = os.environ.get('PATH', '')
-        for path_item in path_env.split(os.pathsep):
-            print(f"PATH entry: {path_item}")
-            
-            # Check if ffmpeg.exe exists in this directory
-            potential_ffmpeg = os.path.join(path_item, 'ffmpeg.exe')
-            if os.path.exists(potential_ffmpeg):
-                print(f"Found ffmpeg.exe at: {potential_ffmpeg}")
-            
-            # Also check for ffmpeg without extension
-            potential_ffmpeg_no_ext = os.path.join(path_item, 'ffmpeg')
-            if os.path.exists(potential_ffmpeg_no_ext):
-                print(f"Found ffmpeg at: {potential_ffmpeg_no_ext}")
-        
-        # First try to use the path from config if specified
-        ffmpeg_path = config.FFMPEG_PATH if hasattr(config, 'FFMPEG_PATH') and config.FFMPEG_PATH else None
         
-        if ffmpeg_path:
-            print(f"Using FFmpeg path from config: {ffmpeg_path}")
-            if not os.path.exists(ffmpeg_path):
-                print(f"Warning: FFmpeg path specified in config ({ffmpeg_path}) does not exist.")
-                ffmpeg_path = None
-        
-        # If no path in config or path doesn't exist, try to find in PATH
-        if not ffmpeg_path:
-            # Check if FFmpeg is installed and in PATH
-            ffmpeg_path = shutil.which('ffmpeg')
-            print(f"DEBUG: shutil.which('ffmpeg') returned: {ffmpeg_path}")
-            
-            # Also try with .exe extension explicitly (for Windows)
-            ffmpeg_exe_path = shutil.which('ffmpeg.exe')
-            print(f"DEBUG: shutil.which('ffmpeg.exe') returned: {ffmpeg_exe_path}")
-            
-            # Use ffmpeg.exe if found
-            if ffmpeg_exe_path:
-                ffmpeg_path = ffmpeg_exe_path
-                print(f"Using ffmpeg.exe from PATH: {ffmpeg_path}")
-        
-        # If still not found, try common Windows locations
-        if not ffmpeg_path:
-            # Try to find ffmpeg in some common locations on Windows
-            windows_common_ffmpeg_paths = [
-                "C:\\Program Files\\ffmpeg\\bin\\ffmpeg.exe",
-                "C:\\Program Files (x86)\\ffmpeg\\bin\\ffmpeg.exe",
-                "C:\\ffmpeg\\bin\\ffmpeg.exe",
-                os.path.join(os.environ.get('LOCALAPPDATA', ''), 'Programs', 'ffmpeg', 'bin', 'ffmpeg.exe'),
-                os.path.join(os.environ.get('APPDATA', ''), 'ffmpeg', 'bin', 'ffmpeg.exe')
-            ]
-            
-            for path in windows_common_ffmpeg_paths:
-                if os.path.exists(path):
-                    print(f"Found ffmpeg at common Windows path: {path}")
-                    ffmpeg_path = path
-                    print(f"Using found ffmpeg at: {ffmpeg_path}")
-                    break
+        ffmpeg_path = get_ffmpeg_path()
         
         if not ffmpeg_path:
             print("Error: FFmpeg is not installed or not in your PATH.")
@@ -583,10 +864,21 @@ def add_audio_to_video(video_path: str, audio_path: str, output_path: str = None
             print("For now, returning the captioned video without audio.")
             return video_path  # Return the input video path since we can't add audio
         
-        # Get video duration
-        cap = cv2.VideoCapture(video_path)
-        video_duration = int(cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS))
-        cap.release()
+        video_info = probe_media(video_path)
+        if duration is None and video_info and video_info.duration:
+            duration = video_info.duration
+            if audio_fit == "trim":
+                audio_info = probe_media(audio_path)
+                if audio_info and audio_info.duration:
+                    duration = min(duration, audio_info.duration + config.TAIL_SECONDS)
+        
+        # Only mix the original soundtrack if there is one
+        mix_original = False
+        if original_audio_path:
+            original_info = probe_media(original_audio_path)
+            mix_original = bool(original_info and original_info.has_audio)
+            if not mix_original:
+                print("Source has no audio track, using the voice only.")
         
         # Command to add audio to video
         cmd = [
@@ -594,16 +886,26 @@ def add_audio_to_video(video_path: str, audio_path: str, output_path: str = None
             '-y',  # Overwrite output file if it exists
             '-i', video_path,  # Input video
             '-i', audio_path,  # Input audio
-            '-c:v', 'copy',  # Copy video codec
-            '-c:a', 'aac',  # Use AAC for audio
+        ]
+        if mix_original:
+            if original_offset > 0:
+                cmd += ['-ss', f"{original_offset:.3f}"]  # Keep the soundtrack in sync with the window
+            cmd += ['-i', original_audio_path]  # Original soundtrack
+        cmd += [
+            '-filter_complex', _build_audio_filter(audio_fit, mix_original, config.ORIGINAL_AUDIO_VOLUME),
             '-map', '0:v:0',  # Use first video stream from first input
-            '-map', '1:a:0',  # Use first audio stream from second input
-            '-shortest',  # Finish encoding when the shortest input stream ends
-            output_path
+            '-map', '[aout]',  # Use the fitted (and mixed) audio
+            '-c:v', 'copy',  # Copy video codec
+            *select_audio_encoder(),  # Preferred AAC encoder of this build
         ]
+        if duration:
+            cmd += ['-t', f"{duration:.3f}"]  # Padded/looped audio is endless, stop at the planned length
+        else:
+            cmd += ['-shortest']
+        cmd.append(output_path)
         
         # Run FFmpeg command
-        print(f"Running FFmpeg to add audio to video...")
+        print("Running FFmpeg to add audio to video...")
         result = subprocess.run(cmd, capture_output=True, text=True)
         
         if result.returncode != 0:
@@ -619,102 +921,272 @@ def add_audio_to_video(video_path: str, audio_path: str, output_path: str = None
         print("Keeping the captioned video without audio.")
         return video_path  # Return the input video path on exception
 
-def process_video(video_path: str, caption_text: str, audio_path: str, output_path: str = None, word_by_word: bool = True) -> Optional[str]:
+def add_soft_subtitles_to_video(video_path: str, caption_text: str, audio_path: str, output_path: str = None, word_by_word: bool = True, audio_fit: str = config.AUDIO_FIT, mix_original: bool = config.MIX_ORIGINAL_AUDIO, audio_duration: float = None, output_duration: float = None, start_time: float = 0.0) -> Optional[str]:
     """
-    Process a video by adding both caption and audio.
+    Add the caption as a subtitle track and the voice as the audio track, copying the video stream.
+    Nothing is decoded or re-encoded, so this takes about as long as copying the file.
     
     Args:
         video_path: Path to the input video file
         caption_text: Text to display as caption
         audio_path: Path to the audio file to add
-        output_path: Path to save the final output video (if None, a default path will be created)
-        word_by_word: If True, display one word at a time with animation
+        output_path: Path to save the output video (if None, a default path will be created)
+        word_by_word: If True, one cue per word, timed like the burned-in captions
+        audio_fit: How the voice and video lengths are reconciled ("pad", "loop" or "trim")
+        mix_original: If True, keep the original soundtrack ducked under the voice
+        audio_duration: Duration of the voice in seconds (probed if None)
+        output_duration: Planned output duration in seconds (planned from the inputs if None)
+        start_time: Where in the source the output starts; should be a keyframe, since the
+                    video stream is copied
         
     Returns:
         Path to the output video or None if processing fails
     """
-    # If no output path is specified, create one in the output directory
     if not output_path:
         video_name = os.path.basename(video_path)
         name, ext = os.path.splitext(video_name)
         output_path = os.path.join(config.OUTPUT_VIDEOS_DIR, f"{name}_processed{ext}")
     
     try:
+        import subprocess
+        
+        ffmpeg_path = get_ffmpeg_path()
+        if not ffmpeg_path:
+            print("Error: FFmpeg is required to add a subtitle track.")
+            return None
+        
+        info = probe_media(video_path)
+        if not info or not info.has_video or not info.fps:
+            print(f"Error: Could not read video properties of {video_path}")
+            return None
+        if audio_duration is None:
+            audio_info = probe_media(audio_path)
+            audio_duration = audio_info.duration if audio_info else None
+        
+        video_duration = max(0.0, (info.video_duration or 0.0) - start_time)
+        if output_duration is None:
+            output_duration = plan_output_duration(video_duration, audio_duration, audio_fit)
+        fps = float(info.fps)
+        
+        # A copied video stream can't be extended with held tail frames
+        duration = min(output_duration, video_duration) if video_duration else output_duration
+        if audio_duration and audio_duration > duration:
+            print(f"Warning: Voice ({audio_duration:.2f}s) is longer than the video ({duration:.2f}s) and will be cut.")
+        
+        # Spread the words over what is actually muxed, so none of them falls past the cut
+        schedule = build_caption_schedule(caption_text, fps, max(1, int(round(duration * fps))),
+                                          word_by_word=word_by_word,
+                                          audio_duration=min(audio_duration, duration) if audio_duration else None)
+        cues = [(start, min(end, duration), text) for start, end, text in schedule.cues() if start < duration]
+        
+        out_name, _ = os.path.splitext(output_path)
+        subtitle_path = write_subtitles(cues, f"{out_name}.{config.SUBTITLE_FORMAT}")
+        
+        mix_original = mix_original and info.has_audio
+        cmd = [ffmpeg_path, '-y']
+        if start_time > 0:
+            cmd += ['-ss', f"{start_time:.3f}"]  # Seek the copied streams to the window
+        cmd += [
+            '-i', video_path,  # Video (and original soundtrack)
+            '-i', audio_path,  # Voice
+            '-i', subtitle_path,  # Caption timeline
+            '-filter_complex', _build_audio_filter(audio_fit, mix_original, config.ORIGINAL_AUDIO_VOLUME,
+                                                   original_input="0:a"),
+            '-map', '0:v:0',
+            '-map', '[aout]',
+            '-map', '2:s:0',
+            '-c:v', 'copy',  # No decode, no re-encode
+            *select_audio_encoder(),
+            '-c:s', subtitle_codec_for(output_path),
+            '-metadata:s:s:0', f"language={config.TTS_LANGUAGE}",
+            '-t', f"{duration:.3f}",
+            output_path
+        ]
+        
+        print("Running FFmpeg to add subtitle track and audio...")
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"Error adding subtitles to video: {result.stderr}")
+            return None
+        
+        print(f"Subtitles and audio added to video. Output saved to: {output_path}")
+        return output_path
+        
+    except Exception as e:
+        print(f"Error adding subtitles to video: {e}")
+        return None
+
+@dataclass
+class CaptionVariant:
+    """One output rendered from a shared source: its caption, voice, style and destination."""
+    caption_text: str
+    audio_path: Optional[str]
+    output_path: Optional[str] = None
+    style: Optional[CaptionStyle] = None  # Look of the captions (the CAPTION_* values in config if None)
+    word_by_word: bool = True
+
+def render_variants(video_path: str, variants: List[CaptionVariant], audio_fit: str = config.AUDIO_FIT, mix_original: bool = config.MIX_ORIGINAL_AUDIO, caption_mode: str = config.CAPTION_MODE, side_outputs: bool = config.SIDE_OUTPUTS, highlight: bool = config.HIGHLIGHT_WINDOW) -> List[Optional[str]]:
+    """
+    Render several captioned versions of one source video from a single decode pass.
+    
+    Each source frame is decoded once and composited for every variant; each variant has its
+    own encoder, fed from its own thread. The voice of each variant is muxed in afterwards.
+    
+    Args:
+        video_path: Path to the input video file
+        variants: Caption, audio, style and output of every version to render
+        audio_fit: How the voice and video lengths are reconciled ("pad", "loop" or "trim")
+        mix_original: If True, keep the original soundtrack ducked under the voice
+        caption_mode: "burn" draws the captions into the frames, "soft" muxes them as a
+                      subtitle track next to the copied video stream
+        side_outputs: If True, also write a poster JPEG and an animated WebP preview next to
+                      each output, captured from the frames as they are rendered ("burn" mode only)
+        highlight: If True and the source is longer than the voice plus config.TAIL_SECONDS,
+                   render only the liveliest window of that length (see highlights.py)
+        
+    video_path may also be a stream: "-" for stdin, an http(s):// URL or a range+http(s):// URL
+    (see stream_source.py). Streams are decoded once, as they arrive, and always burned in.
+        
+    Each output is checked with output_verify.verify_output if config.VERIFY_OUTPUTS is set.
+        
+    Returns:
+        Output path of each variant, None for variants that failed (or failed verification)
+    """
+    stream = None
+    if is_stream_source(video_path):
+        try:
+            stream = StreamSource(video_path)
+            video_info = stream.open()
+        except Exception as e:
+            print(f"Error opening stream {video_path}: {e}")
+            video_info = None
+        name, ext = stream.name if stream else "stream", ".mp4"
+        if caption_mode == "soft":
+            print("Warning: Streams can't be stream-copied, burning the captions in instead")
+            caption_mode = "burn"
+    else:
+        video_info = probe_media(video_path)
+        name, ext = os.path.splitext(os.path.basename(video_path))
+    if not video_info or not video_info.has_video:
+        print(f"Error: Could not read video properties of {video_path}")
+        return [None] * len(variants)
+    
+    audio_durations = []
+    output_durations = []
+    output_paths = []
+    captioned_paths = []
+    for i, variant in enumerate(variants):
+        # If no output path is specified, create one in the output directory
+        suffix = "_processed" if len(variants) == 1 else f"_v{i + 1}_processed"
+        output_path = variant.output_path or os.path.join(config.OUTPUT_VIDEOS_DIR, f"{name}{suffix}{ext}")
+        output_paths.append(output_path)
+        out_name, out_ext = os.path.splitext(output_path)
+        captioned_paths.append(f"{out_name}_captioned{out_ext}")
+        
         # Get audio duration for timing the captions correctly
         audio_duration = None
-        if os.path.exists(audio_path):
-            try:
-                import subprocess
-                import json
-                import shutil
-                
-                # First try to use the path from config if specified
-                ffprobe_path = config.FFPROBE_PATH if hasattr(config, 'FFPROBE_PATH') and config.FFPROBE_PATH else None
-                
-                if ffprobe_path:
-                    print(f"Using FFprobe path from config: {ffprobe_path}")
-                    if not os.path.exists(ffprobe_path):
-                        print(f"Warning: FFprobe path specified in config ({ffprobe_path}) does not exist.")
-                        ffprobe_path = None
-                
-                # If no path in config or path doesn't exist, try to find in PATH
-                if not ffprobe_path:
-                    # Check if FFprobe is installed and in PATH
-                    ffprobe_path = shutil.which('ffprobe')
-                    print(f"DEBUG: shutil.which('ffprobe') returned: {ffprobe_path}")
-                    
-                    # Also try with .exe extension explicitly (for Windows)
-                    ffprobe_exe_path = shutil.which('ffprobe.exe')
-                    print(f"DEBUG: shutil.which('ffprobe.exe') returned: {ffprobe_exe_path}")
-                    
-                    # Use ffprobe.exe if found
-                    if ffprobe_exe_path:
-                        ffprobe_path = ffprobe_exe_path
-                
-                # If FFmpeg exists in a custom path, check if FFprobe might be in the same directory
-                if not ffprobe_path and hasattr(config, 'FFMPEG_PATH') and config.FFMPEG_PATH:
-                    ffmpeg_dir = os.path.dirname(config.FFMPEG_PATH)
-                    potential_ffprobe = os.path.join(ffmpeg_dir, 'ffprobe.exe')
-                    if os.path.exists(potential_ffprobe):
-                        ffprobe_path = potential_ffprobe
-                        print(f"Found ffprobe.exe in the same directory as ffmpeg: {ffprobe_path}")
-                
-                if ffprobe_path:
-                    # Command to get audio duration
-                    cmd = [
-                        ffprobe_path,
-                        '-v', 'error',
-                        '-show_entries', 'format=duration',
-                        '-of', 'json',
-                        audio_path
-                    ]
-                    
-                    result = subprocess.run(cmd, capture_output=True, text=True)
-                    if result.returncode == 0:
-                        data = json.loads(result.stdout)
-                        audio_duration = float(data['format']['duration'])
-                        print(f"Audio duration: {audio_duration:.2f} seconds")
-                    else:
-                        print(f"Warning: Could not determine audio duration: {result.stderr}")
-                else:
-                    print("Warning: FFprobe not found, cannot determine audio duration")
-            except Exception as e:
-                print(f"Warning: Error determining audio duration: {e}")
-                audio_duration = None
-        
-        # First add caption to the video with the audio duration for proper timing
-        captioned_video = add_caption_to_video(
-            video_path, 
-            caption_text, 
-            word_by_word=word_by_word,
-            audio_duration=audio_duration
-        )
+        if variant.audio_path and os.path.exists(variant.audio_path):
+            audio_info = probe_media(variant.audio_path)
+            if audio_info and audio_info.duration:
+                audio_duration = audio_info.duration
+                print(f"Audio duration: {audio_duration:.2f} seconds")
+            else:
+                print("Warning: Could not determine audio duration")
+        audio_durations.append(audio_duration)
+    
+    # Burned outputs are decoded from the render source (a mezzanine copy may have a snapped frame rate)
+    render_source = video_path if caption_mode == "soft" or stream is not None else get_render_source(video_path)
+    render_info = probe_media(render_source) if render_source != video_path else video_info
+    render_fps = float(render_info.fps if render_info and render_info.fps else video_info.fps)
+    
+    # Long sources: only decode the window that fits the longest voice
+    source_duration = video_info.video_duration or 0.0
+    start_time = 0.0
+    if highlight and stream is None and audio_durations and all(audio_durations):
+        window = max(audio_durations) + config.TAIL_SECONDS
+        if source_duration > window:
+            # Candidate starts are keyframes of the stream that is decoded (burn) or copied (soft)
+            start_time = select_highlight_window(render_source, window)
+            source_duration -= start_time
+            audio_fit = "trim"
+    
+    # Decide the final length up front so no rendered frame is thrown away by the mux
+    for audio_duration in audio_durations:
+        output_durations.append(plan_output_duration(source_duration, audio_duration, audio_fit))
+    
+    def verified(i: int, path: Optional[str]) -> Optional[str]:
+        """Check a finished output; None if it failed (the file is kept for inspection)."""
+        if not path or not config.VERIFY_OUTPUTS:
+            return path
+        variant = variants[i]
+        if caption_mode == "soft":
+            expected = min(output_durations[i], source_duration) if source_duration else output_durations[i]
+            result = verify_output(path, expected, caption_mode="soft", expect_audio=bool(variant.audio_path))
+        else:
+            schedule = _schedule_for(video_path, variant, render_fps,
+                                     max(1, int(round(output_durations[i] * render_fps))),
+                                     audio_durations[i], start_time, stream)
+            result = verify_output(path, schedule.total_frames / render_fps, schedule, CaptionRenderer(variant.style),
+                                   expect_audio=bool(variant.audio_path))
+        print(result.summary())
+        try:
+            write_report(result, config.VERIFY_REPORT_FILE)
+        except OSError as e:
+            print(f"Warning: Could not write the verification report: {e}")
+        return path if result.passed else None
+    
+    if caption_mode == "soft":
+        def mux(i: int) -> Optional[str]:
+            variant = variants[i]
+            return add_soft_subtitles_to_video(
+                video_path, variant.caption_text, variant.audio_path, output_paths[i],
+                word_by_word=variant.word_by_word, audio_fit=audio_fit, mix_original=mix_original,
+                audio_duration=audio_durations[i], output_duration=output_durations[i], start_time=start_time
+            )
         
+        if side_outputs:
+            print("Warning: Side outputs are captured from rendered frames and need caption_mode='burn'")
+        def mux_in_slot(i: int) -> Optional[str]:
+            with stage_slot("encode"):
+                path = mux(i)
+            return verified(i, path)
+        
+        with ThreadPoolExecutor(max_workers=max(1, len(variants))) as executor:
+            return list(executor.map(mux_in_slot, range(len(variants))))
+    
+    captures = None
+    if side_outputs:
+        captures = [SideOutputCapture(path, render_fps) for path in output_paths]
+    
+    # Add the captions of all variants in one pass over the source
+    with stage_slot("render"):
+        captioned_videos = _add_captions_to_video(video_path, variants, audio_durations, output_durations,
+                                                  captioned_paths, captures, start_time=start_time, stream=stream)
+    if not captioned_videos:
+        if stream is not None:
+            stream.cleanup()
+        return [None] * len(variants)
+    
+    # Encode the posters and animated previews while the audio is muxed
+    side_output_futures = [capture.finish() for capture, captioned in zip(captures or [], captioned_videos) if captioned]
+    
+    def finish(i: int) -> Optional[str]:
+        captioned_video = captioned_videos[i]
         if not captioned_video:
             return None
         
         # Then add audio to the captioned video
-        final_video = add_audio_to_video(captioned_video, audio_path, output_path)
+        with stage_slot("encode"):
+            final_video = add_audio_to_video(
+                captioned_video,
+                variants[i].audio_path,
+                output_paths[i],
+                audio_fit=audio_fit,
+                # A stream can't be read twice: its soundtrack was extracted while decoding
+                original_audio_path=(stream.audio_path if stream else video_path) if mix_original else None,
+                duration=output_durations[i],
+                original_offset=start_time
+            )
         
         # Only remove the intermediate file if audio was successfully added
         # and the final video path is different from the captioned video path
@@ -724,7 +1196,44 @@ def process_video(video_path: str, caption_text: str, audio_path: str, output_pa
         elif not final_video or final_video == captioned_video:
             print(f"Keeping captioned video at: {captioned_video}")
         
-        return final_video if final_video else captioned_video
+        return verified(i, final_video if final_video else captioned_video)
+    
+    # Each mux is its own ffmpeg process, run them side by side
+    with ThreadPoolExecutor(max_workers=max(1, len(variants))) as executor:
+        results = list(executor.map(finish, range(len(variants))))
+    if stream is not None:
+        stream.cleanup()
+    for future in side_output_futures:
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Error writing side outputs: {e}")
+    return results
+
+def process_video(video_path: str, caption_text: str, audio_path: str, output_path: str = None, word_by_word: bool = True, audio_fit: str = config.AUDIO_FIT, mix_original: bool = config.MIX_ORIGINAL_AUDIO, caption_mode: str = config.CAPTION_MODE, side_outputs: bool = config.SIDE_OUTPUTS, highlight: bool = config.HIGHLIGHT_WINDOW, style: CaptionStyle = None) -> Optional[str]:
+    """
+    Process a video by adding both caption and audio.
+    
+    Args:
+        video_path: Path to the input video file
+        caption_text: Text to display as caption
+        audio_path: Path to the audio file to add
+        output_path: Path to save the final output video (if None, a default path will be created)
+        word_by_word: If True, display one word at a time with animation
+        audio_fit: How the voice and video lengths are reconciled ("pad", "loop" or "trim")
+        mix_original: If True, keep the original soundtrack ducked under the voice
+        caption_mode: "burn" draws the captions into the frames, "soft" adds them as a subtitle track
+        side_outputs: If True, also write a poster JPEG and an animated WebP preview next to the output
+        highlight: If True, render only the best window of a long source that fits the voice
+        style: Look of the captions (the CAPTION_* values in config if None)
+        
+    Returns:
+        Path to the output video or None if processing fails
+    """
+    try:
+        variant = CaptionVariant(caption_text, audio_path, output_path=output_path, style=style, word_by_word=word_by_word)
+        return render_variants(video_path, [variant], audio_fit=audio_fit, mix_original=mix_original,
+                               caption_mode=caption_mode, side_outputs=side_outputs, highlight=highlight)[0]
         
     except Exception as e:
         print(f"Error processing video: {e}")
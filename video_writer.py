@@ -0,0 +1,87 @@
+"""
+Video writer module for the Video Modification Bot.
+Pipes raw frames into ffmpeg using the fastest encoder the toolchain supports,
+falling back to OpenCV's VideoWriter when ffmpeg is not installed.
+"""
+
+import subprocess
+from fractions import Fraction
+from typing import Optional, Union
+import cv2
+import numpy as np
+from stage_scheduler import get_scheduler
+from toolchain import get_ffmpeg_path, select_video_encoder
+
+class FFmpegVideoWriter:
+    """Drop-in replacement for cv2.VideoWriter that encodes BGR frames with ffmpeg."""
+
+    def __init__(self, ffmpeg_path: str, output_path: str, fps: Union[Fraction, float], width: int, height: int):
+        self.output_path = output_path
+        self.width = width
+        self.height = height
+        rate = Fraction(fps).limit_denominator(1001)
+
+        cmd = [
+            ffmpeg_path, '-v', 'error', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'bgr24',
+            '-s', f"{width}x{height}", '-framerate', f"{rate.numerator}/{rate.denominator}",
+            '-i', 'pipe:0',
+        ]
+        # yuv420p needs even dimensions
+        if width % 2 or height % 2:
+            cmd += ['-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2']
+        cmd += select_video_encoder() + ['-pix_fmt', 'yuv420p', '-an']
+        # Stay within the cores of one render slot
+        cmd += ['-threads', str(get_scheduler().thread_budget("render")), output_path]
+
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stderr=subprocess.PIPE)
+        self._failed = False
+
+    def isOpened(self) -> bool:
+        return self._process.poll() is None and not self._failed
+
+    def write(self, frame: np.ndarray):
+        if self._failed:
+            return
+        try:
+            self._process.stdin.write(memoryview(np.ascontiguousarray(frame)).cast('B'))
+        except (BrokenPipeError, OSError):
+            self._failed = True
+
+    def release(self) -> bool:
+        """Finish encoding. Returns True if ffmpeg exited cleanly."""
+        if self._process.stdin and not self._process.stdin.closed:
+            try:
+                self._process.stdin.close()
+            except (BrokenPipeError, OSError):
+                self._failed = True
+        stderr = self._process.stderr.read().decode(errors='replace') if self._process.stderr else ""
+        returncode = self._process.wait()
+        if returncode != 0 or self._failed:
+            print(f"Error encoding video with FFmpeg: {stderr.strip()}")
+            return False
+        return True
+
+def open_video_writer(output_path: str, fps: Union[Fraction, float], width: int, height: int) -> Optional[object]:
+    """
+    Open a video writer for BGR frames of the given size.
+
+    Args:
+        output_path: Path of the video file to create
+        fps: Frame rate (an exact Fraction is preserved when ffmpeg is used)
+        width: Frame width in pixels
+        height: Frame height in pixels
+
+    Returns:
+        An object with write()/release() like cv2.VideoWriter, or None on failure
+    """
+    ffmpeg_path = get_ffmpeg_path()
+    if ffmpeg_path:
+        writer = FFmpegVideoWriter(ffmpeg_path, output_path, fps, width, height)
+        if writer.isOpened():
+            return writer
+        print("Warning: Could not start FFmpeg encoder, falling back to OpenCV writer.")
+
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    writer = cv2.VideoWriter(output_path, fourcc, float(fps), (width, height))
+    return writer if writer.isOpened() else None